@@ -1,6 +1,6 @@
 import pandas as pd
 import json
-from typing import Dict, List as PyList
+from typing import Dict, Iterable, List as PyList
 
 from ssz import Serializable
 from ssz.sedes import ByteVector, ByteList, uint16, uint64, List as SSZList
@@ -22,6 +22,9 @@ Nonce = uint64
 CodeData = ByteList(MAX_CODE_SIZE)
 
 def parse_hex_or_zero(x):
+    # Trace values are almost always hex strings; skip the pandas check for them
+    if type(x) is str:
+        return int(x, 16)
     if pd.isna(x) or x is None:
         return 0
     return int(x, 16)
@@ -91,11 +94,13 @@ class BALBuilder:
     def add_storage_write(self, address: bytes, slot: bytes, tx_index: int, new_value: bytes):
         self._ensure_account(address)
         
-        if slot not in self.accounts[address]['storage_writes']:
-            self.accounts[address]['storage_writes'][slot] = []
+        storage_writes = self.accounts[address]['storage_writes']
+        slot_changes = storage_writes.get(slot)
+        if slot_changes is None:
+            slot_changes = storage_writes[slot] = []
             
         change = StorageChange(tx_index=tx_index, new_value=new_value)
-        self.accounts[address]['storage_writes'][slot].append(change)
+        slot_changes.append(change)
     
     def add_storage_read(self, address: bytes, slot: bytes):
         self._ensure_account(address)
@@ -124,19 +129,27 @@ class BALBuilder:
     
     def add_touched_account(self, address: bytes):
         self._ensure_account(address)
+
+    def add_touched_accounts(self, addresses: Iterable[bytes]):
+        """Ensure every address in addresses exists in builder."""
+        accounts = self.accounts
+        for address in addresses:
+            if address not in accounts:
+                self._ensure_account(address)
     
     def build(self, ignore_reads: bool = False) -> BlockAccessList:
+        """Build the BAL with accounts, slots, reads and changes already in canonical order."""
         account_changes_list = []
         
-        for address, changes in self.accounts.items():
+        for address, changes in sorted(self.accounts.items()):
             storage_writes = []
-            for slot, slot_changes in changes['storage_writes'].items():
+            for slot, slot_changes in sorted(changes['storage_writes'].items()):
                 sorted_changes = sorted(slot_changes, key=lambda x: x.tx_index)
                 storage_writes.append(StorageAccess(slot=slot, changes=sorted_changes))
             
             storage_reads = []
             if not ignore_reads:
-                for slot in changes['storage_reads']:
+                for slot in sorted(changes['storage_reads']):
                     if slot not in changes['storage_writes']:
                         storage_reads.append(slot)
             
@@ -155,8 +168,6 @@ class BALBuilder:
             
             account_changes_list.append(account_change)
         
-        account_changes_list.sort(key=lambda x: bytes(x.address))
-        
         return BlockAccessList(account_changes=account_changes_list)
 
 
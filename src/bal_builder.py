@@ -1,13 +1,17 @@
 import os
 import ssz
 import sys
-import json
+import struct
+import orjson
+import numpy as np
 import argparse
 import requests
 from pathlib import Path
+from array import array
+from operator import attrgetter
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Set, Tuple
-from eth_utils import to_canonical_address
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 project_root = str(Path(__file__).parent.parent)
 src_dir = os.path.join(project_root, "src")
@@ -16,6 +20,7 @@ sys.path.insert(0, src_dir)
 from BALs import *
 from helpers import *
 from helpers import fetch_block_info
+import helpers
 
 rpc_file = os.path.join(project_root, "rpc.txt")
 with open(rpc_file, "r") as file:
@@ -28,6 +33,22 @@ BEACON_ROOT_CONTRACT = "0x000F3df6D732807Ef1319fB7B8bB8522d0Beac02"  # EIP-4788
 HISTORY_CONTRACT = "0x0000F90827F1C53a10cb7A02335B175320002935"  # EIP-2935
 HISTORY_BUFFER_LENGTH = 8191  # For beacon root storage
 
+ZERO_VALUE_HEX = "0x" + "00" * 32
+ZERO_BYTES32 = b"\x00" * 32
+
+# Balances are 16-byte big-endian; nearly all fit in the low 8 bytes
+_U64_BALANCE = struct.Struct(">8xQ")
+_U64_LIMIT = 1 << 64
+
+def _normalize_address(address: str) -> str:
+    """Lowercase and intern ``address`` so all occurrences within a run share one string object."""
+    return sys.intern(address if address.islower() else address.lower())
+
+def _encode_balance(value: int) -> bytes:
+    if 0 <= value < _U64_LIMIT:
+        return _U64_BALANCE.pack(value)
+    return value.to_bytes(16, "big", signed=False)
+
 def extract_balances(state):
     balances = {}
     for addr, changes in state.items():
@@ -79,7 +100,7 @@ def extract_balance_touches_from_block(block_number: int, rpc_url: str) -> Dict[
     Returns:
         Dict mapping tx_index to dict of address -> balance value
     """
-    trace_result = fetch_block_trace(block_number, rpc_url, diff_mode=False)
+    trace_result = stream_block_trace(block_number, rpc_url, diff_mode=False)
     balance_touches = {}
     
     for tx_id, tx_trace in enumerate(trace_result):
@@ -87,12 +108,40 @@ def extract_balance_touches_from_block(block_number: int, rpc_url: str) -> Dict[
         touched_addrs = {}
         for address, acc_data in result.items():
             if "balance" in acc_data:
-                touched_addrs[address.lower()] = acc_data["balance"]
+                touched_addrs[_normalize_address(address)] = acc_data["balance"]
         if touched_addrs:
             balance_touches[tx_id] = touched_addrs
     
     return balance_touches
 
+def extract_reads_and_balance_touches(
+    trace_result: Iterable[dict],
+) -> Tuple[Dict[str, Set[str]], Dict[int, Dict[str, str]]]:
+    """Derive both storage reads and balance touches from one diffMode=false trace.
+
+    Same results as ``extract_reads_from_block`` and
+    ``extract_balance_touches_from_block``, without tracing the block twice.
+    """
+    reads = defaultdict(set)
+    balance_touches = {}
+
+    for tx_id, tx_trace in enumerate(trace_result):
+        result = tx_trace.get("result", {})
+        touched_addrs = {}
+        for address, acc_data in result.items():
+            address = _normalize_address(address)
+            storage = acc_data.get("storage")
+            if storage:
+                account_reads = reads[address]
+                for slot in storage:
+                    account_reads.add(slot.lower())
+            if "balance" in acc_data:
+                touched_addrs[address] = acc_data["balance"]
+        if touched_addrs:
+            balance_touches[tx_id] = touched_addrs
+
+    return reads, balance_touches
+
 def identify_gas_related_addresses(block_info: dict, tx_index: int) -> Tuple[Optional[str], Optional[str]]:
     if not block_info or "transactions" not in block_info:
         return None, None
@@ -108,183 +157,371 @@ def identify_gas_related_addresses(block_info: dict, tx_index: int) -> Tuple[Opt
     
     return sender, fee_recipient
 
-def process_balance_changes(trace_result, builder: BALBuilder, touched_addresses: set, 
-                          balance_touches: Dict[int, Dict[str, str]] = None, 
+def _process_reverted_tx_balance(tx_id: int, builder: BALBuilder, touched_addresses: set,
+                                 balance_touches_for_tx: Dict[str, str],
+                                 block_info: dict = None,
+                                 receipts: List[dict] = None) -> Set[str]:
+    """Record the gas-fee balance changes of a reverted tx; returns the addresses recorded."""
+    if not (receipts and tx_id < len(receipts) and block_info and tx_id < len(block_info.get("transactions", []))):
+        return set()
+
+    # For reverted transactions, calculate gas fee from receipt with EIP-1559 support
+    receipt = receipts[tx_id]
+    tx_info = block_info["transactions"][tx_id]
+
+    # Calculate gas fee components
+    gas_used = int(receipt.get("gasUsed", "0x0"), 16)
+
+    # Get effective gas price
+    if "effectiveGasPrice" in receipt:
+        effective_gas_price = int(receipt["effectiveGasPrice"], 16)
+    elif "gasPrice" in tx_info:
+        effective_gas_price = int(tx_info["gasPrice"], 16)
+    else:
+        effective_gas_price = 0
+
+    # Get base fee for EIP-1559
+    base_fee_per_gas = int(block_info.get("baseFeePerGas", "0x0"), 16)
+
+    # Calculate fees
+    total_gas_fee = gas_used * effective_gas_price
+
+    # For EIP-1559 transactions, only priority fee goes to miner
+    if base_fee_per_gas > 0:
+        priority_fee_per_gas = effective_gas_price - base_fee_per_gas
+        priority_fee_total = gas_used * priority_fee_per_gas
+    else:
+        # Pre-EIP-1559, all gas fee goes to miner
+        priority_fee_total = total_gas_fee
+
+    # Get addresses
+    sender = _normalize_address(tx_info.get("from", ""))
+    fee_recipient = _normalize_address(block_info.get("miner", ""))
+
+    # Calculate post-balances from the accurate pre-balances in balance touches
+    sender_pre = parse_hex_or_zero(balance_touches_for_tx.get(sender, "0x0"))
+    fee_recipient_pre = parse_hex_or_zero(balance_touches_for_tx.get(fee_recipient, "0x0"))
+
+    # Sender pays full gas fee
+    sender_post = sender_pre - total_gas_fee
+    # Fee recipient only gets priority fee (base fee is burned)
+    fee_recipient_post = fee_recipient_pre + priority_fee_total
+
+    # Add balance changes
+    sender_canonical = canonical_address(sender)
+    sender_post_bytes = _encode_balance(sender_post)
+    builder.add_balance_change(sender_canonical, tx_id, sender_post_bytes)
+
+    fee_recipient_canonical = canonical_address(fee_recipient)
+    fee_recipient_post_bytes = _encode_balance(fee_recipient_post)
+    builder.add_balance_change(fee_recipient_canonical, tx_id, fee_recipient_post_bytes)
+
+    touched_addresses.add(sender)
+    touched_addresses.add(fee_recipient)
+    return {sender, fee_recipient}
+
+def _collect_balance_change(tx_id: int, address: str, pre_info: dict, post_info: dict,
+                            builder: BALBuilder, balance_touches_for_tx: Dict[str, str]) -> bool:
+    """Record the post balance of ``address`` if this tx changed it; returns whether it did.
+
+    Same rule as ``get_balance_delta_with_touches`` for a single address.
+    """
+    if "balance" not in post_info:
+        return False
+
+    post_balance = parse_hex_or_zero(post_info["balance"])
+    if "balance" in pre_info:
+        pre_balance = parse_hex_or_zero(pre_info["balance"])
+    elif address in balance_touches_for_tx:
+        # Address was touched but not in pre-state due to diffMode=true
+        pre_balance = parse_hex_or_zero(balance_touches_for_tx[address])
+    else:
+        pre_balance = 0
+
+    if post_balance == pre_balance:
+        return False
+
+    canonical = canonical_address(address)
+    builder.add_balance_change(canonical, tx_id, _encode_balance(post_balance))
+    return True
+
+def _add_balance_touched_accounts(builder: BALBuilder, touched_addresses: set,
+                                  balance_touches: Dict[int, Dict[str, str]],
+                                  processed_per_tx: Dict[int, Set[str]]):
+    for tx_id, touched_addrs_balances in balance_touches.items():
+        processed = processed_per_tx.get(tx_id, set())
+        for address in touched_addrs_balances:
+            if address not in processed:
+                touched_addresses.add(address)
+                canonical = canonical_address(address)
+                builder.add_touched_account(canonical)
+
+def process_balance_changes(trace_result, builder: BALBuilder, touched_addresses: set,
+                          balance_touches: Dict[int, Dict[str, str]] = None,
                           reverted_tx_indices: set = None,
                           block_info: dict = None,
                           receipts: List[dict] = None,
                           ignore_reads: bool = False):
     if reverted_tx_indices is None:
         reverted_tx_indices = set()
-        
+
     processed_per_tx = {}
-    
+
     for tx_id, tx in enumerate(trace_result):
         result = tx.get("result")
         if not isinstance(result, dict):
             continue
 
+        # Get balance touches for this specific transaction to fix diffMode=true issues
+        balance_touches_for_tx = balance_touches.get(tx_id, {}) if balance_touches else {}
+
         if tx_id in reverted_tx_indices:
-            # For reverted transactions, calculate gas fee from receipt with EIP-1559 support
-            if receipts and tx_id < len(receipts) and block_info and tx_id < len(block_info.get("transactions", [])):
-                receipt = receipts[tx_id]
-                tx_info = block_info["transactions"][tx_id]
-                
-                # Calculate gas fee components
-                gas_used = int(receipt.get("gasUsed", "0x0"), 16)
-                
-                # Get effective gas price
-                if "effectiveGasPrice" in receipt:
-                    effective_gas_price = int(receipt["effectiveGasPrice"], 16)
-                elif "gasPrice" in tx_info:
-                    effective_gas_price = int(tx_info["gasPrice"], 16)
-                else:
-                    effective_gas_price = 0
-                
-                # Get base fee for EIP-1559
-                base_fee_per_gas = int(block_info.get("baseFeePerGas", "0x0"), 16)
-                
-                # Calculate fees
-                total_gas_fee = gas_used * effective_gas_price
-                
-                # For EIP-1559 transactions, only priority fee goes to miner
-                if base_fee_per_gas > 0:
-                    priority_fee_per_gas = effective_gas_price - base_fee_per_gas
-                    priority_fee_total = gas_used * priority_fee_per_gas
-                else:
-                    # Pre-EIP-1559, all gas fee goes to miner
-                    priority_fee_total = total_gas_fee
-                
-                # Get addresses
-                sender = tx_info.get("from", "").lower()
-                fee_recipient = block_info.get("miner", "").lower()
-                
-                # Get accurate pre-balances from balance touches
-                balance_touches_for_tx = balance_touches.get(tx_id, {}) if balance_touches else {}
-                
-                # Calculate post-balances
-                sender_pre = parse_hex_or_zero(balance_touches_for_tx.get(sender, "0x0"))
-                fee_recipient_pre = parse_hex_or_zero(balance_touches_for_tx.get(fee_recipient, "0x0"))
-                
-                # Sender pays full gas fee
-                sender_post = sender_pre - total_gas_fee
-                # Fee recipient only gets priority fee (base fee is burned)
-                fee_recipient_post = fee_recipient_pre + priority_fee_total
-                
-                # Add balance changes
-                sender_canonical = to_canonical_address(sender)
-                sender_post_bytes = sender_post.to_bytes(16, "big", signed=False)
-                builder.add_balance_change(sender_canonical, tx_id, sender_post_bytes)
-                
-                fee_recipient_canonical = to_canonical_address(fee_recipient)
-                fee_recipient_post_bytes = fee_recipient_post.to_bytes(16, "big", signed=False)
-                builder.add_balance_change(fee_recipient_canonical, tx_id, fee_recipient_post_bytes)
-                
-                touched_addresses.add(sender)
-                touched_addresses.add(fee_recipient)
-                processed_addrs = {sender, fee_recipient}
-            else:
-                processed_addrs = set()
+            processed_addrs = _process_reverted_tx_balance(
+                tx_id, builder, touched_addresses, balance_touches_for_tx, block_info, receipts
+            )
         else:
-            # Normal (non-reverted) transaction processing
-            pre_state, post_state = tx["result"]["pre"], tx["result"]["post"]
-            pre_balances, post_balances = parse_pre_and_post_balances(pre_state, post_state)
-            pres, posts = set(pre_balances.keys()), set(post_balances.keys())
-            
-            # Get balance touches for this specific transaction to fix diffMode=true issues
-            balance_touches_for_tx = balance_touches.get(tx_id, {}) if balance_touches else {}
-            
-            # Use the enhanced delta calculation that accounts for missing pre-states
-            balance_delta = get_balance_delta_with_touches(pres, posts, pre_balances, post_balances, balance_touches_for_tx)
-            
-            # Also add addresses from balance_touches to ensure they're tracked
-            if balance_touches_for_tx:
-                posts.update(balance_touches_for_tx.keys())
+            pre_state, post_state = result.get("pre", {}), result.get("post", {})
+            touched_addresses.update(balance_touches_for_tx)
+            processed_addrs = set()
 
-            all_balance_addresses = pres.union(posts)
-            for address in all_balance_addresses:
+            for address in pre_state.keys() | post_state.keys():
                 touched_addresses.add(address.lower())
+                if _collect_balance_change(tx_id, address, pre_state.get(address, {}),
+                                           post_state.get(address, {}), builder, balance_touches_for_tx):
+                    processed_addrs.add(address.lower())
 
-            processed_addrs = set()
-            
-            for address, delta_val in balance_delta.items():
-                canonical = to_canonical_address(address)
-                post_balance = post_balances.get(address, 0)
-                post_balance_bytes = post_balance.to_bytes(16, "big", signed=False)
-                builder.add_balance_change(canonical, tx_id, post_balance_bytes)
-                processed_addrs.add(address.lower())
-        
         processed_per_tx[tx_id] = processed_addrs
-    
+
     if balance_touches and not ignore_reads:
-        for tx_id, touched_addrs_balances in balance_touches.items():
-            processed = processed_per_tx.get(tx_id, set())
-            for address, balance_hex in touched_addrs_balances.items():
-                if address not in processed:
-                    touched_addresses.add(address)
-                    canonical = to_canonical_address(address)
-                    builder.add_touched_account(canonical)
+        _add_balance_touched_accounts(builder, touched_addresses, balance_touches, processed_per_tx)
 
-def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
-    code = state.get(address, {}).get("code")
+def _non_empty_code(info: dict) -> Optional[str]:
+    code = info.get("code")
     if code and code not in ("", "0x"):
         return code
     return None
 
+def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
+    return _non_empty_code(state.get(address, {}))
+
 def decode_hex_code(code_hex: str) -> bytes:
     code_str = code_hex[2:] if code_hex.startswith("0x") else code_hex
     return bytes.fromhex(code_str)
 
+def _collect_code_change(tx_id: int, address: str, pre_info: dict, post_info: dict,
+                         builder: BALBuilder, code_cache: Dict[str, bytes]):
+    post_code = _non_empty_code(post_info)
+    if post_code is None or post_code == _non_empty_code(pre_info):
+        return
+
+    # Factories and proxies deploy the same bytecode repeatedly within a
+    # block; decode (and size-check) each distinct code string once.
+    code_bytes = code_cache.get(post_code)
+    if code_bytes is None:
+        code_bytes = decode_hex_code(post_code)
+        if len(code_bytes) > MAX_CODE_SIZE:
+            raise ValueError(
+                f"Contract code too large in tx {tx_id} for {address}: "
+                f"{len(code_bytes)} > {MAX_CODE_SIZE}"
+            )
+        code_cache[post_code] = code_bytes
+
+    canonical = canonical_address(address)
+    builder.add_code_change(canonical, tx_id, code_bytes)
+
 def process_code_changes(trace_result: List[dict], builder: BALBuilder, reverted_tx_indices: set = None):
     if reverted_tx_indices is None:
         reverted_tx_indices = set()
-        
+
+    code_cache: Dict[str, bytes] = {}
+
     for tx_id, tx in enumerate(trace_result):
         result = tx.get("result")
         if not isinstance(result, dict):
             continue
-            
+
         if tx_id in reverted_tx_indices:
             continue
 
         pre_state, post_state = result.get("pre", {}), result.get("post", {})
-        all_addresses = set(pre_state) | set(post_state)
+        all_addresses = pre_state.keys() | post_state.keys()
 
         for address in all_addresses:
-            pre_code = extract_non_empty_code(pre_state, address)
-            post_code = extract_non_empty_code(post_state, address)
-            
-            if post_code is None or post_code == pre_code:
-                continue
-
-            code_bytes = decode_hex_code(post_code)
-            if len(code_bytes) > MAX_CODE_SIZE:
-                raise ValueError(
-                    f"Contract code too large in tx {tx_id} for {address}: "
-                    f"{len(code_bytes)} > {MAX_CODE_SIZE}"
-                )
-
-            canonical = to_canonical_address(address)
-            builder.add_code_change(canonical, tx_id, code_bytes)
+            _collect_code_change(tx_id, address, pre_state.get(address, {}), post_state.get(address, {}),
+                                 builder, code_cache)
 
 def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
-    trace_result = fetch_block_trace(block_number, rpc_url, diff_mode=False)
+    trace_result = stream_block_trace(block_number, rpc_url, diff_mode=False)
     reads = defaultdict(set)
-    
+
     for tx_trace in trace_result:
         result = tx_trace.get("result", {})
         for address, acc_data in result.items():
             storage = acc_data.get("storage", {})
             for slot in storage.keys():
-                reads[address.lower()].add(slot.lower())
-    
+                reads[_normalize_address(address)].add(slot.lower())
+
     return reads
 
 def _is_non_write_read(pre_val_hex: Optional[str], post_val_hex: Optional[str]) -> bool:
     return pre_val_hex is not None and post_val_hex is None
 
+def _classify_slots(pre_storage: dict, post_storage: dict,
+                    to_bytes32: Callable[[str], bytes]) -> Tuple[List[Tuple[str, bytes]], List[str]]:
+    """Split one account's storage diff for one tx into ``(slot, new_value)`` writes and read slots.
+
+    A slot whose post value differs from its pre value (missing pre counts
+    as zero) is a write; a slot cleared from the post state is a write of
+    zero. Unchanged slots and slots whose post value is null are reads.
+    """
+    writes = []
+    reads = []
+    # Most accounts only appear on one side; iterate that dict directly
+    # rather than building a union set.
+    if not pre_storage:
+        all_slots = post_storage
+    elif not post_storage:
+        all_slots = pre_storage
+    else:
+        all_slots = pre_storage.keys() | post_storage.keys()
+
+    pre_get, post_get = pre_storage.get, post_storage.get
+    for slot in all_slots:
+        post_val = post_get(slot)
+        pre_val = pre_get(slot)
+        if post_val is not None:
+            post_bytes = to_bytes32(post_val)
+            pre_bytes = to_bytes32(pre_val) if pre_val is not None else ZERO_BYTES32
+            if pre_bytes != post_bytes:
+                writes.append((slot, post_bytes))
+            else:
+                reads.append(slot)
+        elif pre_val is not None:
+            if slot in post_storage:
+                reads.append(slot)
+            else:
+                writes.append((slot, ZERO_BYTES32))
+
+    return writes, reads
+
+class _StorageCollector:
+    """Accumulates a block's storage writes and reads tx by tx, then emits them into a builder.
+
+    Writes are kept as parallel arrays (interned address id, interned slot
+    id, tx index, value) rather than a dict of dicts of ``(tx, value)``
+    tuples, which keeps busy blocks from allocating an object per write.
+    """
+
+    def __init__(self, ignore_reads: bool = IGNORE_STORAGE_LOCATIONS):
+        self.ignore_reads = ignore_reads
+        self.address_ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        self.slot_ids: Dict[str, int] = {}
+        self.slots: List[str] = []
+        self.write_address_ids: List[int] = []
+        self.write_slot_ids: List[int] = []
+        self.write_tx_ids = array("I")
+        self.write_values: List[bytes] = []
+        # address_id << 32 | slot_id of every (address, slot) written so far
+        self.written: Set[int] = set()
+        self.block_reads: Dict[str, Set[str]] = {}
+        # Slot keys and values recur across txs and every written value is
+        # decoded twice (classification and emission), so decode each distinct
+        # hex string once per block.
+        self.hex32_cache: Dict[str, bytes] = {ZERO_VALUE_HEX: ZERO_BYTES32}
+
+    def to_bytes32(self, hexstr: str) -> bytes:
+        raw = self.hex32_cache.get(hexstr)
+        if raw is None:
+            raw = self.hex32_cache[hexstr] = hex_to_bytes32(hexstr)
+        return raw
+
+    def _intern_address(self, address: str) -> int:
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            address_id = self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return address_id
+
+    def _intern_slot(self, slot: str) -> int:
+        slot_id = self.slot_ids.get(slot)
+        if slot_id is None:
+            slot_id = self.slot_ids[slot] = len(self.slots)
+            self.slots.append(slot)
+        return slot_id
+
+    def _is_written(self, address: str, slot: str) -> bool:
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            return False
+        slot_id = self.slot_ids.get(slot)
+        return slot_id is not None and (address_id << 32 | slot_id) in self.written
+
+    def _add_write(self, tx_id: int, address: str, slot: str, value: bytes):
+        address_id = self._intern_address(address)
+        slot_id = self._intern_slot(slot)
+        self.write_address_ids.append(address_id)
+        self.write_slot_ids.append(slot_id)
+        self.write_tx_ids.append(tx_id)
+        self.write_values.append(value)
+        self.written.add(address_id << 32 | slot_id)
+
+    def _reads_for(self, address: str) -> Set[str]:
+        account_reads = self.block_reads.get(address)
+        if account_reads is None:
+            account_reads = self.block_reads[address] = set()
+        return account_reads
+
+    def add(self, tx_id: int, address: str, pre_storage: dict, post_storage: dict):
+        writes, reads = _classify_slots(pre_storage, post_storage, self.to_bytes32)
+
+        for slot, value in writes:
+            self._add_write(tx_id, address, slot, value)
+
+        if reads and not self.ignore_reads:
+            is_written = self._is_written
+            unwritten = [slot for slot in reads if not is_written(address, slot)]
+            if unwritten:
+                self._reads_for(address).update(unwritten)
+
+    def flush(self, builder: BALBuilder, additional_reads: Optional[Dict[str, Set[str]]] = None):
+        block_reads, to_bytes32 = self.block_reads, self.to_bytes32
+
+        if not self.ignore_reads and additional_reads is not None:
+            is_written = self._is_written
+            for address, read_slots in additional_reads.items():
+                unwritten = [slot for slot in read_slots if not is_written(address, slot)]
+                if unwritten:
+                    self._reads_for(address).update(unwritten)
+
+        if self.write_values:
+            addresses, slots = self.addresses, self.slots
+            write_address_ids, write_slot_ids = self.write_address_ids, self.write_slot_ids
+            write_tx_ids, write_values = self.write_tx_ids, self.write_values
+
+            # Group by (address, slot, tx) so each address is canonicalized once
+            order = np.lexsort((
+                np.asarray(write_tx_ids),
+                np.asarray(write_slot_ids),
+                np.asarray(write_address_ids),
+            ))
+            prev_address_id = -1
+            for i in order.tolist():
+                address_id = write_address_ids[i]
+                if address_id != prev_address_id:
+                    canonical_addr = canonical_address(addresses[address_id])
+                    prev_address_id = address_id
+                slot_bytes = to_bytes32(slots[write_slot_ids[i]])
+                builder.add_storage_write(canonical_addr, slot_bytes, write_tx_ids[i], write_values[i])
+
+        for address, read_slots in block_reads.items():
+            canonical_addr = canonical_address(address)
+            for slot in read_slots:
+                slot_bytes = to_bytes32(slot)
+                builder.add_storage_read(canonical_addr, slot_bytes)
+
 def process_storage_changes(
-    trace_result: List[dict], 
+    trace_result: List[dict],
     additional_reads: Optional[Dict[str, Set[str]]] = None,
     ignore_reads: bool = IGNORE_STORAGE_LOCATIONS,
     builder: BALBuilder = None,
@@ -292,86 +529,49 @@ def process_storage_changes(
 ):
     if reverted_tx_indices is None:
         reverted_tx_indices = set()
-        
-    block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
-    block_reads: Dict[str, Set[str]] = {}
+
+    storage = _StorageCollector(ignore_reads)
 
     for tx_id, tx in enumerate(trace_result):
         result = tx.get("result")
         if not isinstance(result, dict):
             continue
-            
+
         if tx_id in reverted_tx_indices:
             continue
 
         pre_state = result.get("pre", {})
         post_state = result.get("post", {})
-        all_addresses = set(pre_state) | set(post_state)
+        all_addresses = pre_state.keys() | post_state.keys()
 
         for address in all_addresses:
             pre_storage = pre_state.get(address, {}).get("storage", {})
             post_storage = post_state.get(address, {}).get("storage", {})
-            all_slots = set(pre_storage) | set(post_storage)
-
-            for slot in all_slots:
-                pre_val = pre_storage.get(slot)
-                post_val = post_storage.get(slot)
-
-                if post_val is not None:
-                    pre_bytes = (
-                        hex_to_bytes32(pre_val) if pre_val is not None else b"\x00" * 32
-                    )
-                    post_bytes = hex_to_bytes32(post_val)
-                    if pre_bytes != post_bytes:
-                        block_writes.setdefault(address, {}).setdefault(slot, []).append(
-                            (tx_id, post_val)
-                        )
-                    else:
-                        if not ignore_reads:
-                            if address not in block_writes or slot not in block_writes.get(address, {}):
-                                block_reads.setdefault(address, set()).add(slot)
-                elif pre_val is not None and slot not in post_storage:
-                    zero_value = "0x" + "00" * 32
-                    block_writes.setdefault(address, {}).setdefault(slot, []).append(
-                        (tx_id, zero_value)
-                    )
-                elif not ignore_reads and _is_non_write_read(pre_val, post_val):
-                    if address not in block_writes or slot not in block_writes.get(address, {}):
-                        block_reads.setdefault(address, set()).add(slot)
-
-    if not ignore_reads and additional_reads is not None:
-        for address, read_slots in additional_reads.items():
-            if address not in block_writes:
-                for slot in read_slots:
-                    block_reads.setdefault(address, set()).add(slot)
-            else:
-                written_slots = set(block_writes[address].keys())
-                for slot in read_slots:
-                    if slot not in written_slots:
-                        block_reads.setdefault(address, set()).add(slot)
-
-    for address, slots in block_writes.items():
-        canonical_addr = to_canonical_address(address)
-        for slot, write_entries in slots.items():
-            slot_bytes = hex_to_bytes32(slot)
-            for tx_id, val_hex in write_entries:
-                value_bytes = hex_to_bytes32(val_hex)
-                builder.add_storage_write(canonical_addr, slot_bytes, tx_id, value_bytes)
-
-    for address, read_slots in block_reads.items():
-        canonical_addr = to_canonical_address(address)
-        for slot in read_slots:
-            slot_bytes = hex_to_bytes32(slot)
-            builder.add_storage_read(canonical_addr, slot_bytes)
+            storage.add(tx_id, address, pre_storage, post_storage)
+
+    storage.flush(builder, additional_reads)
 
 def _get_nonce(info: dict, fallback: str = "0") -> int:
-    nonce_str = info.get("nonce", fallback)
-    return int(nonce_str, 16) if isinstance(nonce_str, str) and nonce_str.startswith('0x') else int(nonce_str)
+    return parse_nonce(info.get("nonce", fallback))
+
+def _nonce_diff(pre_info: dict, post_info: dict) -> Optional[int]:
+    """Return the post-tx nonce if it increased, else None; missing accounts count as nonce 0."""
+    pre_nonce = _get_nonce(pre_info, fallback="0") if pre_info else 0
+    post_nonce = _get_nonce(post_info, fallback="0") if post_info else 0
+    return post_nonce if post_nonce > pre_nonce else None
+
+def _collect_nonce_change(tx_index: int, address_hex: str, pre_info: dict, post_info: dict, builder: BALBuilder):
+    post_nonce = _nonce_diff(pre_info, post_info)
+    if post_nonce is None:
+        return
+
+    canonical = canonical_address(address_hex)
+    builder.add_nonce_change(canonical, tx_index, post_nonce)
 
 def process_nonce_changes(trace_result: List[Dict[str, Any]], builder: BALBuilder, reverted_tx_indices: set = None):
     if reverted_tx_indices is None:
         reverted_tx_indices = set()
-        
+
     for tx_index, tx in enumerate(trace_result):
         result = tx.get("result")
         if not isinstance(result, dict):
@@ -381,53 +581,127 @@ def process_nonce_changes(trace_result: List[Dict[str, Any]], builder: BALBuilde
         post_state = result.get("post", {})
 
         # Process all addresses that appear in either pre or post state
-        all_addresses = set(pre_state.keys()) | set(post_state.keys())
-        
+        all_addresses = pre_state.keys() | post_state.keys()
+
         for address_hex in all_addresses:
-            pre_info = pre_state.get(address_hex, {})
-            post_info = post_state.get(address_hex, {})
-            
-            # Get pre and post nonces (defaulting to 0 if not present)
-            pre_nonce = _get_nonce(pre_info, fallback="0") if pre_info else 0
-            post_nonce = _get_nonce(post_info, fallback="0") if post_info else 0
-            
-            # Add nonce change if it increased
-            if post_nonce > pre_nonce:
-                canonical = to_canonical_address(address_hex)
-                builder.add_nonce_change(canonical, tx_index, post_nonce)
+            _collect_nonce_change(tx_index, address_hex, pre_state.get(address_hex, {}),
+                                  post_state.get(address_hex, {}), builder)
 
 def collect_touched_addresses(trace_result: List[dict]) -> Set[str]:
     touched = set()
-    
+
     for tx in trace_result:
         result = tx.get("result")
         if not isinstance(result, dict):
             continue
-            
+
         pre_state = result.get("pre", {})
         post_state = result.get("post", {})
-        
-        all_addresses = set(pre_state.keys()) | set(post_state.keys())
+
+        all_addresses = pre_state.keys() | post_state.keys()
         for addr in all_addresses:
             touched.add(addr.lower())
-    
+
     return touched
 
+def process_trace(
+    trace_result: Iterable[dict],
+    builder: BALBuilder,
+    additional_reads: Optional[Dict[str, Set[str]]] = None,
+    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS,
+    balance_touches: Dict[int, Dict[str, str]] = None,
+    reverted_tx_indices: set = None,
+    block_info: dict = None,
+    receipts: List[dict] = None,
+) -> Tuple[Set[str], int, int]:
+    """Single pass over the trace feeding storage, balance, code and nonce changes to ``builder``.
+
+    Equivalent to ``collect_touched_addresses`` followed by the four
+    ``process_*_changes`` calls. ``trace_result`` may be any iterable of tx
+    traces, e.g. ``stream_block_trace``, since it is consumed exactly once.
+    Returns the touched addresses plus the account and slot counts of
+    ``count_accounts_and_slots``.
+    """
+    if reverted_tx_indices is None:
+        reverted_tx_indices = set()
+
+    touched_addresses = set()
+    storage = _StorageCollector(ignore_reads)
+    code_cache: Dict[str, bytes] = {}
+    processed_per_tx = {}
+    post_accounts = set()
+    post_slots = 0
+
+    for tx_id, tx in enumerate(trace_result):
+        result = tx.get("result")
+        if not isinstance(result, dict):
+            continue
+
+        pre_state = result.get("pre", {})
+        post_state = result.get("post", {})
+        balance_touches_for_tx = balance_touches.get(tx_id, {}) if balance_touches else {}
+
+        post_accounts.update(post_state)
+        for changes in post_state.values():
+            if "storage" in changes:
+                post_slots += len(changes["storage"])
+
+        # Reverted txs only pay gas: no storage or code changes, but nonces still move
+        reverted = tx_id in reverted_tx_indices
+        if reverted:
+            processed_addrs = _process_reverted_tx_balance(
+                tx_id, builder, touched_addresses, balance_touches_for_tx, block_info, receipts
+            )
+        else:
+            touched_addresses.update(balance_touches_for_tx)
+            processed_addrs = set()
+
+        for raw_address in pre_state.keys() | post_state.keys():
+            pre_info = pre_state.get(raw_address, {})
+            post_info = post_state.get(raw_address, {})
+            # Everything below keys on the normalized form, matching the
+            # lowercased reads and balance touches.
+            address = _normalize_address(raw_address)
+            touched_addresses.add(address)
+
+            if not reverted:
+                storage.add(tx_id, address, pre_info.get("storage", {}), post_info.get("storage", {}))
+                if _collect_balance_change(tx_id, address, pre_info, post_info, builder, balance_touches_for_tx):
+                    processed_addrs.add(address)
+                _collect_code_change(tx_id, address, pre_info, post_info, builder, code_cache)
+
+            _collect_nonce_change(tx_id, address, pre_info, post_info, builder)
+
+        processed_per_tx[tx_id] = processed_addrs
+
+    storage.flush(builder, additional_reads)
+
+    if balance_touches and not ignore_reads:
+        _add_balance_touched_accounts(builder, touched_addresses, balance_touches, processed_per_tx)
+
+    return touched_addresses, len(post_accounts), post_slots
+
+_BY_ADDRESS = attrgetter('address')
+_BY_SLOT = attrgetter('slot')
+_BY_TX_INDEX = attrgetter('tx_index')
+
 def sort_block_access_list(bal: BlockAccessList) -> BlockAccessList:
+    # Addresses, slots and reads are plain bytes, which already compare in C
+    # (memcmp); sorting on them directly avoids a bytes() copy per key
     sorted_accounts = []
     
-    for account in sorted(bal.account_changes, key=lambda x: bytes(x.address)):
+    for account in sorted(bal.account_changes, key=_BY_ADDRESS):
         sorted_storage_writes = []
-        for storage_access in sorted(account.storage_writes, key=lambda x: bytes(x.slot)):
-            sorted_changes = sorted(storage_access.changes, key=lambda x: x.tx_index)
+        for storage_access in sorted(account.storage_writes, key=_BY_SLOT):
+            sorted_changes = sorted(storage_access.changes, key=_BY_TX_INDEX)
             sorted_storage_access = StorageAccess(slot=storage_access.slot, changes=sorted_changes)
             sorted_storage_writes.append(sorted_storage_access)
         
-        sorted_storage_reads = sorted(account.storage_reads, key=lambda x: bytes(x))
+        sorted_storage_reads = sorted(account.storage_reads)
         
-        sorted_balance_changes = sorted(account.balance_changes, key=lambda x: x.tx_index)
-        sorted_nonce_changes = sorted(account.nonce_changes, key=lambda x: x.tx_index)
-        sorted_code_changes = sorted(account.code_changes, key=lambda x: x.tx_index)
+        sorted_balance_changes = sorted(account.balance_changes, key=_BY_TX_INDEX)
+        sorted_nonce_changes = sorted(account.nonce_changes, key=_BY_TX_INDEX)
+        sorted_code_changes = sorted(account.code_changes, key=_BY_TX_INDEX)
         
         sorted_account = AccountChanges(
             address=account.address,
@@ -441,8 +715,27 @@ def sort_block_access_list(bal: BlockAccessList) -> BlockAccessList:
     
     return BlockAccessList(account_changes=sorted_accounts)
 
-def get_component_sizes(bal: BlockAccessList) -> Dict[str, float]:
-    
+class _BlockComponents(Serializable):
+    """All of a block's changes grouped by component, encoded in one pass by ``get_component_sizes``."""
+    fields = [
+        ('storage_writes', SSZList(StorageAccess, MAX_SLOTS)),
+        ('storage_reads', SSZList(StorageKey, MAX_SLOTS)),
+        ('balance_changes', SSZList(BalanceChange, MAX_TXS)),
+        ('nonce_changes', SSZList(NonceChange, MAX_TXS)),
+        ('code_changes', SSZList(CodeChange, MAX_TXS)),
+    ]
+
+# Shared across blocks. Snappy releases the GIL while compressing, so the
+# components of large blocks compress in parallel; small blocks aren't
+# worth the hand-off.
+_COMPRESSION_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+_PARALLEL_COMPRESSION_MIN_BYTES = 256 * 1024
+
+def _compressed_size_or_zero(chunk: bytes) -> float:
+    return get_compressed_size(chunk) if chunk else 0
+
+def _encode_component_chunks(bal: BlockAccessList) -> List[bytes]:
+    """SSZ-encode each component list of a block, in ``_BlockComponents`` field order."""
     storage_writes_data = []
     storage_reads_data = []
     balance_changes_data = []
@@ -461,25 +754,33 @@ def get_component_sizes(bal: BlockAccessList) -> Dict[str, float]:
         if account.code_changes:
             code_changes_data.extend(account.code_changes)
     
-    storage_writes_size = get_compressed_size(
-        ssz.encode(storage_writes_data, sedes=SSZList(StorageAccess, MAX_SLOTS))
-    ) if storage_writes_data else 0
-    
-    storage_reads_size = get_compressed_size(
-        ssz.encode(storage_reads_data, sedes=SSZList(StorageKey, MAX_SLOTS))
-    ) if storage_reads_data else 0
-    
-    balance_size = get_compressed_size(
-        ssz.encode(balance_changes_data, sedes=SSZList(BalanceChange, MAX_TXS))
-    ) if balance_changes_data else 0
-    
-    nonce_size = get_compressed_size(
-        ssz.encode(nonce_changes_data, sedes=SSZList(NonceChange, MAX_TXS))
-    ) if nonce_changes_data else 0
+    # Every field is variable-size, so the container encoding is a table of
+    # 4-byte little-endian offsets followed by each list's standalone
+    # encoding; slicing between offsets recovers exactly what encoding each
+    # list separately would produce.
+    encoded = ssz.encode(_BlockComponents(
+        storage_writes=storage_writes_data,
+        storage_reads=storage_reads_data,
+        balance_changes=balance_changes_data,
+        nonce_changes=nonce_changes_data,
+        code_changes=code_changes_data,
+    ))
+    # The first offset points just past the table, i.e. 4 bytes per field
+    table_size = int.from_bytes(encoded[:4], "little")
+    if table_size != 4 * len(_BlockComponents._meta.fields):
+        raise ValueError(f"Unexpected SSZ offset table size {table_size} for _BlockComponents")
+    offsets = [int.from_bytes(encoded[i:i + 4], "little") for i in range(0, table_size, 4)]
+    offsets.append(len(encoded))
+    return [encoded[start:end] for start, end in zip(offsets, offsets[1:])]
+
+def get_component_sizes(bal: BlockAccessList) -> Dict[str, float]:
     
-    code_size = get_compressed_size(
-        ssz.encode(code_changes_data, sedes=SSZList(CodeChange, MAX_TXS))
-    ) if code_changes_data else 0
+    chunks = _encode_component_chunks(bal)
+    if sum(map(len, chunks)) >= _PARALLEL_COMPRESSION_MIN_BYTES:
+        sizes = list(_COMPRESSION_POOL.map(_compressed_size_or_zero, chunks))
+    else:
+        sizes = [_compressed_size_or_zero(chunk) for chunk in chunks]
+    storage_writes_size, storage_reads_size, balance_size, nonce_size, code_size = sizes
     
     total_storage_size = storage_writes_size + storage_reads_size
     total_size = total_storage_size + balance_size + code_size + nonce_size
@@ -532,7 +833,7 @@ def process_system_contract_changes(block_info: dict, builder: BALBuilder, tx_co
                     "id": 1
                 }
                 response = requests.post(RPC_URL, json=payload)
-                result = response.json()
+                result = orjson.loads(response.content)
                 if 'result' in result:
                     parent_block_balances[addr] = int(result['result'], 16)
                 else:
@@ -556,10 +857,10 @@ def process_system_contract_changes(block_info: dict, builder: BALBuilder, tx_co
             post_balance = pre_balance + amount_wei
             
             # Get canonical address
-            canonical_addr = to_canonical_address(address)
+            canonical_addr = canonical_address(address)
             
             # Add balance change with actual post-balance
-            post_balance_bytes = post_balance.to_bytes(16, "big", signed=False)
+            post_balance_bytes = _encode_balance(post_balance)
             builder.add_balance_change(canonical_addr, system_tx_index, post_balance_bytes)
     
     # 2. Process beacon block root (EIP-4788)
@@ -567,7 +868,7 @@ def process_system_contract_changes(block_info: dict, builder: BALBuilder, tx_co
     if parent_beacon_root:
         print(f"  Processing beacon root at tx_index {system_tx_index}...")
         timestamp = int(block_info.get('timestamp', '0x0'), 16)
-        contract_addr = to_canonical_address(BEACON_ROOT_CONTRACT)
+        contract_addr = canonical_address(BEACON_ROOT_CONTRACT)
         
         # Calculate storage slot for the root
         slot_index = timestamp % HISTORY_BUFFER_LENGTH
@@ -582,7 +883,7 @@ def process_system_contract_changes(block_info: dict, builder: BALBuilder, tx_co
     block_number = int(block_info.get('number', '0x0'), 16)
     if parent_hash and block_number > 0:
         print(f"  Processing parent hash at tx_index {system_tx_index}...")
-        contract_addr = to_canonical_address(HISTORY_CONTRACT)
+        contract_addr = canonical_address(HISTORY_CONTRACT)
         
         # Store parent hash at slot = parent block number
         parent_number = block_number - 1
@@ -590,6 +891,145 @@ def process_system_contract_changes(block_info: dict, builder: BALBuilder, tx_co
         value_bytes = bytes.fromhex(parent_hash[2:] if parent_hash.startswith('0x') else parent_hash)
         builder.add_storage_write(contract_addr, slot_bytes, system_tx_index, value_bytes)
 
+def fetch_block_inputs(block_number: int, ignore_reads: bool) -> Dict[str, Any]:
+    """Network stage: fetch everything needed to build the BAL of a block."""
+    print(f"Processing block {block_number}...")
+    # Reads and balance touches both come from the diffMode=false trace, so
+    # it is fetched once, batched with the diffMode=true trace.
+    print(f"  Fetching traces, reads and balance touches for block {block_number}...")
+    trace_result, prestate_trace = fetch_block_traces(block_number, RPC_URL)
+    block_reads, balance_touches = extract_reads_and_balance_touches(prestate_trace)
+    del prestate_trace
+    if ignore_reads:
+        block_reads = None
+
+    print(f"  Fetching transaction receipts for block {block_number}...")
+    receipts = fetch_block_receipts(block_number, RPC_URL)
+    reverted_tx_indices = get_reverted_tx_indices(receipts)
+    if reverted_tx_indices:
+        print(f"    Found {len(reverted_tx_indices)} reverted transactions: {sorted(reverted_tx_indices)}")
+
+    print(f"  Fetching block info...")
+    block_info = fetch_block_info(block_number, RPC_URL)
+
+    return {
+        "trace_result": trace_result,
+        "block_reads": block_reads,
+        "balance_touches": balance_touches,
+        "receipts": receipts,
+        "reverted_tx_indices": reverted_tx_indices,
+        "block_info": block_info,
+    }
+
+def build_block(block_number: int, inputs: Dict[str, Any],
+                ignore_reads: bool) -> Tuple[bytes, Dict[str, float], Dict[str, Any]]:
+    """CPU stage: build and SSZ-encode the BAL from the fetched inputs.
+
+    Returns the encoded BAL, the compressed component sizes and the
+    per-block stats entry.
+    """
+    block_info = inputs["block_info"]
+    builder = BALBuilder()
+
+    touched_addresses, accs, slots = process_trace(
+        inputs["trace_result"], builder, inputs["block_reads"], ignore_reads,
+        inputs["balance_touches"], inputs["reverted_tx_indices"], block_info, inputs["receipts"],
+    )
+
+    # Process system contract changes with tx_index = len(transactions)
+    tx_count = len(block_info.get('transactions', []))
+    process_system_contract_changes(block_info, builder, tx_count)
+
+    if not ignore_reads:
+        builder.add_touched_accounts(map(canonical_address, touched_addresses))
+
+    # build() already emits accounts, slots and changes in canonical order
+    block_obj_sorted = builder.build(ignore_reads=ignore_reads)
+
+    full_block_encoded = ssz.encode(block_obj_sorted, sedes=BlockAccessList)
+
+    component_sizes = get_component_sizes(block_obj_sorted)
+
+    bal_stats = get_account_stats(block_obj_sorted)
+
+    data_entry = {
+        "block_number": block_number,
+        "sizes": component_sizes,
+        "counts": {
+            "accounts": accs,
+            "slots": slots,
+        },
+        "bal_stats": bal_stats,
+    }
+    return full_block_encoded, component_sizes, data_entry
+
+def write_block(block_number: int, encoded: bytes, bal_raw_dir: str, reads_suffix: str):
+    """Write stage: persist the encoded BAL of a block."""
+    filepath = os.path.join(bal_raw_dir, f"{block_number}_block_access_list_{reads_suffix}_eip7928.txt")
+
+    with open(filepath, "wb") as f:
+        f.write(encoded)
+
+def process_block(block_number: int, ignore_reads: bool, bal_raw_dir: str,
+                  reads_suffix: str) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """Fetch, build, encode and persist the BAL for a single block.
+
+    Returns the compressed component sizes and the per-block stats entry.
+    """
+    inputs = fetch_block_inputs(block_number, ignore_reads)
+    encoded, component_sizes, data_entry = build_block(block_number, inputs, ignore_reads)
+    write_block(block_number, encoded, bal_raw_dir, reads_suffix)
+    return component_sizes, data_entry
+
+def process_blocks_pipelined(block_numbers: Iterable[int], ignore_reads: bool, bal_raw_dir: str,
+                             reads_suffix: str, fetch_workers: int = 16,
+                             max_in_flight: Optional[int] = None) -> List[Tuple[Dict[str, float], Dict[str, Any]]]:
+    """Run ``process_block`` over many blocks as a fetch -> build -> write pipeline.
+
+    Each stage has its own thread pool, so RPC round-trips for later blocks
+    overlap encoding and writing of earlier ones. At most ``max_in_flight``
+    blocks (default: twice ``fetch_workers``) are between fetch and write at
+    any time, which bounds how many fetched traces are held in memory.
+    Results are returned in block order.
+    """
+    if max_in_flight is None:
+        max_in_flight = 2 * fetch_workers
+    block_numbers = list(block_numbers)
+    results = {}
+    pending = {}
+    next_block = 0
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool, \
+         ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as cpu_pool, \
+         ThreadPoolExecutor(max_workers=2) as write_pool:
+
+        def refill():
+            nonlocal next_block
+            while next_block < len(block_numbers) and len(pending) < max_in_flight:
+                block_number = block_numbers[next_block]
+                next_block += 1
+                future = fetch_pool.submit(fetch_block_inputs, block_number, ignore_reads)
+                pending[future] = ("fetch", block_number, None)
+
+        refill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, block_number, carried = pending.pop(future)
+                result = future.result()
+                if stage == "fetch":
+                    future = cpu_pool.submit(build_block, block_number, result, ignore_reads)
+                    pending[future] = ("build", block_number, None)
+                elif stage == "build":
+                    encoded, component_sizes, data_entry = result
+                    future = write_pool.submit(write_block, block_number, encoded, bal_raw_dir, reads_suffix)
+                    pending[future] = ("write", block_number, (component_sizes, data_entry))
+                else:
+                    results[block_number] = carried
+            refill()
+
+    return [results[block_number] for block_number in block_numbers]
+
 def main():
     global IGNORE_STORAGE_LOCATIONS
     
@@ -597,7 +1037,13 @@ def main():
     parser.add_argument('--no-reads', action='store_true', 
                         help='Ignore storage read locations (only include writes)')
     parser.add_argument('--block', type=int, help='Process a single block number')
+    parser.add_argument('--workers', type=int, default=16,
+                        help='Number of blocks fetched concurrently (default: 16)')
+    parser.add_argument('--trace-cache', nargs='?', const=os.path.join(project_root, "trace_cache"),
+                        help='Cache raw trace responses on disk (zstd) and reuse them on reruns')
     args = parser.parse_args()
+
+    helpers.TRACE_CACHE_DIR = args.trace_cache
     
     IGNORE_STORAGE_LOCATIONS = args.no_reads
     
@@ -611,79 +1057,20 @@ def main():
     else:
         random_blocks = range(20615532, 20615562, 10)
 
-    for block_number in random_blocks:
-        print(f"Processing block {block_number}...")
-        trace_result = fetch_block_trace(block_number, RPC_URL)
-        
-        block_reads = None
-        if not IGNORE_STORAGE_LOCATIONS:
-            print(f"  Fetching reads for block {block_number}...")
-            block_reads = extract_reads_from_block(block_number, RPC_URL)
+    ignore_reads = IGNORE_STORAGE_LOCATIONS
+    bal_raw_dir = os.path.join(project_root, "bal_raw", "ssz")
+    os.makedirs(bal_raw_dir, exist_ok=True)
+    reads_suffix = "without_reads" if ignore_reads else "with_reads"
 
-        print(f"  Fetching balance touches for block {block_number}...")
-        balance_touches = extract_balance_touches_from_block(block_number, RPC_URL)
-        
-        print(f"  Fetching transaction receipts for block {block_number}...")
-        receipts = fetch_block_receipts(block_number, RPC_URL)
-        reverted_tx_indices = set()
-        for i, receipt in enumerate(receipts):
-            if receipt and receipt.get("status") == "0x0":
-                reverted_tx_indices.add(i)
-        if reverted_tx_indices:
-            print(f"    Found {len(reverted_tx_indices)} reverted transactions: {sorted(reverted_tx_indices)}")
-            
-        print(f"  Fetching block info...")
-        block_info = fetch_block_info(block_number, RPC_URL)
+    # Blocks are independent and the per-block work is dominated by RPC
+    # latency, so fetching is overlapped across blocks and with the
+    # encoding and writing of blocks already fetched.
+    results = process_blocks_pipelined(
+        random_blocks, ignore_reads, bal_raw_dir, reads_suffix, fetch_workers=args.workers
+    )
 
-        builder = BALBuilder()
-        
-        touched_addresses = collect_touched_addresses(trace_result)
-        
-        process_storage_changes(trace_result, block_reads, IGNORE_STORAGE_LOCATIONS, builder, reverted_tx_indices)
-        process_balance_changes(trace_result, builder, touched_addresses, balance_touches, reverted_tx_indices, block_info, receipts, IGNORE_STORAGE_LOCATIONS)
-        process_code_changes(trace_result, builder, reverted_tx_indices)
-        process_nonce_changes(trace_result, builder, reverted_tx_indices)
-        
-        # Process system contract changes with tx_index = len(transactions)
-        tx_count = len(block_info.get('transactions', []))
-        process_system_contract_changes(block_info, builder, tx_count)
-        
-        if not IGNORE_STORAGE_LOCATIONS:
-            for addr in touched_addresses:
-                canonical = to_canonical_address(addr)
-                builder.add_touched_account(canonical)
-        
-        block_obj = builder.build(ignore_reads=IGNORE_STORAGE_LOCATIONS)
-        block_obj_sorted = sort_block_access_list(block_obj)
-        
-        full_block_encoded = ssz.encode(block_obj_sorted, sedes=BlockAccessList)
-
- 
-        bal_raw_dir = os.path.join(project_root, "bal_raw", "ssz")
-        os.makedirs(bal_raw_dir, exist_ok=True)
-        
-        reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-        filename = f"{block_number}_block_access_list_{reads_suffix}_eip7928.txt"
-        filepath = os.path.join(bal_raw_dir, filename)
-        
-        with open(filepath, "wb") as f:
-            f.write(full_block_encoded)
-
-        component_sizes = get_component_sizes(block_obj_sorted)
-
-        accs, slots = count_accounts_and_slots(trace_result)
-        
-        bal_stats = get_account_stats(block_obj_sorted)
-
-        data.append({
-            "block_number": block_number,
-            "sizes": component_sizes,
-            "counts": {
-                "accounts": accs,
-                "slots": slots,
-            },
-            "bal_stats": bal_stats,
-        })
+    for component_sizes, data_entry in results:
+        data.append(data_entry)
 
         totals["storage_writes"].append(component_sizes["storage_writes_kb"])
         totals["storage_reads"].append(component_sizes["storage_reads_kb"])
@@ -693,10 +1080,9 @@ def main():
         totals["nonce"].append(component_sizes["nonce_diffs_kb"])
         block_totals.append(component_sizes["total_kb"])
 
-    filename = "bal_analysis_without_reads_eip7928.json" if IGNORE_STORAGE_LOCATIONS else "bal_analysis_with_reads_eip7928.json"
-    filepath = os.path.join(project_root, "bal_raw", "ssz", filename)
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    filepath = os.path.join(bal_raw_dir, f"bal_analysis_{reads_suffix}_eip7928.json")
+    with open(filepath, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
     print("\nAverage compressed size per component (in KiB):")
     for name, sizes in totals.items():
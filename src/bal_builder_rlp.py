@@ -5,9 +5,9 @@ import json
 import argparse
 import requests
 from pathlib import Path
-from collections import defaultdict
-from typing import Dict
-from eth_utils import to_canonical_address
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 project_root = str(Path(__file__).parent.parent)
 src_dir = os.path.join(project_root, "src")
@@ -15,27 +15,21 @@ sys.path.insert(0, src_dir)
 
 from BALs import BALBuilder, BlockAccessList, get_account_stats, parse_hex_or_zero
 from helpers import *
-from helpers import fetch_block_info, fetch_block_receipts
 from bal_builder import (
     extract_balance_touches_from_block,
     extract_balances,
     parse_pre_and_post_balances,
     get_balance_delta,
     identify_gas_related_addresses,
-    process_balance_changes,
     extract_non_empty_code,
     decode_hex_code,
-    process_code_changes,
     extract_reads_from_block,
     _is_non_write_read,
-    process_storage_changes,
     _get_nonce,
-    process_nonce_changes,
-    collect_touched_addresses,
-    sort_block_access_list,
     get_component_sizes,
     count_accounts_and_slots,
-    process_system_contract_changes
+    process_system_contract_changes,
+    process_trace
 )
 
 rpc_file = os.path.join(project_root, "rpc.txt")
@@ -44,99 +38,129 @@ with open(rpc_file, "r") as file:
 
 IGNORE_STORAGE_LOCATIONS = False
 
-def encode_bal_to_rlp(bal: BlockAccessList) -> bytes:
-    """Convert SSZ BlockAccessList to RLP format."""
-    
-    accounts_data = []
-    
-    for account in bal.account_changes:
-        address_bytes = bytes(account.address)
-        
-        storage_writes_data = []
-        for storage_access in account.storage_writes:
-            slot_bytes = bytes(storage_access.slot)
-            changes_data = []
-            for change in storage_access.changes:
-                changes_data.append([change.tx_index, bytes(change.new_value)])
-            storage_writes_data.append([slot_bytes, changes_data])
-        
-        storage_reads_data = []
-        for slot in account.storage_reads:
-            storage_reads_data.append(bytes(slot))
-        
-        balance_changes_data = []
-        for change in account.balance_changes:
-            balance_int = int.from_bytes(bytes(change.post_balance), 'big')
-            balance_changes_data.append([change.tx_index, balance_int])
-        
-        nonce_changes_data = []
-        for change in account.nonce_changes:
-            nonce_changes_data.append([change.tx_index, change.new_nonce])
-        
-        code_changes_data = []
-        for change in account.code_changes:
-            code_changes_data.append([change.tx_index, bytes(change.new_code)])
-        
-        account_data = [
-            address_bytes,
-            storage_writes_data,
-            storage_reads_data,
-            balance_changes_data,
-            nonce_changes_data,
-            code_changes_data
+RLP_COMPONENTS = ('storage_writes', 'storage_reads', 'balance_changes', 'nonce_changes', 'code_changes')
+
+# rlp.encode([]); component sizes only count non-empty components
+_EMPTY_RLP_LIST = b"\xc0"
+
+def _encode_rlp_bytes(value: bytes) -> bytes:
+    """RLP-encode a byte string."""
+    length = len(value)
+    if length == 1 and value[0] < 0x80:
+        return value
+    if length < 56:
+        return bytes([0x80 + length]) + value
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, byteorder='big')
+    return bytes([0xB7 + len(length_bytes)]) + length_bytes + value
+
+def _encode_rlp_item(item) -> bytes:
+    """
+    RLP-encode a tree of bytes, non-negative ints and sequences.
+    Skips pyrlp's per-node sedes inference; anything else is left to rlp.encode.
+    """
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return _encode_rlp_bytes(item)
+    if isinstance(item, int):
+        return _encode_rlp_bytes(item.to_bytes((item.bit_length() + 7) // 8, byteorder='big'))
+    if isinstance(item, (list, tuple)):
+        return encode_rlp_list([_encode_rlp_item(sub_item) for sub_item in item])
+    return rlp.encode(item)
+
+def _build_account_component_payloads(account) -> Dict[str, list]:
+    """Build the RLP-ready list of every non-empty component of one account."""
+    # rlp.encode takes any sequence; fixed-size entries are tuples, which are
+    # cheaper to allocate than two-element lists. SSZ byte vectors already
+    # hold plain bytes, so they are passed through without bytes(...) calls
+    payloads = {}
+    if account.storage_writes:
+        payloads['storage_writes'] = [
+            (storage_access.slot, [(change.tx_index, change.new_value) for change in storage_access.changes])
+            for storage_access in account.storage_writes
         ]
-        
-        accounts_data.append(account_data)
-    
-    return rlp.encode(accounts_data)
+    if account.balance_changes:
+        # RLP encodes an integer as its minimal big-endian bytes, so stripping the
+        # leading zeros of the 16-byte balance gives the same encoding as
+        # int.from_bytes without building the int
+        payloads['balance_changes'] = [
+            (change.tx_index, change.post_balance.lstrip(b"\x00"))
+            for change in account.balance_changes
+        ]
+    if account.nonce_changes:
+        payloads['nonce_changes'] = [(change.tx_index, change.new_nonce) for change in account.nonce_changes]
+    if account.code_changes:
+        payloads['code_changes'] = [(change.tx_index, change.new_code) for change in account.code_changes]
+    return payloads
+
+def _encode_storage_reads(slots) -> bytes:
+    """RLP-encode a non-empty list of 32-byte storage keys."""
+    # Every slot is exactly 32 bytes, so every item header is the constant
+    # 0xa0 and the whole payload is a single join
+    return encode_rlp_list([b"\xa0" + b"\xa0".join(slots)])
+
+def encode_bal_components(bal: BlockAccessList) -> List[Tuple[bytes, Dict[str, bytes]]]:
+    """
+    RLP-encode every component of every account exactly once.
+    The result can be passed to both `encode_bal_to_rlp` and
+    `get_rlp_component_sizes`, so a block measured both ways is only walked
+    and encoded once.
+    """
+    components = []
+    for account in bal.account_changes:
+        # Most accounts only touch one or two components; the others share the
+        # constant empty-list encoding instead of going through the encoder
+        encoded = dict.fromkeys(RLP_COMPONENTS, _EMPTY_RLP_LIST)
+        for name, payload in _build_account_component_payloads(account).items():
+            encoded[name] = _encode_rlp_item(payload)
+        if account.storage_reads:
+            encoded['storage_reads'] = _encode_storage_reads(account.storage_reads)
+        components.append((account.address, encoded))
+    return components
+
+def encode_bal_to_rlp(bal: BlockAccessList,
+                      components: Optional[List[Tuple[bytes, Dict[str, bytes]]]] = None) -> bytes:
+    """Convert SSZ BlockAccessList to RLP format."""
+    if components is None:
+        components = encode_bal_components(bal)
+
+    # Each account is [address, *components]; the component encodings are
+    # reused as-is and only the list headers are added around them. One
+    # scratch list holds the parts of the current account and is refilled in
+    # place (same-length slice assignment never reallocates) for every account
+    account_parts = [b""] * (1 + len(RLP_COMPONENTS))
+    accounts = []
+    for address, encoded in components:
+        account_parts[0] = _encode_rlp_bytes(address)
+        account_parts[1:] = map(encoded.__getitem__, RLP_COMPONENTS)
+        accounts.append(encode_rlp_list(account_parts))
+    return encode_rlp_list(accounts)
 
 def get_rlp_compressed_size(data: bytes) -> float:
     """Get compressed size of RLP data in KB."""
     return get_compressed_size(data)
 
-def get_rlp_component_sizes(bal: BlockAccessList) -> Dict[str, float]:
-    
-    storage_writes_size = 0
-    storage_reads_size = 0
-    balance_changes_size = 0
-    nonce_changes_size = 0
-    code_changes_size = 0
-    
-    for account in bal.account_changes:
-        if account.storage_writes:
-            writes_data = []
-            for storage_access in account.storage_writes:
-                slot_bytes = bytes(storage_access.slot)
-                changes_data = []
-                for change in storage_access.changes:
-                    changes_data.append([change.tx_index, bytes(change.new_value)])
-                writes_data.append([slot_bytes, changes_data])
-            storage_writes_size += len(rlp.encode(writes_data))
-        
-        if account.storage_reads:
-            reads_data = [bytes(slot) for slot in account.storage_reads]
-            storage_reads_size += len(rlp.encode(reads_data))
-        
-        if account.balance_changes:
-            balance_data = []
-            for change in account.balance_changes:
-                balance_int = int.from_bytes(bytes(change.post_balance), 'big')
-                balance_data.append([change.tx_index, balance_int])
-            balance_changes_size += len(rlp.encode(balance_data))
-        
-        if account.nonce_changes:
-            nonce_data = [[change.tx_index, change.new_nonce] for change in account.nonce_changes]
-            nonce_changes_size += len(rlp.encode(nonce_data))
-        
-        if account.code_changes:
-            code_data = [[change.tx_index, bytes(change.new_code)] for change in account.code_changes]
-            code_changes_size += len(rlp.encode(code_data))
-    
-    storage_writes_kb = get_compressed_size(rlp.encode(storage_writes_size)) if storage_writes_size else 0
-    storage_reads_kb = get_compressed_size(rlp.encode(storage_reads_size)) if storage_reads_size else 0
-    balance_kb = get_compressed_size(rlp.encode(balance_changes_size)) if balance_changes_size else 0
-    nonce_kb = get_compressed_size(rlp.encode(nonce_changes_size)) if nonce_changes_size else 0
-    code_kb = get_compressed_size(rlp.encode(code_changes_size)) if code_changes_size else 0
+def get_rlp_component_sizes(bal: BlockAccessList,
+                            components: Optional[List[Tuple[bytes, Dict[str, bytes]]]] = None) -> Dict[str, float]:
+    if components is None:
+        components = encode_bal_components(bal)
+
+    # Collect the actual encoded bytes of each component (not just their
+    # lengths) so every component is compressed once, as one buffer
+    buffers = {name: [] for name in RLP_COMPONENTS}
+    for _, encoded in components:
+        for name in RLP_COMPONENTS:
+            component = encoded[name]
+            if component != _EMPTY_RLP_LIST:
+                buffers[name].append(component)
+
+    kb = {
+        name: get_compressed_size(b"".join(parts)) if parts else 0
+        for name, parts in buffers.items()
+    }
+    storage_writes_kb = kb['storage_writes']
+    storage_reads_kb = kb['storage_reads']
+    balance_kb = kb['balance_changes']
+    nonce_kb = kb['nonce_changes']
+    code_kb = kb['code_changes']
     
     total_storage_size = storage_writes_kb + storage_reads_kb
     total_size = total_storage_size + balance_kb + code_kb + nonce_kb
@@ -151,6 +175,65 @@ def get_rlp_component_sizes(bal: BlockAccessList) -> Dict[str, float]:
         'total_kb': total_size,
     }
 
+def process_block(block_number: int, ignore_reads: bool, bal_raw_dir: str, reads_suffix: str) -> Dict:
+    """Fetch, build, RLP-encode and write the BAL of one block; returns its stats entry."""
+    print(f"\nProcessing block {block_number}...")
+    trace_result, receipts, block_info = fetch_block_bundle(block_number, RPC_URL)
+    
+    block_reads = None
+    if not ignore_reads:
+        print(f"  Fetching reads for block {block_number}...")
+        block_reads = extract_reads_from_block(block_number, RPC_URL)
+
+    print(f"  Fetching balance touches for block {block_number}...")
+    balance_touches = extract_balance_touches_from_block(block_number, RPC_URL)
+    
+    reverted_tx_indices = get_reverted_tx_indices(receipts)
+    if reverted_tx_indices:
+        print(f"    Found {len(reverted_tx_indices)} reverted transactions: {sorted(reverted_tx_indices)}")
+
+    builder = BALBuilder()
+    
+    # One walk over the trace feeds storage, balance, code and nonce changes
+    touched_addresses, _, _ = process_trace(
+        trace_result, builder, block_reads, ignore_reads,
+        balance_touches, reverted_tx_indices, block_info, receipts,
+    )
+    
+    # Process system contract changes with tx_index = len(transactions)
+    tx_count = len(block_info.get('transactions', []))
+    process_system_contract_changes(block_info, builder, tx_count)
+    
+    if not ignore_reads:
+        builder.add_touched_accounts(map(canonical_address, touched_addresses))
+    
+    # build() already emits accounts, slots and changes in canonical order
+    block_obj_sorted = builder.build(ignore_reads=ignore_reads)
+    
+    full_block_encoded = encode_bal_to_rlp(block_obj_sorted)
+
+    filename = f"{block_number}_{reads_suffix}.rlp"
+    filepath = os.path.join(bal_raw_dir, filename)
+    
+    with open(filepath, "wb") as f:
+        f.write(full_block_encoded)
+
+    raw_size = len(full_block_encoded)
+    compressed_size = get_rlp_compressed_size(full_block_encoded)
+    
+    print(f"  Raw size: {raw_size:,} bytes")
+    print(f"  Compressed size: {compressed_size:.2f} KB")
+    print(f"  Saved to: {filepath}")
+
+    bal_stats = get_account_stats(block_obj_sorted)
+
+    return {
+        "block_number": block_number,
+        "raw_size": raw_size,
+        "compressed_size_kb": compressed_size,
+        "bal_stats": bal_stats,
+    }
+
 def main():
     global IGNORE_STORAGE_LOCATIONS
     
@@ -158,6 +241,8 @@ def main():
     parser.add_argument('--no-reads', action='store_true', 
                         help='Ignore storage read locations (only include writes)')
     parser.add_argument('--block', type=int, help='Process a single block number')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for building BALs (default: one per CPU core)')
     args = parser.parse_args()
     
     IGNORE_STORAGE_LOCATIONS = args.no_reads
@@ -169,84 +254,25 @@ def main():
     else:
         blocks_to_process = range(22886914 - 500, 22886914, 100)[:5]
     
-    totals = defaultdict(list)
     block_totals = []
     data = []
 
-    for block_number in blocks_to_process:
-        print(f"\nProcessing block {block_number}...")
-        trace_result = fetch_block_trace(block_number, RPC_URL)
-        
-        block_reads = None
-        if not IGNORE_STORAGE_LOCATIONS:
-            print(f"  Fetching reads for block {block_number}...")
-            block_reads = extract_reads_from_block(block_number, RPC_URL)
-
-        print(f"  Fetching balance touches for block {block_number}...")
-        balance_touches = extract_balance_touches_from_block(block_number, RPC_URL)
-        
-        print(f"  Fetching transaction receipts for block {block_number}...")
-        receipts = fetch_block_receipts(block_number, RPC_URL)
-        reverted_tx_indices = set()
-        for i, receipt in enumerate(receipts):
-            if receipt and receipt.get("status") == "0x0":
-                reverted_tx_indices.add(i)
-        if reverted_tx_indices:
-            print(f"    Found {len(reverted_tx_indices)} reverted transactions: {sorted(reverted_tx_indices)}")
-            
-        print(f"  Fetching block info...")
-        block_info = fetch_block_info(block_number, RPC_URL)
-
-        builder = BALBuilder()
-        
-        touched_addresses = collect_touched_addresses(trace_result)
-        
-        process_storage_changes(trace_result, block_reads, IGNORE_STORAGE_LOCATIONS, builder, reverted_tx_indices)
-        process_balance_changes(trace_result, builder, touched_addresses, balance_touches, reverted_tx_indices, block_info, receipts, IGNORE_STORAGE_LOCATIONS)
-        process_code_changes(trace_result, builder, reverted_tx_indices)
-        process_nonce_changes(trace_result, builder, reverted_tx_indices)
-        
-        # Process system contract changes with tx_index = len(transactions)
-        tx_count = len(block_info.get('transactions', []))
-        process_system_contract_changes(block_info, builder, tx_count)
-        
-        if not IGNORE_STORAGE_LOCATIONS:
-            for addr in touched_addresses:
-                canonical = to_canonical_address(addr)
-                builder.add_touched_account(canonical)
-        
-        block_obj = builder.build(ignore_reads=IGNORE_STORAGE_LOCATIONS)
-        block_obj_sorted = sort_block_access_list(block_obj)
-        
-        full_block_encoded = encode_bal_to_rlp(block_obj_sorted)
-
-        bal_raw_dir = os.path.join(project_root, "bal_raw", "rlp")
-        os.makedirs(bal_raw_dir, exist_ok=True)
-        
-        reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-        filename = f"{block_number}_{reads_suffix}.rlp"
-        filepath = os.path.join(bal_raw_dir, filename)
-        
-        with open(filepath, "wb") as f:
-            f.write(full_block_encoded)
-
-        raw_size = len(full_block_encoded)
-        compressed_size = get_rlp_compressed_size(full_block_encoded)
-        
-        print(f"  Raw size: {raw_size:,} bytes")
-        print(f"  Compressed size: {compressed_size:.2f} KB")
-        print(f"  Saved to: {filepath}")
-
-        bal_stats = get_account_stats(block_obj_sorted)
-
-        data.append({
-            "block_number": block_number,
-            "raw_size": raw_size,
-            "compressed_size_kb": compressed_size,
-            "bal_stats": bal_stats,
-        })
+    bal_raw_dir = os.path.join(project_root, "bal_raw", "rlp")
+    os.makedirs(bal_raw_dir, exist_ok=True)
+    reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
 
-        block_totals.append(compressed_size)
+    # Blocks are independent: build them in parallel worker processes, each
+    # doing its own RPC round-trips; map() still yields the stats in block order
+    block_worker = partial(
+        process_block,
+        ignore_reads=IGNORE_STORAGE_LOCATIONS,
+        bal_raw_dir=bal_raw_dir,
+        reads_suffix=reads_suffix,
+    )
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as executor:
+        for entry in executor.map(block_worker, blocks_to_process):
+            data.append(entry)
+            block_totals.append(entry["compressed_size_kb"])
 
     if len(blocks_to_process) > 1:
         print("\nSummary:")
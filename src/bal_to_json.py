@@ -18,52 +18,66 @@ def bytes_to_hex(b):
     """Convert bytes to hex string"""
     return '0x' + b.hex()
 
-def bal_to_dict(bal):
-    """Convert BlockAccessList to JSON-serializable dict"""
+def account_to_dict(account):
+    """Convert one AccountChanges entry to a JSON-serializable dict"""
     return {
-        "account_changes": [
+        "address": bytes_to_hex(account.address),
+        "storage_writes": [
             {
-                "address": bytes_to_hex(account.address),
-                "storage_writes": [
-                    {
-                        "slot": bytes_to_hex(sw.slot),
-                        "changes": [
-                            {
-                                "tx_index": change.tx_index,
-                                "new_value": bytes_to_hex(change.new_value)
-                            }
-                            for change in sw.changes
-                        ]
-                    }
-                    for sw in account.storage_writes
-                ],
-                "storage_reads": [bytes_to_hex(slot) for slot in account.storage_reads],
-                "balance_changes": [
-                    {
-                        "tx_index": bc.tx_index,
-                        "post_balance": bytes_to_hex(bc.post_balance)
-                    }
-                    for bc in account.balance_changes
-                ],
-                "nonce_changes": [
-                    {
-                        "tx_index": nc.tx_index,
-                        "new_nonce": nc.new_nonce
-                    }
-                    for nc in account.nonce_changes
-                ],
-                "code_changes": [
+                "slot": bytes_to_hex(sw.slot),
+                "changes": [
                     {
-                        "tx_index": cc.tx_index,
-                        "new_code": bytes_to_hex(cc.new_code)
+                        "tx_index": change.tx_index,
+                        "new_value": bytes_to_hex(change.new_value)
                     }
-                    for cc in account.code_changes
+                    for change in sw.changes
                 ]
             }
-            for account in bal.account_changes
+            for sw in account.storage_writes
+        ],
+        "storage_reads": [bytes_to_hex(slot) for slot in account.storage_reads],
+        "balance_changes": [
+            {
+                "tx_index": bc.tx_index,
+                "post_balance": bytes_to_hex(bc.post_balance)
+            }
+            for bc in account.balance_changes
+        ],
+        "nonce_changes": [
+            {
+                "tx_index": nc.tx_index,
+                "new_nonce": nc.new_nonce
+            }
+            for nc in account.nonce_changes
+        ],
+        "code_changes": [
+            {
+                "tx_index": cc.tx_index,
+                "new_code": bytes_to_hex(cc.new_code)
+            }
+            for cc in account.code_changes
         ]
     }
 
+def bal_to_dict(bal):
+    """Convert BlockAccessList to JSON-serializable dict"""
+    return {"account_changes": [account_to_dict(account) for account in bal.account_changes]}
+
+def write_bal_json(bal, f):
+    """
+    Stream BlockAccessList to f as JSON, one account at a time.
+    The output is identical to json.dump(bal_to_dict(bal), f, indent=2), but
+    only a single account's dict tree is alive at any point.
+    """
+    f.write('{\n  "account_changes": [')
+    separator = "\n    "
+    for account in bal.account_changes:
+        # json.dumps escapes newlines inside strings, so every raw newline is
+        # structural and can be re-indented to the account's nesting level
+        f.write(separator + json.dumps(account_to_dict(account), indent=2).replace("\n", "\n    "))
+        separator = ",\n    "
+    f.write("]\n}" if separator == "\n    " else "\n  ]\n}")
+
 def main():
     parser = argparse.ArgumentParser(description='Convert SSZ BAL files to JSON')
     parser.add_argument('input_file', help='Input SSZ BAL file')
@@ -76,15 +90,12 @@ def main():
     
     bal = ssz.decode(encoded_data, BlockAccessList)
     
-    # Convert to JSON
-    json_data = bal_to_dict(bal)
-    
     # Determine output file
     output_file = args.output or f"{args.input_file}.json"
     
-    # Write JSON
+    # Convert and write JSON
     with open(output_file, 'w') as f:
-        json.dump(json_data, f, indent=2)
+        write_bal_json(bal, f)
     
     print(f"Converted {args.input_file} to {output_file}")
 
@@ -1,8 +1,19 @@
+import os
+import asyncio
+import threading
 import pandas as pd
 import requests
+import ijson
+import orjson
+import zstandard
 import snappy as snappy_compression
 import rlp
 import ssz
+import numpy as np
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+from eth_utils import to_canonical_address
 
 
 def count_accounts_and_slots(trace_result):
@@ -11,14 +22,26 @@ def count_accounts_and_slots(trace_result):
 
     for tx in trace_result:
         post = tx.get("result", {}).get("post", {})
-        for addr, changes in post.items():
-            accounts_set.add(addr)
-            if "storage" in changes:
-                total_slots += len(changes["storage"])
+        accounts_set.update(post)
+        total_slots += sum([len(changes["storage"]) for changes in post.values() if "storage" in changes])
 
     return len(accounts_set), total_slots
 
 
+# A requests.Session keeps connections to the RPC node alive between calls.
+# Sessions must not be shared across threads or forked worker processes, so
+# each thread of each process lazily opens its own.
+_http_contexts = threading.local()
+
+
+def _http_session():
+    session = getattr(_http_contexts, "session", None)
+    if session is None or _http_contexts.pid != os.getpid():
+        session = _http_contexts.session = requests.Session()
+        _http_contexts.pid = os.getpid()
+    return session
+
+
 def get_tracer_payload(block_number_hex, diff_mode=True):
     return {
         "method": "debug_traceBlockByNumber",
@@ -40,10 +63,10 @@ def fetch_block_info(block_number: int, rpc_url: str) -> dict:
         "id": 1
     }
     
-    response = requests.post(rpc_url, json=payload)
+    response = _http_session().post(rpc_url, json=payload)
     response.raise_for_status()
     
-    result = response.json()
+    result = orjson.loads(response.content)
     if "error" in result:
         raise Exception(f"RPC error: {result['error']}")
     
@@ -58,26 +81,240 @@ def fetch_block_receipts(block_number: int, rpc_url: str) -> dict:
         "id": 1
     }
     
-    response = requests.post(rpc_url, json=payload)
+    response = _http_session().post(rpc_url, json=payload)
     response.raise_for_status()
     
-    result = response.json()
+    result = orjson.loads(response.content)
     if "error" in result:
         raise Exception(f"RPC error: {result['error']}")
     
     return result.get("result", {})
 
+def get_reverted_tx_indices(receipts) -> frozenset:
+    """Indices of the transactions whose receipt reports a failed (reverted) status"""
+    return frozenset(
+        i for i, receipt in enumerate(receipts) if receipt and receipt.get("status") == "0x0"
+    )
+
+# Directory for zstd-compressed raw trace responses; None disables the cache.
+TRACE_CACHE_DIR = None
+
+
+# zstd contexts are reusable but not thread-safe, and traces are fetched
+# from worker threads; keep one compressor/decompressor pair per thread.
+_zstd_contexts = threading.local()
+
+
+def _zstd_compressor():
+    cctx = getattr(_zstd_contexts, "cctx", None)
+    if cctx is None:
+        cctx = _zstd_contexts.cctx = zstandard.ZstdCompressor(level=3)
+    return cctx
+
+
+def _zstd_decompressor():
+    dctx = getattr(_zstd_contexts, "dctx", None)
+    if dctx is None:
+        dctx = _zstd_contexts.dctx = zstandard.ZstdDecompressor()
+    return dctx
+
+
+def write_zstd(path, data):
+    """Write ``data`` zstd-compressed to ``path`` with this thread's reusable compressor."""
+    with open(path, "wb") as f:
+        f.write(_zstd_compressor().compress(data))
+
+
+def _trace_cache_path(block_number, diff_mode):
+    mode = "diff" if diff_mode else "prestate"
+    return os.path.join(TRACE_CACHE_DIR, f"{block_number}_{mode}.json.zst")
+
+
 def fetch_block_trace(block_number, rpc_url, diff_mode=True):
+    cache_path = _trace_cache_path(block_number, diff_mode) if TRACE_CACHE_DIR else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            content = _zstd_decompressor().decompress(f.read())
+        return orjson.loads(content)["result"]
+
     block_number_hex = hex(block_number)
     payload = get_tracer_payload(block_number_hex, diff_mode)
-    response = requests.post(rpc_url, json=payload)
-    data = response.json()
+    response = _http_session().post(rpc_url, json=payload)
+    data = orjson.loads(response.content)
     if "error" in data:
         raise Exception(f"RPC Error: {data['error']}")
+
+    if cache_path:
+        os.makedirs(TRACE_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_zstd_compressor().compress(response.content))
+        os.replace(tmp_path, cache_path)
+
     return data["result"]
 
 
+def fetch_block_traces(block_number, rpc_url):
+    """
+    Fetch both the diffMode=true and diffMode=false prestate traces of a block
+    as one JSON-RPC batch, so the node can serve them concurrently.
+
+    Returns:
+        tuple: (diff_trace, prestate_trace)
+    """
+    if TRACE_CACHE_DIR:
+        # Go through the per-mode cache instead of the batch
+        return (
+            fetch_block_trace(block_number, rpc_url, diff_mode=True),
+            fetch_block_trace(block_number, rpc_url, diff_mode=False),
+        )
+
+    block_number_hex = hex(block_number)
+    batch_payload = [
+        {**get_tracer_payload(block_number_hex, diff_mode=True), "id": 1},
+        {**get_tracer_payload(block_number_hex, diff_mode=False), "id": 2},
+    ]
+    response = _http_session().post(rpc_url, json=batch_payload)
+    results = get_batch_results(orjson.loads(response.content), len(batch_payload))
+    return results[0], results[1]
+
+
+def fetch_block_bundle(block_number, rpc_url):
+    """
+    Fetch the diffMode=true trace, the receipts and the block info (with
+    transactions) of a block as one JSON-RPC batch, saving two round-trips.
+
+    Returns:
+        tuple: (trace, receipts, block_info)
+    """
+    if TRACE_CACHE_DIR:
+        # Go through the per-mode trace cache instead of the batch
+        return (
+            fetch_block_trace(block_number, rpc_url),
+            fetch_block_receipts(block_number, rpc_url),
+            fetch_block_info(block_number, rpc_url),
+        )
+
+    block_number_hex = hex(block_number)
+    batch_payload = [
+        {**get_tracer_payload(block_number_hex, diff_mode=True), "id": 1},
+        {"jsonrpc": "2.0", "method": "eth_getBlockReceipts", "params": [block_number_hex], "id": 2},
+        {"jsonrpc": "2.0", "method": "eth_getBlockByNumber", "params": [block_number_hex, True], "id": 3},
+    ]
+    response = _http_session().post(rpc_url, json=batch_payload)
+    response.raise_for_status()
+    results = get_batch_results(orjson.loads(response.content), len(batch_payload))
+    return results[0], results[1], results[2]
+
+
+# Many providers reject or throttle JSON-RPC batches larger than this
+MAX_RPC_BATCH_SIZE = 20
+
+
+def get_batch_tracer_payload(block_numbers, diff_mode=True):
+    """One ``debug_traceBlockByNumber`` request per block, with ids 1..n in block order."""
+    return [
+        {**get_tracer_payload(hex(block_number), diff_mode), "id": i + 1}
+        for i, block_number in enumerate(block_numbers)
+    ]
+
+
+def get_batch_results(batch_data, count):
+    """Return the results of a JSON-RPC batch response ordered by request id (ids 1..count)."""
+    if not isinstance(batch_data, list):
+        raise Exception(f"Batch RPC Error: {batch_data.get('error', 'Unknown error')}")
+
+    results = [None] * count
+    for item in batch_data:
+        if "error" in item:
+            raise Exception(f"RPC Error: {item['error']}")
+        results[item["id"] - 1] = item["result"]
+    return results
+
+
+def fetch_block_traces_batch(block_numbers, rpc_url, diff_mode=True):
+    """
+    Fetch the traces of several blocks (at most ``MAX_RPC_BATCH_SIZE``) in one
+    JSON-RPC batch request. Returns the traces in the order of ``block_numbers``.
+    """
+    if len(block_numbers) > MAX_RPC_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(block_numbers)} blocks exceeds {MAX_RPC_BATCH_SIZE}")
+    if TRACE_CACHE_DIR:
+        return [fetch_block_trace(block_number, rpc_url, diff_mode) for block_number in block_numbers]
+
+    batch_payload = get_batch_tracer_payload(block_numbers, diff_mode)
+    response = _http_session().post(rpc_url, json=batch_payload)
+    return get_batch_results(orjson.loads(response.content), len(batch_payload))
+
+
+def stream_block_trace(block_number, rpc_url, diff_mode=True):
+    """Like ``fetch_block_trace`` but yields one tx trace at a time while the response is parsed."""
+    if TRACE_CACHE_DIR:
+        # The cache stores whole responses, so serve (and fill) it without streaming
+        yield from fetch_block_trace(block_number, rpc_url, diff_mode)
+        return
+
+    block_number_hex = hex(block_number)
+    payload = get_tracer_payload(block_number_hex, diff_mode)
+    with _http_session().post(rpc_url, json=payload, stream=True) as response:
+        response.raw.decode_content = True
+        builder, root = None, None
+        for prefix, event, value in ijson.parse(response.raw):
+            if builder is None:
+                if prefix == "error" and event not in ("start_map", "start_array"):
+                    raise Exception(f"RPC Error: {value}")
+                if prefix not in ("result.item", "error") or event not in ("start_map", "start_array"):
+                    continue
+                builder, root = ijson.ObjectBuilder(), prefix
+            builder.event(event, value)
+            if prefix == root and event in ("end_map", "end_array"):
+                if root == "error":
+                    raise Exception(f"RPC Error: {builder.value}")
+                yield builder.value
+                builder = None
+
+
+# aiohttp's json= serializes with the stdlib encoder; send orjson bytes instead
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def fetch_block_trace_async(session, block_number, rpc_url, diff_mode=True):
+    """``fetch_block_trace`` over a shared ``aiohttp.ClientSession``, for fetching many blocks concurrently."""
+    if TRACE_CACHE_DIR:
+        return await asyncio.to_thread(fetch_block_trace, block_number, rpc_url, diff_mode)
+
+    block_number_hex = hex(block_number)
+    payload = get_tracer_payload(block_number_hex, diff_mode)
+    async with session.post(rpc_url, data=orjson.dumps(payload), headers=JSON_HEADERS) as response:
+        data = orjson.loads(await response.read())
+    if "error" in data:
+        raise Exception(f"RPC Error: {data['error']}")
+    return data["result"]
+
+
+async def fetch_block_traces_batch_async(session, block_numbers, rpc_url, diff_mode=True):
+    """
+    Fetch the traces of several blocks (at most ``MAX_RPC_BATCH_SIZE``) in one
+    JSON-RPC batch request. Returns the traces in the order of ``block_numbers``.
+    """
+    if len(block_numbers) > MAX_RPC_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(block_numbers)} blocks exceeds {MAX_RPC_BATCH_SIZE}")
+    if TRACE_CACHE_DIR:
+        return await asyncio.gather(*(
+            fetch_block_trace_async(session, block_number, rpc_url, diff_mode)
+            for block_number in block_numbers
+        ))
+
+    batch_payload = get_batch_tracer_payload(block_numbers, diff_mode)
+    async with session.post(rpc_url, data=orjson.dumps(batch_payload), headers=JSON_HEADERS) as response:
+        batch_data = orjson.loads(await response.read())
+    return get_batch_results(batch_data, len(batch_payload))
+
+
 def parse_hex_or_zero(x):
+    # Trace values are almost always 0x-prefixed hex; skip the generic checks for them
+    if type(x) is str and x[:2] == "0x":
+        return int(x, 16)
     if pd.isna(x) or x is None:
         return 0
     if isinstance(x, (int, float)):
@@ -90,43 +327,176 @@ def parse_hex_or_zero(x):
     return 0
 
 
+def parse_nonce(nonce) -> int:
+    """Parse a nonce as reported by prestateTracer: a JSON number, a 0x-hex or a decimal string."""
+    # Ints are the common case, so check the exact type before any string work
+    if type(nonce) is int:
+        return nonce
+    if type(nonce) is str and nonce[:2] == "0x":
+        return int(nonce, 16)
+    return int(nonce)
+
+
+def get_compressed_bytes(obj) -> bytes:
+    """Snappy-compress obj (raw block format), for callers that need the payload itself."""
+    return snappy_compression.compress(obj)
+
+
+# Buffers up to this size are memoized by content: tiny payloads (empty lists,
+# single changes, short code) recur constantly and hashing them is cheaper
+# than compressing them again. Larger buffers are practically never repeated.
+_SMALL_COMPRESSED_LEN_LIMIT = 256
+
+
+@lru_cache(maxsize=16_384)
+def _small_compressed_len(data: bytes) -> int:
+    return len(snappy_compression.compress(data))
+
+
+def _compressed_len(data) -> int:
+    if type(data) is bytes and len(data) <= _SMALL_COMPRESSED_LEN_LIMIT:
+        return _small_compressed_len(data)
+    return len(snappy_compression.compress(data))
+
+
 def get_compressed_size(obj, extra_data=None):
-    compressed_data = snappy_compression.compress(obj)
-    compressed_size = len(compressed_data)
+    # Only the length is kept, so each compressed buffer is freed right away.
+    # The framed snappy.StreamCompressor would avoid no copy here and adds
+    # chunk headers and CRCs, which would change the reported sizes
+    compressed_size = _compressed_len(obj)
 
     # If extra data is provided (like contract code), compress that too
     if extra_data:
         for data in extra_data:
             if data:
-                compressed_size += len(snappy_compression.compress(data))
+                compressed_size += _compressed_len(data)
 
     return compressed_size / 1024
 
 
+@lru_cache(maxsize=200_000)
+def canonical_address(address: str) -> bytes:
+    """Memoized ``to_canonical_address``; the same addresses recur many times per block."""
+    # Trace addresses are 0x-prefixed 40-char hex: decode those directly and
+    # leave validation of anything else to eth_utils
+    if len(address) == 42 and address[:2] == "0x":
+        try:
+            raw = bytes.fromhex(address[2:])
+        except ValueError:
+            raw = b""
+        if len(raw) == 20:
+            return raw
+    return to_canonical_address(address)
+
+
 def hex_to_bytes32(hexstr: str) -> bytes:
     """Convert a hex string like '0x...' into exactly 32 bytes (big‐endian)."""
+    # Full-width slots and values are the common case and need no padding
+    if len(hexstr) == 66 and hexstr[:2] == "0x":
+        return bytes.fromhex(hexstr[2:])
     no_pref = hexstr[2:] if hexstr.startswith("0x") else hexstr
     raw = bytes.fromhex(no_pref)
     return raw.rjust(32, b"\x00")
 
 
-def get_rlp_compressed_size(obj, extra_data=None):
-    """Get snappy-compressed size of RLP object in KiB"""
-    if isinstance(obj, bytes):
-        compressed_data = snappy.compress(obj)
-    else:
-        rlp_encoded = rlp.encode(obj)
-        compressed_data = snappy.compress(rlp_encoded)
-    
-    compressed_size = len(compressed_data)
+_ZERO_HEX64 = "0" * 64
 
-    # If extra data is provided (like contract code), compress that too
-    if extra_data:
-        for data in extra_data:
-            if data:
-                compressed_size += len(snappy.compress(data))
 
-    return compressed_size / 1024
+def _hex64(hexstr: Optional[str]) -> str:
+    """Left-pad a storage hex string to 64 digits; None (absent) is zero."""
+    if hexstr is None:
+        return _ZERO_HEX64
+    return (hexstr[2:] if hexstr.startswith("0x") else hexstr).rjust(64, "0")
+
+
+class PendingStorageWrites:
+    """
+    Candidate storage writes of a block, queued during the trace scan and
+    compared in bulk by `changed_writes`.
+
+    Candidates are kept as parallel arrays (interned address id, interned
+    slot id, tx index, raw pre/post hex) rather than a tuple per slot, so
+    the per-slot hot loop only appends to flat containers.
+    """
+
+    def __init__(self):
+        self.address_ids: Dict[str, int] = {}
+        self.addresses: List[str] = []
+        self.slot_ids: Dict[str, int] = {}
+        self.slots: List[str] = []
+        self.write_address_ids = array("I")
+        self.write_slot_ids = array("I")
+        self.write_tx_ids = array("I")
+        self.pre_values: List[Optional[str]] = []
+        self.post_values: List[str] = []
+
+    def add(self, tx_id: int, address: str, pre_storage: dict, post_storage: dict) -> None:
+        address_id = self.address_ids.get(address)
+        if address_id is None:
+            address_id = self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+
+        slot_ids, slots = self.slot_ids, self.slots
+        write_slot_ids = self.write_slot_ids
+        pre_values, post_values = self.pre_values, self.post_values
+        count = len(post_values)
+        for slot, post_val in post_storage.items():
+            if post_val is None:
+                continue
+            pre_val = pre_storage.get(slot)
+            # Identical strings decode identically; only differing spellings
+            # (e.g. "0x0" vs the zero-padded form) need the decoded compare
+            if post_val == pre_val:
+                continue
+            slot_id = slot_ids.get(slot)
+            if slot_id is None:
+                slot_id = slot_ids[slot] = len(slots)
+                slots.append(slot)
+            write_slot_ids.append(slot_id)
+            pre_values.append(pre_val)
+            post_values.append(post_val)
+
+        added = len(post_values) - count
+        self.write_address_ids.extend([address_id] * added)
+        self.write_tx_ids.extend([tx_id] * added)
+
+    def changed_writes(self) -> Iterator[Tuple[str, str, int, str]]:
+        """
+        Yield (address, slot, tx_id, post_value) for every candidate whose
+        value actually changed, in trace order. All pre/post values are
+        decoded into two (N, 32) uint8 arrays and compared in one vectorized pass.
+        """
+        post_values = self.post_values
+        if not post_values:
+            return
+
+        pre_buf = bytes.fromhex("".join([_hex64(value) for value in self.pre_values]))
+        post_buf = bytes.fromhex("".join([_hex64(value) for value in post_values]))
+        pre = np.frombuffer(pre_buf, dtype=np.uint8).reshape(-1, 32)
+        post = np.frombuffer(post_buf, dtype=np.uint8).reshape(-1, 32)
+        changed = np.any(pre != post, axis=1)
+
+        addresses, slots = self.addresses, self.slots
+        write_address_ids, write_slot_ids = self.write_address_ids, self.write_slot_ids
+        write_tx_ids = self.write_tx_ids
+        for i in np.flatnonzero(changed).tolist():
+            yield addresses[write_address_ids[i]], slots[write_slot_ids[i]], write_tx_ids[i], post_values[i]
+
+
+def encode_rlp_list(encoded_items) -> bytes:
+    """RLP-encode a list whose items are already RLP-encoded."""
+    payload = b"".join(encoded_items)
+    length = len(payload)
+    if length < 56:
+        return bytes([0xC0 + length]) + payload
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, byteorder='big')
+    return bytes([0xF7 + len(length_bytes)]) + length_bytes + payload
+
+
+def get_rlp_compressed_size(obj, extra_data=None):
+    """Get snappy-compressed size of RLP object in KiB"""
+    rlp_encoded = obj if isinstance(obj, bytes) else rlp.encode(obj)
+    return get_compressed_size(rlp_encoded, extra_data)
 
 
 def compare_ssz_rlp_sizes(ssz_obj, rlp_obj, ssz_sedes=None):
@@ -259,8 +629,8 @@ def fetch_block_with_transactions(block_number, rpc_url):
         "id": 1,
         "jsonrpc": "2.0",
     }
-    response = requests.post(rpc_url, json=payload)
-    data = response.json()
+    response = _http_session().post(rpc_url, json=payload)
+    data = orjson.loads(response.content)
     if "error" in data:
         raise Exception(f"RPC Error: {data['error']}")
     return data["result"]
@@ -285,8 +655,8 @@ def fetch_transaction_receipts_batch(block_number, rpc_url):
         "id": 1,
         "jsonrpc": "2.0",
     }
-    response = requests.post(rpc_url, json=payload)
-    data = response.json()
+    response = _http_session().post(rpc_url, json=payload)
+    data = orjson.loads(response.content)
     
     if "error" not in data and data.get("result"):
         return data["result"]
@@ -308,8 +678,8 @@ def fetch_transaction_receipts_batch(block_number, rpc_url):
             "jsonrpc": "2.0",
         })
     
-    response = requests.post(rpc_url, json=batch_payload)
-    batch_data = response.json()
+    response = _http_session().post(rpc_url, json=batch_payload)
+    batch_data = orjson.loads(response.content)
     
     # Sort responses by id to maintain order
     if isinstance(batch_data, list):
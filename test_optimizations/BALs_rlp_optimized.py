@@ -39,6 +39,8 @@ class AccountWritesRLP(Serializable):
         ('slot_writes', CountableList(SlotWriteRLP)),
     ]
 
+AccountWritesListRLP = CountableList(AccountWritesRLP)
+
 # Storage Read structures (read-only slots - much more compact)
 class SlotReadRLP(Serializable):
     fields = [
@@ -51,6 +53,8 @@ class AccountReadsRLP(Serializable):
         ('slot_reads', CountableList(SlotReadRLP)),
     ]
 
+AccountReadsListRLP = CountableList(AccountReadsRLP)
+
 def estimate_size_bytes(obj):
     return len(json.dumps(obj).encode('utf-8'))
 
@@ -68,6 +72,8 @@ class AccountBalanceDiffRLP(Serializable):
         ("changes", CountableList(BalanceChangeRLP)),
     ]
 
+BalanceDiffsRLP = CountableList(AccountBalanceDiffRLP)
+
 # NONCE DIFF
 class TxNonceDiffRLP(Serializable):
     fields = [
@@ -81,6 +87,8 @@ class AccountNonceDiffRLP(Serializable):
         ("changes", CountableList(TxNonceDiffRLP)),
     ]
 
+NonceDiffsRLP = CountableList(AccountNonceDiffRLP)
+
 
 class CodeChangeRLP(Serializable):
     fields = [
@@ -94,15 +102,17 @@ class AccountCodeDiffRLP(Serializable):
         ("change", CodeChangeRLP),
     ]
 
+CodeDiffsRLP = CountableList(AccountCodeDiffRLP)
+
 
 # Optimized BlockAccessList that separates reads from writes  
 class BlockAccessListRLP(Serializable):
     fields = [
-        ('storage_writes', CountableList(AccountWritesRLP)),
-        ('storage_reads', CountableList(AccountReadsRLP)),
-        ('balance_diffs', CountableList(AccountBalanceDiffRLP)),
-        ('code_diffs', CountableList(AccountCodeDiffRLP)),
-        ('nonce_diffs', CountableList(AccountNonceDiffRLP)),
+        ('storage_writes', AccountWritesListRLP),
+        ('storage_reads', AccountReadsListRLP),
+        ('balance_diffs', BalanceDiffsRLP),
+        ('code_diffs', CodeDiffsRLP),
+        ('nonce_diffs', NonceDiffsRLP),
     ]
 
 
@@ -110,10 +120,8 @@ class BlockAccessListRLP(Serializable):
 
 def encode_balance_delta(delta_int):
     """Convert integer balance delta to 12-byte signed representation"""
-    if delta_int >= 0:
-        return delta_int.to_bytes(12, byteorder='big', signed=False)
-    else:
-        return delta_int.to_bytes(12, byteorder='big', signed=True)
+    # Positive deltas keep the full unsigned 96-bit range
+    return delta_int.to_bytes(12, byteorder='big', signed=delta_int < 0)
 
 def decode_balance_delta(delta_bytes):
     """Convert 12-byte signed representation back to integer"""
@@ -135,6 +143,17 @@ def encode_storage_value(value_hex):
         value_int = value_hex
     return value_int.to_bytes(32, byteorder='big')
 
+def encode_storage_keys(keys_hex):
+    """Convert many 0x-prefixed hex storage keys to 32-byte binaries in one decode"""
+    # One bytes.fromhex over the padded, joined digits instead of an int
+    # round-trip per key; the result is split back into 32-byte words
+    raw = bytes.fromhex("".join([key_hex[2:].rjust(64, "0") for key_hex in keys_hex]))
+    return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+def encode_storage_values(values_hex):
+    """Convert many 0x-prefixed hex storage values to 32-byte binaries in one decode"""
+    return encode_storage_keys(values_hex)
+
 def encode_address(addr_hex):
     """Convert hex address to 20-byte binary"""
     if isinstance(addr_hex, str):
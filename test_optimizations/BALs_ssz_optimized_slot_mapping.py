@@ -2,7 +2,7 @@ import os
 import pandas as pd
 import json
 from collections import defaultdict
-from typing import List as PyList, Optional, Dict
+from typing import Iterable, List as PyList, Optional, Dict, Union
 
 import ssz
 from ssz import Serializable
@@ -16,6 +16,7 @@ MAX_ACCOUNTS = 300_000
 MAX_CODE_SIZE = 24_576  # Maximum contract bytecode size in bytes
 MAX_UNIQUE_SLOTS = 65_535  # Maximum number of unique storage slots per block
 MAX_UNIQUE_ADDRESSES = 65_535  # Maximum number of unique addresses per block
+MAX_UNIQUE_VALUES = 65_535  # Maximum number of unique written storage values per block
 
 # SSZ type aliases
 Address = ByteVector(20)
@@ -27,9 +28,13 @@ Nonce = uint64
 CodeData = ByteList(MAX_CODE_SIZE)
 SlotIndex = uint16  # Index into the slot mapping table (0-65535)
 AddressIndex = uint16  # Index into the address mapping table (0-65535)
+ValueIndex = uint16  # Index into the value mapping table (0-65535)
 
 def parse_hex_or_zero(x):
-    if pd.isna(x) or x is None:
+    # Balances are hex strings or missing; only other values go through pandas
+    if type(x) is str:
+        return int(x, 16)
+    if x is None or pd.isna(x):
         return 0
     return int(x, 16)
 
@@ -46,18 +51,20 @@ class SlotMapping(Serializable):
         ('slots', SSZList(StorageKey, MAX_UNIQUE_SLOTS)),  # Array of unique storage slots
     ]
 
-
-# Storage Write structures (using slot indices instead of full keys)
-class PerTxWriteIndexed(Serializable):
+# Value mapping structure - maps value indices to actual written storage values
+class ValueMapping(Serializable):
     fields = [
-        ('tx_index', TxIndex),
-        ('value_after', StorageValue),
+        ('values', SSZList(StorageValue, MAX_UNIQUE_VALUES)),  # Array of unique written values
     ]
 
+
+# Storage Write structures (using slot indices instead of full keys)
+# Per-tx writes are stored column-wise: value_indices[i] was written by tx_indices[i]
 class SlotWriteIndexed(Serializable):
     fields = [
         ('slot_index', SlotIndex),  # Index into the slot mapping
-        ('writes', SSZList(PerTxWriteIndexed, MAX_TXS)),
+        ('tx_indices', SSZList(TxIndex, MAX_TXS)),
+        ('value_indices', SSZList(ValueIndex, MAX_TXS)),  # Indices into the value mapping
     ]
 
 class AccountWritesIndexed(Serializable):
@@ -83,6 +90,9 @@ class AccountReadsIndexed(Serializable):
 AccountReadsIndexedList = SSZList(AccountReadsIndexed, MAX_ACCOUNTS)
 
 def estimate_size_bytes(obj):
+    # SSZ containers hold raw bytes that json.dumps cannot serialize; size their encoding instead
+    if isinstance(obj, Serializable):
+        return len(ssz.encode(obj))
     return len(json.dumps(obj).encode('utf-8'))
 
 
@@ -153,6 +163,7 @@ class BlockAccessListOptimizedMappings(Serializable):
     fields = [
         ('address_mapping', AddressMapping),  # Global address mapping for the block
         ('slot_mapping', SlotMapping),  # Global slot mapping for the block
+        ('value_mapping', ValueMapping),  # Global written-value mapping for the block
         ('storage_writes', AccountWritesIndexedList),
         ('storage_reads', AccountReadsIndexedList),
         ('balance_diffs', BalanceDiffs),
@@ -161,146 +172,165 @@ class BlockAccessListOptimizedMappings(Serializable):
     ]
 
 
-class AddressIndexManager:
+def _to_key(value: Union[str, bytes], size: int) -> bytes:
+    """Convert a hex string (with or without 0x prefix) or bytes to a raw `size`-byte key."""
+    if isinstance(value, str):
+        if value.startswith('0x'):
+            value = value[2:]
+        return bytes.fromhex(value.zfill(size * 2))
+    return bytes(value)
+
+
+class _FixedWidthIndexManager:
     """
-    Manages the mapping between addresses and their indices.
-    Provides efficient lookups and ensures unique address assignment.
+    Assigns dense indices, in first-seen order, to fixed-width byte keys.
+    Keys are packed back to back in one buffer; subclasses only build the
+    SSZ mapping container from them.
     """
     
-    def __init__(self):
-        self.address_to_index: Dict[str, int] = {}  # address_hex -> index
-        self.index_to_address: Dict[int, str] = {}  # index -> address_hex
+    def __init__(self, width: int, limit: int, label: str):
+        self.width = width
+        self.limit = limit
+        self.label = label
+        self.key_to_index: Dict[bytes, int] = {}  # key bytes -> index
+        self.key_buf = bytearray()  # keys packed back to back, in index order
         self.next_index = 0
     
-    def get_or_create_index(self, address_hex: str) -> int:
+    def _insert(self, key: bytes) -> int:
+        """Get the index for a raw key, assigning the next free index if it is new."""
+        # Single probe: a new key is inserted with the next free index
+        index = self.key_to_index.setdefault(key, self.next_index)
+        if index == self.next_index:
+            if index >= self.limit:
+                del self.key_to_index[key]
+                raise ValueError(f"Too many unique {self.label} keys in block: {self.next_index} >= {self.limit}")
+            if len(key) != self.width:
+                del self.key_to_index[key]
+                raise ValueError(f"{self.label.capitalize()} must be {self.width} bytes, got {len(key)}")
+            self.key_buf += key
+            self.next_index += 1
+        
+        return index
+    
+    def get_or_create_index(self, key: Union[str, bytes]) -> int:
         """
-        Get the index for an address, creating a new one if needed.
+        Get the index for a key, creating a new one if needed.
         
         Args:
-            address_hex: Address as hex string (with or without 0x prefix)
+            key: Key as hex string (with or without 0x prefix) or raw bytes
         
         Returns:
-            The index for this address
+            The index for this key
         """
-        # Normalize the address hex (ensure lowercase, with 0x prefix)
-        if not address_hex.startswith('0x'):
-            address_hex = '0x' + address_hex
-        address_hex = address_hex.lower()
-        
-        if address_hex in self.address_to_index:
-            return self.address_to_index[address_hex]
-        
-        if self.next_index >= MAX_UNIQUE_ADDRESSES:
-            raise ValueError(f"Too many unique addresses in block: {self.next_index} >= {MAX_UNIQUE_ADDRESSES}")
-        
-        index = self.next_index
-        self.address_to_index[address_hex] = index
-        self.index_to_address[index] = address_hex
-        self.next_index += 1
-        
-        return index
+        return self._insert(_to_key(key, self.width))
+    
+    def get_or_create_indices(self, keys: Iterable[Union[str, bytes]]) -> PyList[int]:
+        """Index a batch of keys, returning their indices in input order."""
+        # Known keys resolve with one dict lookup; only new ones take the insert path
+        lookup = self.key_to_index.get
+        insert = self._insert
+        width = self.width
+        indices: PyList[int] = []
+        append = indices.append
+        for key in keys:
+            key = _to_key(key, width)
+            index = lookup(key)
+            append(index if index is not None else insert(key))
+        return indices
+    
+    def get_index(self, key: Union[str, bytes]) -> Optional[int]:
+        """Get the index for a key if it exists, None otherwise."""
+        return self.key_to_index.get(_to_key(key, self.width))
+    
+    def _get_key(self, index: int) -> Optional[bytes]:
+        """Get the raw key for an index if it exists, None otherwise."""
+        if not 0 <= index < self.next_index:
+            return None
+        return bytes(self.key_buf[index * self.width:(index + 1) * self.width])
+    
+    def _keys(self) -> PyList[bytes]:
+        """All keys in index order, split from a single snapshot of the buffer."""
+        data = bytes(self.key_buf)
+        width = self.width
+        return [data[i:i + width] for i in range(0, len(data), width)]
+
+
+class AddressIndexManager(_FixedWidthIndexManager):
+    """
+    Manages the mapping between addresses and their indices.
+    Provides efficient lookups and ensures unique address assignment.
+    """
     
-    def get_index(self, address_hex: str) -> Optional[int]:
-        """Get the index for an address if it exists, None otherwise."""
-        if not address_hex.startswith('0x'):
-            address_hex = '0x' + address_hex
-        address_hex = address_hex.lower()
-        return self.address_to_index.get(address_hex)
+    def __init__(self):
+        super().__init__(20, MAX_UNIQUE_ADDRESSES, "address")
     
-    def get_address(self, index: int) -> Optional[str]:
-        """Get the address hex for an index if it exists, None otherwise."""
-        return self.index_to_address.get(index)
+    def get_address(self, index: int) -> Optional[bytes]:
+        """Get the 20-byte address for an index if it exists, None otherwise."""
+        return self._get_key(index)
     
     def get_address_mapping(self) -> AddressMapping:
         """Create the SSZ AddressMapping structure."""
-        addresses = []
-        for i in range(self.next_index):
-            address_hex = self.index_to_address[i]
-            # Convert hex string to 20-byte address
-            address_bytes = bytes.fromhex(address_hex[2:].zfill(40))  # Remove 0x and pad to 40 chars
-            addresses.append(address_bytes)
-        
-        return AddressMapping(addresses=addresses)
+        return AddressMapping(addresses=self._keys())
     
     def get_stats(self) -> Dict[str, int]:
         """Get statistics about address usage."""
         return {
             'unique_addresses': self.next_index,
             'bytes_saved_per_reference': 20 - 2,  # 20 bytes address -> 2 bytes index
-            'total_references_needed': len(self.address_to_index),  # This would be calculated by the caller
+            'total_references_needed': len(self.key_to_index),  # This would be calculated by the caller
         }
 
 
-class SlotIndexManager:
+class SlotIndexManager(_FixedWidthIndexManager):
     """
     Manages the mapping between storage slots and their indices.
     Provides efficient lookups and ensures unique slot assignment.
     """
     
     def __init__(self):
-        self.slot_to_index: Dict[str, int] = {}  # slot_hex -> index
-        self.index_to_slot: Dict[int, str] = {}  # index -> slot_hex
-        self.next_index = 0
-    
-    def get_or_create_index(self, slot_hex: str) -> int:
-        """
-        Get the index for a storage slot, creating a new one if needed.
-        
-        Args:
-            slot_hex: Storage slot as hex string (with or without 0x prefix)
-        
-        Returns:
-            The index for this slot
-        """
-        # Normalize the slot hex (ensure lowercase, with 0x prefix)
-        if not slot_hex.startswith('0x'):
-            slot_hex = '0x' + slot_hex
-        slot_hex = slot_hex.lower()
-        
-        if slot_hex in self.slot_to_index:
-            return self.slot_to_index[slot_hex]
-        
-        if self.next_index >= MAX_UNIQUE_SLOTS:
-            raise ValueError(f"Too many unique slots in block: {self.next_index} >= {MAX_UNIQUE_SLOTS}")
-        
-        index = self.next_index
-        self.slot_to_index[slot_hex] = index
-        self.index_to_slot[index] = slot_hex
-        self.next_index += 1
-        
-        return index
-    
-    def get_index(self, slot_hex: str) -> Optional[int]:
-        """Get the index for a slot if it exists, None otherwise."""
-        if not slot_hex.startswith('0x'):
-            slot_hex = '0x' + slot_hex
-        slot_hex = slot_hex.lower()
-        return self.slot_to_index.get(slot_hex)
+        super().__init__(32, MAX_UNIQUE_SLOTS, "slot")
     
-    def get_slot(self, index: int) -> Optional[str]:
-        """Get the slot hex for an index if it exists, None otherwise."""
-        return self.index_to_slot.get(index)
+    def get_slot(self, index: int) -> Optional[bytes]:
+        """Get the 32-byte slot for an index if it exists, None otherwise."""
+        return self._get_key(index)
     
     def get_slot_mapping(self) -> SlotMapping:
         """Create the SSZ SlotMapping structure."""
-        slots = []
-        for i in range(self.next_index):
-            slot_hex = self.index_to_slot[i]
-            # Convert hex string to 32-byte storage key
-            slot_bytes = bytes.fromhex(slot_hex[2:].zfill(64))  # Remove 0x and pad to 64 chars
-            slots.append(slot_bytes)
-        
-        return SlotMapping(slots=slots)
+        return SlotMapping(slots=self._keys())
     
     def get_stats(self) -> Dict[str, int]:
         """Get statistics about slot usage."""
         return {
             'unique_slots': self.next_index,
             'bytes_saved_per_reference': 32 - 2,  # 32 bytes slot -> 2 bytes index
-            'total_references_needed': len(self.slot_to_index),  # This would be calculated by the caller
+            'total_references_needed': len(self.key_to_index),  # This would be calculated by the caller
         }
 
 
+class ValueIndexManager(_FixedWidthIndexManager):
+    """
+    Manages the mapping between written storage values and their indices.
+    Written values repeat heavily within a block (zero, small counters, addresses).
+    """
+    
+    def __init__(self):
+        super().__init__(32, MAX_UNIQUE_VALUES, "storage value")
+    
+    def get_value(self, index: int) -> Optional[bytes]:
+        """Get the 32-byte value for an index if it exists, None otherwise."""
+        return self._get_key(index)
+    
+    def get_value_mapping(self) -> ValueMapping:
+        """Create the SSZ ValueMapping structure."""
+        return ValueMapping(values=self._keys())
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get statistics about value usage."""
+        return {
+            'unique_values': self.next_index,
+            'bytes_saved_per_reference': 32 - 2,  # 32 bytes value -> 2 bytes index
+        }
+
 def hex_to_bytes32(hex_str: str) -> bytes:
     """Convert a hex string to 32-byte storage key."""
     if hex_str.startswith('0x'):
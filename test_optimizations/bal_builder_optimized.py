@@ -1,12 +1,17 @@
 import os
 import ssz
 import sys
-import json
+import struct
+import asyncio
+import aiohttp
 import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
+from functools import lru_cache
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Set, Tuple
-from eth_utils import to_canonical_address
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 project_root = str(Path(__file__).parent.parent)
 src_dir = os.path.join(project_root, "src")
@@ -37,17 +42,16 @@ def parse_pre_and_post_balances(pre_state, post_state):
 def get_deltas(tx_id, pres, posts, pre_balances, post_balances):
     balance_delta = get_balance_delta(pres, posts, pre_balances, post_balances)
     acc_map: dict[bytes, AccountBalanceDiff] = {}
+    # balance_delta has one entry per address, so each address is seen once
     for address, delta_val in balance_delta.items():
         if delta_val == 0:
             continue
         bal_diff = BalanceChange(
             tx_index=tx_id, delta=delta_val.to_bytes(12, "big", signed=True)
         )
-        if address in acc_map:
-            acc_map[address].changes.append(bal_diff)
-        else:
-            canonical = to_canonical_address(address)
-            acc_map[address] = AccountBalanceDiff(address=canonical, changes=[bal_diff])
+        acc_map[address] = AccountBalanceDiff(
+            address=canonical_address(address), changes=[bal_diff]
+        )
     return acc_map
 
 
@@ -63,46 +67,111 @@ def get_balance_delta(pres, posts, pre_balances, post_balances):
     return balance_delta
 
 
+def _collect_balance_change(
+    tx_id: int,
+    address: str,
+    pre_info: dict,
+    post_info: dict,
+    balance_changes: Dict[str, List[BalanceChange]],
+) -> None:
+    """Record a balance increase of `address` in this tx; same rule as `get_balance_delta`."""
+    delta = parse_hex_or_zero(post_info.get("balance")) - parse_hex_or_zero(pre_info.get("balance"))
+    if delta > 0:
+        balance_changes[address].append(
+            BalanceChange(tx_index=tx_id, delta=delta.to_bytes(12, "big", signed=True))
+        )
+
+
+def _build_balance_diffs(
+    balance_changes: Dict[str, List[BalanceChange]],
+) -> List[AccountBalanceDiff]:
+    """Build the final list of AccountBalanceDiff objects, sorted by address."""
+    return sorted(
+        (
+            AccountBalanceDiff(address=canonical_address(address), changes=changes)
+            for address, changes in balance_changes.items()
+        ),
+        key=lambda diff: diff.address,
+    )
+
+
+# SSZ layout of one AccountBalanceDiff: 20-byte address, 4-byte offset of
+# `changes`, then the changes as fixed-size (uint16 tx_index, 12-byte delta)
+_BALANCE_DIFF_HEADER_SIZE = 20 + 4
+_BALANCE_CHANGE_SIZE = 2 + 12
+
+
+def encode_balance_diffs(acc_bal_diffs: List[AccountBalanceDiff]) -> bytes:
+    """
+    SSZ-encode a BalanceDiffs list straight into a preallocated buffer.
+
+    Every element has a known size (header plus 14 bytes per change), so
+    the offsets and total length are computed up front. Falls back to
+    `ssz.encode` (which also validates) for anything outside the layout.
+    """
+    sizes = [
+        _BALANCE_DIFF_HEADER_SIZE + _BALANCE_CHANGE_SIZE * len(diff.changes)
+        for diff in acc_bal_diffs
+    ]
+    if len(acc_bal_diffs) > MAX_ACCOUNTS or any(len(diff.changes) > MAX_TXS for diff in acc_bal_diffs):
+        return ssz.encode(acc_bal_diffs, sedes=BalanceDiffs)
+
+    total = 4 * len(acc_bal_diffs) + sum(sizes)
+    buf = bytearray(total)
+    offset = 4 * len(acc_bal_diffs)
+    for i, (diff, size) in enumerate(zip(acc_bal_diffs, sizes)):
+        struct.pack_into("<I", buf, 4 * i, offset)
+        buf[offset:offset + 20] = diff.address
+        struct.pack_into("<I", buf, offset + 20, _BALANCE_DIFF_HEADER_SIZE)
+        pos = offset + _BALANCE_DIFF_HEADER_SIZE
+        for change in diff.changes:
+            struct.pack_into("<H", buf, pos, change.tx_index)
+            buf[pos + 2:pos + _BALANCE_CHANGE_SIZE] = change.delta
+            pos += _BALANCE_CHANGE_SIZE
+        offset += size
+
+    # A wrongly sized address or delta would have resized the buffer
+    if len(buf) != total:
+        return ssz.encode(acc_bal_diffs, sedes=BalanceDiffs)
+    return bytes(buf)
+
+
 def get_balance_diff_from_block(trace_result):
     # Aggregate all balance changes per address across the entire block
-    address_balance_changes: Dict[str, List[BalanceChange]] = {}
+    address_balance_changes: Dict[str, List[BalanceChange]] = defaultdict(list)
 
     for tx_id, tx in enumerate(trace_result):
-        tx_hash = tx.get("txHash")
         result = tx.get("result")
         if not isinstance(result, dict):
             print(type(result))
             continue
 
-        pre_state, post_state = tx["result"]["pre"], tx["result"]["post"]
-        pre_balances, post_balances = parse_pre_and_post_balances(pre_state, post_state)
-        pres, posts = set(pre_balances.keys()), set(post_balances.keys())
-        acc_map = get_deltas(tx_id, pres, posts, pre_balances, post_balances)
-
-        # Aggregate changes by address
-        for address, account_diff in acc_map.items():
-            if address not in address_balance_changes:
-                address_balance_changes[address] = []
-            address_balance_changes[address].extend(account_diff.changes)
-
-    # Build final list of AccountBalanceDiff objects
-    acc_bal_diffs = []
-    for address, changes in address_balance_changes.items():
-        canonical = to_canonical_address(address)
-        acc_bal_diffs.append(AccountBalanceDiff(address=canonical, changes=changes))
+        pre_state, post_state = result["pre"], result["post"]
+        for address in pre_state.keys() | post_state.keys():
+            _collect_balance_change(
+                tx_id, address, pre_state.get(address, {}), post_state.get(address, {}),
+                address_balance_changes,
+            )
 
-    balance_diff = ssz.encode(acc_bal_diffs, sedes=BalanceDiffs)
+    acc_bal_diffs = _build_balance_diffs(address_balance_changes)
+    balance_diff = encode_balance_diffs(acc_bal_diffs)
     return balance_diff, acc_bal_diffs
 
 
-def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
-    """Returns the code from state if it's non-empty, else None."""
-    code = state.get(address, {}).get("code")
+def _non_empty_code(info: dict) -> Optional[str]:
+    code = info.get("code")
     if code and code not in ("", "0x"):
         return code
     return None
 
 
+def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
+    """Returns the code from state if it's non-empty, else None."""
+    return _non_empty_code(state.get(address, {}))
+
+
+# Proxies and factory clones deploy the same bytecode over and over
+@lru_cache(maxsize=4096)
 def decode_hex_code(code_hex: str) -> bytes:
     """Converts a hex code string (with or without 0x) to raw bytes."""
     code_str = code_hex[2:] if code_hex.startswith("0x") else code_hex
@@ -132,10 +201,15 @@ def process_code_change(
 
     # Each account can only have one code change per block
     acc_map[address_hex] = AccountCodeDiff(
-        address=to_canonical_address(address_hex), change=change
+        address=canonical_address(address_hex), change=change
     )
 
 
+def _build_code_diffs(acc_map: Dict[str, AccountCodeDiff]) -> List[AccountCodeDiff]:
+    """Return the AccountCodeDiff entries sorted by address."""
+    return sorted(acc_map.values(), key=lambda diff: diff.address)
+
+
 def get_code_diff_from_block(trace_result: List[dict]) -> bytes:
     """
     Builds and SSZ‐encodes all AccountCodeDiff entries for the given trace_result.
@@ -152,84 +226,91 @@ def get_code_diff_from_block(trace_result: List[dict]) -> bytes:
             continue
 
         pre_state, post_state = result.get("pre", {}), result.get("post", {})
-        all_addresses = set(pre_state) | set(post_state)
 
-        for address in all_addresses:
+        # Only accounts whose post state carries code can have a code change;
+        # skip the EOAs and storage-only accounts that make up most of the diff
+        for address, post_info in post_state.items():
+            if "code" not in post_info:
+                continue
             pre_code = extract_non_empty_code(pre_state, address)
-            post_code = extract_non_empty_code(post_state, address)
+            post_code = _non_empty_code(post_info)
             process_code_change(tx_id, address, pre_code, post_code, acc_map)
 
     # Build final list of AccountCodeDiff objects
-    acc_code_diffs = list(acc_map.values())
+    acc_code_diffs = _build_code_diffs(acc_map)
 
     return ssz.encode(acc_code_diffs, sedes=CodeDiffs), acc_code_diffs
 
 
+# Slot keys and values recur across the txs of a block, so each distinct hex
+# string is decoded once. Cleared at the start of every block's extraction.
+_HEX32_CACHE: Dict[str, bytes] = {}
+
+
+def _to_bytes32(hexstr: str) -> bytes:
+    """Memoized `hex_to_bytes32`."""
+    raw = _HEX32_CACHE.get(hexstr)
+    if raw is None:
+        raw = _HEX32_CACHE[hexstr] = hex_to_bytes32(hexstr)
+    return raw
+
+
 def _is_non_write_read(pre_val_hex: Optional[str], post_val_hex: Optional[str]) -> bool:
     """Check if a storage slot qualifies as a pure read."""
     return pre_val_hex is not None and post_val_hex is None
 
 
-def _add_write(
-    acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
-    address: str,
-    slot: str,
-    tx_id: int,
-    new_val_hex: str,
-) -> None:
-    acc_map_write.setdefault(address, {}).setdefault(slot, []).append(
-        (tx_id, new_val_hex)
-    )
-
-
-def _add_read(acc_map_reads: Dict[str, Set[str]], address: str, slot: str) -> None:
-    acc_map_reads.setdefault(address, set()).add(slot)
+# Storage writes of a block keyed by (address, slot): one hash per access
+# instead of a nested per-address dict
+SlotWriteMap = Dict[Tuple[str, str], List[Tuple[int, str]]]
 
 
 def _build_slot_writes(
-    acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
-    address_hex: str,
+    slot_entries: List[Tuple[str, List[Tuple[int, str]]]],
 ) -> List[SlotWrite]:
-    """Build all SlotWrite entries for one address."""
+    """
+    Build all SlotWrite entries for one address from its (slot, writes) pairs,
+    sorted by slot. Writes are recorded in tx order, so they are already sorted.
+    """
     slot_writes: List[SlotWrite] = []
 
     # Handle writes
-    for slot_hex, write_entries in acc_map_write.get(address_hex, {}).items():
-        slot = hex_to_bytes32(slot_hex)
+    for slot_hex, write_entries in slot_entries:
+        slot = _to_bytes32(slot_hex)
         writes = [
-            PerTxWrite(tx_index=tx_id, value_after=hex_to_bytes32(val_hex))
+            PerTxWrite(tx_index=tx_id, value_after=_to_bytes32(val_hex))
             for tx_id, val_hex in write_entries
         ]
         slot_writes.append(SlotWrite(slot=slot, writes=writes))
 
+    slot_writes.sort(key=lambda slot_write: slot_write.slot)
     return slot_writes
 
 
 def _build_slot_reads(
     acc_map_reads: Dict[str, Set[str]],
-    acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
+    acc_map_write: SlotWriteMap,
     address_hex: str,
 ) -> List[SlotRead]:
-    """Build all SlotRead entries for one address (excluding written slots)."""
+    """Build all SlotRead entries for one address (excluding written slots), sorted by slot."""
     slot_reads: List[SlotRead] = []
 
     # Handle reads (only if not written)
-    written_slots = set(acc_map_write.get(address_hex, {}).keys())
     for slot_hex in acc_map_reads.get(address_hex, set()):
-        if slot_hex in written_slots:
+        if (address_hex, slot_hex) in acc_map_write:
             continue
-        slot = hex_to_bytes32(slot_hex)
+        slot = _to_bytes32(slot_hex)
         slot_reads.append(SlotRead(slot=slot))
 
+    slot_reads.sort(key=lambda slot_read: slot_read.slot)
     return slot_reads
 
 
-def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
+def extract_reads_from_trace(trace_result: List[dict]) -> Dict[str, Set[str]]:
     """
-    Extract reads from a block using diff_mode=False.
+    Extract reads from a diff_mode=False trace.
     Returns a dictionary mapping addresses to sets of storage slots that were read.
     """
-    trace_result = fetch_block_trace(block_number, rpc_url, diff_mode=False)
     reads = defaultdict(set)
     
     for tx_trace in trace_result:
@@ -242,6 +323,96 @@ def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[s
     return reads
 
 
+def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
+    """
+    Extract reads from a block using diff_mode=False.
+    Returns a dictionary mapping addresses to sets of storage slots that were read.
+    """
+    trace_result = fetch_block_trace(block_number, rpc_url, diff_mode=False)
+    return extract_reads_from_trace(trace_result)
+
+
+def _collect_storage_diff(
+    tx_id: int,
+    address: str,
+    pre_storage: dict,
+    post_storage: dict,
+    pending_writes: PendingStorageWrites,
+    block_reads: Dict[str, Set[str]],
+    ignore_reads: bool,
+) -> None:
+    """
+    Queue the candidate storage writes of `address` in this tx and record its
+    pure reads. Candidates are compared by `PendingStorageWrites.changed_writes`;
+    reads of slots that turn out to be written are dropped by `_build_slot_reads`.
+    """
+    # Sweep each dict directly instead of materializing the slot union:
+    # post-side slots first, then the slots only present in pre
+    if post_storage:
+        pending_writes.add(tx_id, address, pre_storage, post_storage)
+
+    if ignore_reads:
+        return
+
+    read_slots = None
+    for slot, pre_val in pre_storage.items():
+        post_val = post_storage.get(slot)
+        # If read-only (appears in pre but not modified in post)
+        if _is_non_write_read(pre_val, post_val):
+            if read_slots is None:
+                read_slots = block_reads[address]
+            read_slots.add(slot)
+
+
+def _merge_additional_reads(
+    block_writes: SlotWriteMap,
+    block_reads: Dict[str, Set[str]],
+    additional_reads: Dict[str, Set[str]],
+) -> None:
+    """Add reads from diff_mode=False that aren't already written to."""
+    for address, read_slots in additional_reads.items():
+        address_reads = None
+        for slot in read_slots:
+            if (address, slot) not in block_writes:
+                if address_reads is None:
+                    address_reads = block_reads[address]
+                address_reads.add(slot)
+
+
+def _build_storage_diffs(
+    block_writes: SlotWriteMap,
+    block_reads: Dict[str, Set[str]],
+    ignore_reads: bool,
+) -> Tuple[List[AccountWrites], List[AccountReads]]:
+    """Build separate writes and reads lists, each sorted by address and slot."""
+    account_writes_list = []
+    account_reads_list = []
+
+    # Group the flat write map by address, in first-write order
+    writes_by_address: Dict[str, List[Tuple[str, List[Tuple[int, str]]]]] = defaultdict(list)
+    for (address, slot), write_entries in block_writes.items():
+        writes_by_address[address].append((slot, write_entries))
+
+    # Build writes
+    for address, slot_entries in writes_by_address.items():
+        canonical = canonical_address(address)
+        slot_writes = _build_slot_writes(slot_entries)
+        if slot_writes:
+            account_writes_list.append(AccountWrites(address=canonical, slot_writes=slot_writes))
+    account_writes_list.sort(key=lambda account: account.address)
+
+    # Build reads
+    if not ignore_reads:
+        for address in block_reads.keys():
+            canonical = canonical_address(address)
+            slot_reads = _build_slot_reads(block_reads, block_writes, address)
+            if slot_reads:
+                account_reads_list.append(AccountReads(address=canonical, slot_reads=slot_reads))
+        account_reads_list.sort(key=lambda account: account.address)
+
+    return account_writes_list, account_reads_list
+
+
 def get_storage_diff_from_block_optimized(
     trace_result: List[dict], 
     additional_reads: Optional[Dict[str, Set[str]]] = None,
@@ -252,9 +423,12 @@ def get_storage_diff_from_block_optimized(
     Returns:
         A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list)
     """
+    _HEX32_CACHE.clear()
+
     # Track all writes and reads across the entire block
-    block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
-    block_reads: Dict[str, Set[str]] = {}
+    block_writes: SlotWriteMap = defaultdict(list)
+    block_reads: Dict[str, Set[str]] = defaultdict(set)
+    pending_writes = PendingStorageWrites()
 
     for tx_id, tx in enumerate(trace_result):
         result = tx.get("result")
@@ -264,66 +438,27 @@ def get_storage_diff_from_block_optimized(
         pre_state = result.get("pre", {})
         post_state = result.get("post", {})
 
-        all_addresses = set(pre_state) | set(post_state)
-
-        for address in all_addresses:
-            pre_storage = pre_state.get(address, {}).get("storage", {})
-            post_storage = post_state.get(address, {}).get("storage", {})
-
-            all_slots = set(pre_storage) | set(post_storage)
-
-            for slot in all_slots:
-                pre_val = pre_storage.get(slot)
-                post_val = post_storage.get(slot)
-
-                # If written (non-equal values or fresh write)
-                if post_val is not None:
-                    pre_bytes = (
-                        hex_to_bytes32(pre_val) if pre_val is not None else b"\x00" * 32
-                    )
-                    post_bytes = hex_to_bytes32(post_val)
-                    if pre_bytes != post_bytes:
-                        _add_write(block_writes, address, slot, tx_id, post_val)
+        for address in pre_state.keys() | post_state.keys():
+            pre_info = pre_state.get(address, {})
+            post_info = post_state.get(address, {})
+            if "storage" not in pre_info and "storage" not in post_info:
+                continue
+            pre_storage = pre_info.get("storage", {})
+            post_storage = post_info.get("storage", {})
+            _collect_storage_diff(
+                tx_id, address, pre_storage, post_storage, pending_writes, block_reads, ignore_reads
+            )
 
-                # If read-only (appears in pre but not modified in post)
-                elif not ignore_reads and _is_non_write_read(pre_val, post_val):
-                    # Only add as read if this slot wasn't written to in this block
-                    if address not in block_writes or slot not in block_writes.get(
-                        address, {}
-                    ):
-                        _add_read(block_reads, address, slot)
+    for address, slot, tx_id, post_val in pending_writes.changed_writes():
+        block_writes[(address, slot)].append((tx_id, post_val))
 
     # Add additional reads from diff_mode=False if provided and not ignoring reads
     if not ignore_reads and additional_reads is not None:
-        for address, read_slots in additional_reads.items():
-            # Only add reads that aren't already written to
-            if address not in block_writes:
-                for slot in read_slots:
-                    _add_read(block_reads, address, slot)
-            else:
-                written_slots = set(block_writes[address].keys())
-                for slot in read_slots:
-                    if slot not in written_slots:
-                        _add_read(block_reads, address, slot)
-
-    # Build separate writes and reads lists
-    account_writes_list = []
-    account_reads_list = []
+        _merge_additional_reads(block_writes, block_reads, additional_reads)
 
-    # Build writes
-    for address in block_writes.keys():
-        canonical = to_canonical_address(address)
-        slot_writes = _build_slot_writes(block_writes, address)
-        if slot_writes:
-            account_writes_list.append(AccountWrites(address=canonical, slot_writes=slot_writes))
-
-    # Build reads
-    if not ignore_reads:
-        for address in block_reads.keys():
-            canonical = to_canonical_address(address)
-            slot_reads = _build_slot_reads(block_reads, block_writes, address)
-            if slot_reads:
-                account_reads_list.append(AccountReads(address=canonical, slot_reads=slot_reads))
+    account_writes_list, account_reads_list = _build_storage_diffs(
+        block_writes, block_reads, ignore_reads
+    )
 
     writes_encoded = ssz.encode(account_writes_list, sedes=AccountWritesList)
     reads_encoded = ssz.encode(account_reads_list, sedes=AccountReadsList)
@@ -333,23 +468,27 @@ def get_storage_diff_from_block_optimized(
 
 def _get_nonce(info: dict, fallback: str = "0") -> int:
     """Safely parse a nonce string from a state dict, with fallback."""
-    nonce_str = info.get("nonce", fallback)
-    return int(nonce_str, 16) if isinstance(nonce_str, str) and nonce_str.startswith('0x') else int(nonce_str)
+    return parse_nonce(info.get("nonce", fallback))
 
 
-def _should_record_nonce_diff(pre_info: dict, post_info: dict) -> bool:
+def _nonce_diff(pre_info: dict, post_info: dict) -> Optional[int]:
     """
-    Determine whether a nonce diff should be recorded:
+    Return the post-tx nonce if a nonce diff should be recorded, else None:
     - pre_info has both 'nonce' and 'code'
     - post_nonce > pre_nonce
     """
     if "nonce" not in pre_info or "code" not in pre_info:
-        return False
+        return None
+
+    # A missing post nonce means it is unchanged, and an identical raw value
+    # can't be an increase either; neither needs decoding
+    post_raw = post_info.get("nonce")
+    pre_raw = pre_info["nonce"]
+    if post_raw is None or post_raw == pre_raw:
+        return None
 
-    pre_nonce_str = pre_info["nonce"]
-    pre_nonce = int(pre_nonce_str, 16) if isinstance(pre_nonce_str, str) and pre_nonce_str.startswith('0x') else int(pre_nonce_str)
-    post_nonce = _get_nonce(post_info, fallback=str(pre_nonce))
-    return post_nonce > pre_nonce
+    post_nonce = parse_nonce(post_raw)
+    return post_nonce if post_nonce > parse_nonce(pre_raw) else None
 
 
 def _record_nonce_diff(
@@ -359,22 +498,35 @@ def _record_nonce_diff(
     nonce_after: int,
 ) -> None:
     """Add a nonce change entry to the map."""
-    nonce_map.setdefault(address, []).append((tx_index, nonce_after))
+    nonce_map[address].append((tx_index, nonce_after))
+
+
+def _collect_nonce_change(
+    tx_index: int,
+    address: str,
+    pre_info: dict,
+    post_info: dict,
+    nonce_map: Dict[str, List[Tuple[int, int]]],
+) -> None:
+    post_nonce = _nonce_diff(pre_info, post_info)
+    if post_nonce is not None:
+        _record_nonce_diff(nonce_map, address, tx_index, post_nonce)
 
 
 def _build_account_nonce_diffs(
     nonce_map: Dict[str, List[Tuple[int, int]]],
 ) -> List[AccountNonceDiff]:
-    """Convert raw nonce map into SSZ-serializable objects."""
+    """Convert raw nonce map into SSZ-serializable objects, sorted by address."""
     account_nonce_list: List[AccountNonceDiff] = []
     for address_hex, changes in nonce_map.items():
-        addr_bytes20 = to_canonical_address(address_hex)
+        addr_bytes20 = canonical_address(address_hex)
         nonce_changes = [
             TxNonceDiff(tx_index=tx_idx, nonce_after=nonce_after) for tx_idx, nonce_after in changes
         ]
         account_nonce_list.append(
             AccountNonceDiff(address=addr_bytes20, changes=nonce_changes)
         )
+    account_nonce_list.sort(key=lambda diff: diff.address)
     return account_nonce_list
 
 
@@ -387,7 +539,7 @@ def build_contract_nonce_diffs_from_state(
       1) the SSZ-encoded bytes of NonceDiffs,
       2) the raw list[AccountNonceDiff].
     """
-    nonce_map: Dict[str, List[Tuple[int, int]]] = {}
+    nonce_map: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
 
     for tx_index, tx in enumerate(trace_result):
         result = tx.get("result")
@@ -399,16 +551,95 @@ def build_contract_nonce_diffs_from_state(
 
         for address_hex, pre_info in pre_state.items():
             post_info = post_state.get(address_hex, {})
-            if not _should_record_nonce_diff(pre_info, post_info):
-                continue
-            post_nonce = _get_nonce(post_info, fallback=pre_info["nonce"])
-            _record_nonce_diff(nonce_map, address_hex, tx_index, post_nonce)
+            _collect_nonce_change(tx_index, address_hex, pre_info, post_info, nonce_map)
 
     account_nonce_list = _build_account_nonce_diffs(nonce_map)
     encoded_bytes = ssz.encode(account_nonce_list, sedes=NonceDiffs)
     return encoded_bytes, account_nonce_list
 
 
+def build_all_diffs(
+    trace_result: List[dict],
+    additional_reads: Optional[Dict[str, Set[str]]] = None,
+    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS,
+) -> Tuple[
+    List[AccountWrites], List[AccountReads], List[AccountBalanceDiff],
+    List[AccountCodeDiff], List[AccountNonceDiff], Tuple[int, int],
+]:
+    """
+    Collect storage, balance, code and nonce diffs in a single pass over
+    trace_result, with the same rules as the per-diff-type functions above.
+    Every list comes out in BAL order (accounts by address, slots by key,
+    changes by tx index), so no separate sorting pass is needed.
+    The account/slot counts of `count_accounts_and_slots` are gathered in
+    the same pass.
+    Returns:
+        A tuple of (account_writes_list, account_reads_list, acc_bal_diffs,
+        acc_code_diffs, account_nonce_list, (accounts, slots))
+    """
+    _HEX32_CACHE.clear()
+
+    # Not presized from the touched addresses: most accounts never get an
+    # entry, and the dicts grow with amortized O(1) inserts anyway
+    block_writes: SlotWriteMap = defaultdict(list)
+    block_reads: Dict[str, Set[str]] = defaultdict(set)
+    pending_writes = PendingStorageWrites()
+    balance_changes: Dict[str, List[BalanceChange]] = defaultdict(list)
+    code_map: Dict[str, AccountCodeDiff] = {}
+    nonce_map: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    post_accounts: Set[str] = set()
+    post_slot_count = 0
+
+    for tx_id, tx in enumerate(trace_result):
+        result = tx.get("result")
+        if not isinstance(result, dict):
+            print(f"Unexpected result type for tx {tx.get('txHash')}: {type(result)}")
+            continue
+
+        pre_state = result.get("pre", {})
+        post_state = result.get("post", {})
+        post_accounts.update(post_state)
+
+        for address in pre_state.keys() | post_state.keys():
+            pre_info = pre_state.get(address, {})
+            post_info = post_state.get(address, {})
+
+            _collect_balance_change(tx_id, address, pre_info, post_info, balance_changes)
+            # Most accounts carry neither code nor storage; test for the keys
+            # before doing any per-field work
+            if "code" in post_info:
+                process_code_change(
+                    tx_id, address, _non_empty_code(pre_info), _non_empty_code(post_info), code_map
+                )
+            if "storage" in post_info:
+                post_slot_count += len(post_info["storage"])
+            if "storage" in pre_info or "storage" in post_info:
+                _collect_storage_diff(
+                    tx_id, address, pre_info.get("storage", {}), post_info.get("storage", {}),
+                    pending_writes, block_reads, ignore_reads,
+                )
+            if address in pre_state:
+                _collect_nonce_change(tx_id, address, pre_info, post_info, nonce_map)
+
+    for address, slot, tx_id, post_val in pending_writes.changed_writes():
+        block_writes[(address, slot)].append((tx_id, post_val))
+
+    if not ignore_reads and additional_reads is not None:
+        _merge_additional_reads(block_writes, block_reads, additional_reads)
+
+    account_writes_list, account_reads_list = _build_storage_diffs(
+        block_writes, block_reads, ignore_reads
+    )
+    return (
+        account_writes_list,
+        account_reads_list,
+        _build_balance_diffs(balance_changes),
+        _build_code_diffs(code_map),
+        _build_account_nonce_diffs(nonce_map),
+        (len(post_accounts), post_slot_count),
+    )
+
+
 def sort_block_access_list_optimized(block_access_list: BlockAccessList) -> BlockAccessList:
     def sort_account_writes(account_writes):
         sorted_accounts = []
@@ -474,6 +705,220 @@ def sort_block_access_list_optimized(block_access_list: BlockAccessList) -> Bloc
     )
 
 
+def process_block(
+    block_number: int,
+    trace_result: List[dict],
+    block_reads: Optional[Dict[str, Set[str]]],
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+) -> Dict[str, Any]:
+    """Build, encode and persist the BAL of one fetched block; returns its stats entry."""
+    print(f"Processing block {block_number}...")
+
+    # Get diffs using optimized format
+    (
+        account_writes_list, account_reads_list, acc_bal_diffs, acc_code_diffs, account_nonce_list,
+        (accs, slots),
+    ) = build_all_diffs(trace_result, block_reads, ignore_reads)
+
+    writes_encoded = ssz.encode(account_writes_list, sedes=AccountWritesList)
+    reads_encoded = ssz.encode(account_reads_list, sedes=AccountReadsList)
+    balance_diff = encode_balance_diffs(acc_bal_diffs)
+    code_diff = ssz.encode(acc_code_diffs, sedes=CodeDiffs)
+    nonce_diff = ssz.encode(account_nonce_list, sedes=NonceDiffs)
+
+    block_obj = BlockAccessList(
+        storage_writes=account_writes_list,
+        storage_reads=account_reads_list,
+        balance_diffs=acc_bal_diffs,
+        code_diffs=acc_code_diffs,
+        nonce_diffs=account_nonce_list,
+    )
+
+    block_al = ssz.encode(block_obj, sedes=BlockAccessList)
+
+    # Create filename indicating optimized version and with/without reads
+    filename = f"{block_number}_block_access_list_optimized_{reads_suffix}.txt"
+    filepath = os.path.join(bal_raw_dir, filename)
+    
+    with open(filepath, "w") as f:
+        f.write(block_al.hex())
+
+    # Get sizes (in KiB)
+    writes_size = get_compressed_size(writes_encoded)
+    reads_size = get_compressed_size(reads_encoded) if not ignore_reads else 0
+    balance_size = get_compressed_size(balance_diff)
+    code_size = get_compressed_size(code_diff)
+    nonce_size = get_compressed_size(nonce_diff)
+
+    total_size = writes_size + reads_size + balance_size + code_size + nonce_size
+
+    return {
+        "block_number": block_number,
+        "sizes": {
+            "storage_writes_kb": writes_size,
+            "storage_reads_kb": reads_size,
+            "balance_diffs_kb": balance_size,
+            "nonce_diffs_kb": nonce_size,
+            "code_diffs_kb": code_size,
+            "total_kb": total_size,
+        },
+        "counts": {
+            "accounts": accs,
+            "slots": slots,
+        },
+    }
+
+
+# Flat columnar layout of the per-block stats entries built by process_block
+STATS_SCHEMA = pa.schema([
+    ("block_number", pa.uint64()),
+    ("storage_writes_kb", pa.float64()),
+    ("storage_reads_kb", pa.float64()),
+    ("balance_diffs_kb", pa.float64()),
+    ("nonce_diffs_kb", pa.float64()),
+    ("code_diffs_kb", pa.float64()),
+    ("total_kb", pa.float64()),
+    ("accounts", pa.uint32()),
+    ("slots", pa.uint32()),
+])
+
+
+def stats_table(data: List[Dict[str, Any]]) -> pa.Table:
+    """Flatten per-block stats entries into a table with STATS_SCHEMA."""
+    rows = [
+        {"block_number": entry["block_number"], **entry["sizes"], **entry["counts"]}
+        for entry in data
+    ]
+    return pa.Table.from_pylist(rows, schema=STATS_SCHEMA)
+
+
+class StatsWriter:
+    """
+    Append per-block stats entries to a zstd Parquet file as they are
+    produced, one row group per `row_group_size` blocks, so memory stays
+    constant however many blocks are processed.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 128):
+        self.writer = pq.ParquetWriter(path, STATS_SCHEMA, compression="zstd")
+        self.row_group_size = row_group_size
+        self.rows: List[Dict[str, Any]] = []
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        self.rows.append(entry)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.rows:
+            self.writer.write_table(stats_table(self.rows))
+            self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def _fetch_blocks(
+    session: aiohttp.ClientSession,
+    block_numbers: List[int],
+    ignore_reads: bool,
+) -> List[Tuple[int, List[dict], Optional[Dict[str, Set[str]]]]]:
+    """Fetch the diff traces (and, with reads, the prestate traces) of a batch of blocks."""
+    print(f"Fetching blocks {block_numbers[0]}..{block_numbers[-1]}...")
+    if ignore_reads:
+        traces = await fetch_block_traces_batch_async(session, block_numbers, RPC_URL)
+        return [(block_number, trace, None) for block_number, trace in zip(block_numbers, traces)]
+
+    traces, prestate_traces = await asyncio.gather(
+        fetch_block_traces_batch_async(session, block_numbers, RPC_URL),
+        fetch_block_traces_batch_async(session, block_numbers, RPC_URL, diff_mode=False),
+    )
+    return [
+        (block_number, trace, extract_reads_from_trace(prestate_trace))
+        for block_number, trace, prestate_trace in zip(block_numbers, traces, prestate_traces)
+    ]
+
+
+async def _fetch_and_process_blocks(
+    session: aiohttp.ClientSession,
+    semaphore: asyncio.Semaphore,
+    executor: ProcessPoolExecutor,
+    block_numbers: List[int],
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+) -> List[Dict[str, Any]]:
+    """Fetch a batch of blocks and process each one in a worker process."""
+    # Held until the batch is processed, so at most `concurrency` batches
+    # of traces are in flight or waiting for a worker.
+    async with semaphore:
+        fetched = await _fetch_blocks(session, block_numbers, ignore_reads)
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(
+                executor, process_block,
+                block_number, trace_result, block_reads, ignore_reads, bal_raw_dir, reads_suffix,
+            )
+            for block_number, trace_result, block_reads in fetched
+        ))
+
+
+async def process_blocks_concurrently(
+    block_numbers: List[int],
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+    on_entry: Callable[[Dict[str, Any]], None],
+    concurrency: int = 8,
+    batch_size: int = 5,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Fetch traces in JSON-RPC batches of `batch_size` blocks, up to
+    `concurrency` batches at once over one keep-alive session, and process
+    each block in a pool of `workers` processes (default: one per core)
+    as soon as its batch arrives.
+    Stats entries are passed to `on_entry` in block order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    # Block traces can take minutes; don't time out where requests wouldn't
+    timeout = aiohttp.ClientTimeout(total=None)
+    # Entries that finished ahead of an earlier block, until it is done
+    ready: Dict[int, Dict[str, Any]] = {}
+    next_index = 0
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            tasks = [
+                asyncio.create_task(_fetch_and_process_blocks(
+                    session, semaphore, executor, block_numbers[i:i + batch_size],
+                    ignore_reads, bal_raw_dir, reads_suffix,
+                ))
+                for i in range(0, len(block_numbers), batch_size)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    for entry in await next_done:
+                        ready[entry["block_number"]] = entry
+
+                    while next_index < len(block_numbers) and block_numbers[next_index] in ready:
+                        on_entry(ready.pop(block_numbers[next_index]))
+                        next_index += 1
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+
 def main():
     global IGNORE_STORAGE_LOCATIONS
     
@@ -481,7 +926,15 @@ def main():
     parser = argparse.ArgumentParser(description='Build optimized Block Access Lists (BALs) from Ethereum blocks')
     parser.add_argument('--no-reads', action='store_true', 
                         help='Ignore storage read locations (only include writes)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Number of RPC batches to fetch concurrently (default: 8)')
+    parser.add_argument('--batch-size', type=int, default=5,
+                        help=f'Blocks per JSON-RPC batch request, at most {MAX_RPC_BATCH_SIZE} (default: 5)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for building BALs (default: one per CPU core)')
     args = parser.parse_args()
+    if not 1 <= args.batch_size <= MAX_RPC_BATCH_SIZE:
+        parser.error(f"--batch-size must be between 1 and {MAX_RPC_BATCH_SIZE}")
     
     # Set IGNORE_STORAGE_LOCATIONS based on command line flag
     IGNORE_STORAGE_LOCATIONS = args.no_reads
@@ -489,99 +942,35 @@ def main():
     print(f"Running optimized BAL builder with IGNORE_STORAGE_LOCATIONS = {IGNORE_STORAGE_LOCATIONS}")
     totals = defaultdict(list)
     block_totals = []
-    data = []
 
     # random_blocks = random.sample(range(22616032 - 7200 * 30, 22616032 + 1), 1000)
     random_blocks = range(22616032 - 7200 * 30, 22616032 + 1, 216)
 
-    for block_number in random_blocks:
-        print(f"Processing block {block_number}...")
-        trace_result = fetch_block_trace(block_number, RPC_URL)
-        
-        # Fetch reads separately only if not ignoring storage locations
-        block_reads = None
-        if not IGNORE_STORAGE_LOCATIONS:
-            print(f"  Fetching reads for block {block_number}...")
-            block_reads = extract_reads_from_block(block_number, RPC_URL)
-
-        # Get diffs using optimized format
-        writes_encoded, reads_encoded, account_writes_list, account_reads_list = get_storage_diff_from_block_optimized(
-            trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
-        )
-        balance_diff, acc_bal_diffs = get_balance_diff_from_block(trace_result)
-        code_diff, acc_code_diffs = get_code_diff_from_block(trace_result)
-        nonce_diff, account_nonce_list = build_contract_nonce_diffs_from_state(
-            trace_result
-        )
+    # Create bal_raw directory in main project directory if it doesn't exist
+    bal_raw_dir = os.path.join(project_root, "bal_raw")
+    os.makedirs(bal_raw_dir, exist_ok=True)
+    reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
 
-        block_obj = BlockAccessList(
-            storage_writes=account_writes_list,
-            storage_reads=account_reads_list,
-            balance_diffs=acc_bal_diffs,
-            code_diffs=acc_code_diffs,
-            nonce_diffs=account_nonce_list,
-        )
+    # Stream stats to Parquet as blocks complete
+    parquet_filename = f"bal_analysis_optimized_{reads_suffix}.parquet"
+    with StatsWriter(parquet_filename) as stats_writer:
 
-        block_obj_sorted = sort_block_access_list_optimized(block_obj)
-
-        block_al = ssz.encode(block_obj_sorted, sedes=BlockAccessList)
-
-        # Create bal_raw directory in main project directory if it doesn't exist
-        bal_raw_dir = os.path.join(project_root, "bal_raw")
-        os.makedirs(bal_raw_dir, exist_ok=True)
-        
-        # Create filename indicating optimized version and with/without reads
-        reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-        filename = f"{block_number}_block_access_list_optimized_{reads_suffix}.txt"
-        filepath = os.path.join(bal_raw_dir, filename)
-        
-        with open(filepath, "w") as f:
-            f.write(block_al.hex())
-
-        # Get sizes (in KiB)
-        writes_size = get_compressed_size(writes_encoded)
-        reads_size = get_compressed_size(reads_encoded) if not IGNORE_STORAGE_LOCATIONS else 0
-        balance_size = get_compressed_size(balance_diff)
-        code_size = get_compressed_size(code_diff)
-        nonce_size = get_compressed_size(nonce_diff)
-
-        total_size = writes_size + reads_size + balance_size + code_size + nonce_size
-
-        # Count affected accounts and slots
-        accs, slots = count_accounts_and_slots(trace_result)
-
-        # Store stats
-        data.append(
-            {
-                "block_number": block_number,
-                "sizes": {
-                    "storage_writes_kb": writes_size,
-                    "storage_reads_kb": reads_size,
-                    "balance_diffs_kb": balance_size,
-                    "nonce_diffs_kb": nonce_size,
-                    "code_diffs_kb": code_size,
-                    "total_kb": total_size,
-                },
-                "counts": {
-                    "accounts": accs,
-                    "slots": slots,
-                },
-            }
-        )
+        def on_entry(entry: Dict[str, Any]) -> None:
+            stats_writer.write(entry)
 
-        # Totals for averages
-        totals["writes"].append(writes_size)
-        totals["reads"].append(reads_size)
-        totals["balance"].append(balance_size)
-        totals["code"].append(code_size)
-        totals["nonce"].append(nonce_size)
-        block_totals.append(total_size)
+            # Totals for averages
+            sizes = entry["sizes"]
+            totals["writes"].append(sizes["storage_writes_kb"])
+            totals["reads"].append(sizes["storage_reads_kb"])
+            totals["balance"].append(sizes["balance_diffs_kb"])
+            totals["code"].append(sizes["code_diffs_kb"])
+            totals["nonce"].append(sizes["nonce_diffs_kb"])
+            block_totals.append(sizes["total_kb"])
 
-    # Save JSON to file
-    reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-    json_filename = f"bal_analysis_optimized_{reads_suffix}.json"
-    with open(json_filename, "w") as f:
-        json.dump(data, f, indent=2)
+        asyncio.run(process_blocks_concurrently(
+            list(random_blocks), IGNORE_STORAGE_LOCATIONS, bal_raw_dir, reads_suffix, on_entry,
+            args.concurrency, args.batch_size, args.workers,
+        ))
 
     # Averages
     print("\nAverage compressed size per diff type (in KiB):")
@@ -594,4 +983,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -43,7 +43,7 @@ def get_deltas(tx_id, pres, posts, pre_balances, post_balances, address_manager:
         bal_diff = BalanceChange(
             tx_index=tx_id, delta=delta_val.to_bytes(12, "big", signed=True)
         )
-        address_index = address_manager.get_or_create_index(address)
+        address_index = address_manager.get_or_create_index(canonical_address(address))
         if address_index in acc_map:
             acc_map[address_index].changes.append(bal_diff)
         else:
@@ -129,7 +129,7 @@ def process_code_change(
         )
 
     change = CodeChange(tx_index=tx_id, new_code=code_bytes)
-    address_index = address_manager.get_or_create_index(address_hex)
+    address_index = address_manager.get_or_create_index(canonical_address(address_hex))
 
     # Each account can only have one code change per block
     acc_map[address_index] = AccountCodeDiff(
@@ -192,6 +192,7 @@ def _build_slot_writes_indexed(
     address_hex: str,
     slot_manager: SlotIndexManager,
     address_manager: AddressIndexManager,
+    value_manager: ValueIndexManager,
 ) -> List[SlotWriteIndexed]:
     """Build all SlotWriteIndexed entries for one address."""
     slot_writes: List[SlotWriteIndexed] = []
@@ -199,11 +200,11 @@ def _build_slot_writes_indexed(
     # Handle writes
     for slot_hex, write_entries in acc_map_write.get(address_hex, {}).items():
         slot_index = slot_manager.get_or_create_index(slot_hex)
-        writes = [
-            PerTxWriteIndexed(tx_index=tx_id, value_after=hex_to_bytes32(val_hex))
-            for tx_id, val_hex in write_entries
-        ]
-        slot_writes.append(SlotWriteIndexed(slot_index=slot_index, writes=writes))
+        tx_indices = [tx_id for tx_id, _ in write_entries]
+        value_indices = value_manager.get_or_create_indices([val_hex for _, val_hex in write_entries])
+        slot_writes.append(SlotWriteIndexed(
+            slot_index=slot_index, tx_indices=tx_indices, value_indices=value_indices
+        ))
 
     return slot_writes
 
@@ -216,17 +217,16 @@ def _build_slot_reads_indexed(
     address_manager: AddressIndexManager,
 ) -> List[SlotReadIndexed]:
     """Build all SlotReadIndexed entries for one address (excluding written slots)."""
-    slot_reads: List[SlotReadIndexed] = []
-
     # Handle reads (only if not written)
     written_slots = set(acc_map_write.get(address_hex, {}).keys())
-    for slot_hex in acc_map_reads.get(address_hex, set()):
-        if slot_hex in written_slots:
-            continue
-        slot_index = slot_manager.get_or_create_index(slot_hex)
-        slot_reads.append(SlotReadIndexed(slot_index=slot_index))
-
-    return slot_reads
+    read_slots = [
+        slot_hex for slot_hex in acc_map_reads.get(address_hex, set())
+        if slot_hex not in written_slots
+    ]
+    return [
+        SlotReadIndexed(slot_index=slot_index)
+        for slot_index in slot_manager.get_or_create_indices(read_slots)
+    ]
 
 
 def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
@@ -251,15 +251,16 @@ def get_storage_diff_from_block_optimized_both_indexed(
     trace_result: List[dict], 
     additional_reads: Optional[Dict[str, Set[str]]] = None,
     ignore_reads: bool = IGNORE_STORAGE_LOCATIONS
-) -> Tuple[bytes, bytes, List[AccountWritesIndexed], List[AccountReadsIndexed], AddressMapping, SlotMapping, AddressIndexManager, SlotIndexManager]:
+) -> Tuple[bytes, bytes, List[AccountWritesIndexed], List[AccountReadsIndexed], AddressMapping, SlotMapping, AddressIndexManager, SlotIndexManager, ValueMapping, ValueIndexManager]:
     """
     Build and SSZ‐encode separate AccountWritesIndexed and AccountReadsIndexed with both address and slot mapping.
     Returns:
-        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager)
+        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager, value_mapping, value_manager)
     """
-    # Initialize both managers
+    # Initialize the address, slot and value managers
     address_manager = AddressIndexManager()
     slot_manager = SlotIndexManager()
+    value_manager = ValueIndexManager()
     
     # Track all writes and reads across the entire block
     block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
@@ -321,15 +322,15 @@ def get_storage_diff_from_block_optimized_both_indexed(
 
     # Build writes
     for address in block_writes.keys():
-        address_index = address_manager.get_or_create_index(address)
-        slot_writes = _build_slot_writes_indexed(block_writes, address, slot_manager, address_manager)
+        address_index = address_manager.get_or_create_index(canonical_address(address))
+        slot_writes = _build_slot_writes_indexed(block_writes, address, slot_manager, address_manager, value_manager)
         if slot_writes:
             account_writes_list.append(AccountWritesIndexed(address_index=address_index, slot_writes=slot_writes))
 
     # Build reads
     if not ignore_reads:
         for address in block_reads.keys():
-            address_index = address_manager.get_or_create_index(address)
+            address_index = address_manager.get_or_create_index(canonical_address(address))
             slot_reads = _build_slot_reads_indexed(block_reads, block_writes, address, slot_manager, address_manager)
             if slot_reads:
                 account_reads_list.append(AccountReadsIndexed(address_index=address_index, slot_reads=slot_reads))
@@ -337,32 +338,31 @@ def get_storage_diff_from_block_optimized_both_indexed(
     # Get the mappings
     address_mapping = address_manager.get_address_mapping()
     slot_mapping = slot_manager.get_slot_mapping()
+    value_mapping = value_manager.get_value_mapping()
 
     writes_encoded = ssz.encode(account_writes_list, sedes=AccountWritesIndexedList)
     reads_encoded = ssz.encode(account_reads_list, sedes=AccountReadsIndexedList)
     
-    return writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager
+    return writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager, value_mapping, value_manager
 
 
 def _get_nonce(info: dict, fallback: str = "0") -> int:
     """Safely parse a nonce string from a state dict, with fallback."""
-    nonce_str = info.get("nonce", fallback)
-    return int(nonce_str, 16) if isinstance(nonce_str, str) and nonce_str.startswith('0x') else int(nonce_str)
+    return parse_nonce(info.get("nonce", fallback))
 
 
-def _should_record_nonce_diff(pre_info: dict, post_info: dict) -> bool:
+def _nonce_diff(pre_info: dict, post_info: dict) -> Optional[int]:
     """
-    Determine whether a nonce diff should be recorded:
+    Return the post-tx nonce if a nonce diff should be recorded, else None:
     - pre_info has both 'nonce' and 'code'
     - post_nonce > pre_nonce
     """
     if "nonce" not in pre_info or "code" not in pre_info:
-        return False
+        return None
 
-    pre_nonce_str = pre_info["nonce"]
-    pre_nonce = int(pre_nonce_str, 16) if isinstance(pre_nonce_str, str) and pre_nonce_str.startswith('0x') else int(pre_nonce_str)
-    post_nonce = _get_nonce(post_info, fallback=str(pre_nonce))
-    return post_nonce > pre_nonce
+    pre_nonce = _get_nonce(pre_info)
+    post_nonce = _get_nonce(post_info) if "nonce" in post_info else pre_nonce
+    return post_nonce if post_nonce > pre_nonce else None
 
 
 def _record_nonce_diff(
@@ -412,10 +412,10 @@ def build_contract_nonce_diffs_from_state(
 
         for address_hex, pre_info in pre_state.items():
             post_info = post_state.get(address_hex, {})
-            if not _should_record_nonce_diff(pre_info, post_info):
+            post_nonce = _nonce_diff(pre_info, post_info)
+            if post_nonce is None:
                 continue
-            post_nonce = _get_nonce(post_info, fallback=pre_info["nonce"])
-            address_index = address_manager.get_or_create_index(address_hex)
+            address_index = address_manager.get_or_create_index(canonical_address(address_hex))
             _record_nonce_diff(nonce_map, address_index, tx_index, post_nonce)
 
     account_nonce_list = _build_account_nonce_diffs(nonce_map)
@@ -429,9 +429,14 @@ def sort_block_access_list_optimized_both_indexed(block_access_list: BlockAccess
         for account in sorted(account_writes, key=lambda a: a.address_index):
             sorted_slot_writes = []
             for slot_write in account.slot_writes:
-                # Sort the per-tx writes by tx_index
-                writes_sorted = sorted(slot_write.writes, key=lambda x: x.tx_index)
-                slot_write_sorted = SlotWriteIndexed(slot_index=slot_write.slot_index, writes=writes_sorted)
+                # Sort the per-tx write columns together by tx_index
+                tx_indices, value_indices = slot_write.tx_indices, slot_write.value_indices
+                order = sorted(range(len(tx_indices)), key=tx_indices.__getitem__)
+                slot_write_sorted = SlotWriteIndexed(
+                    slot_index=slot_write.slot_index,
+                    tx_indices=[tx_indices[i] for i in order],
+                    value_indices=[value_indices[i] for i in order],
+                )
                 sorted_slot_writes.append(slot_write_sorted)
 
             # Sort slots by slot index
@@ -482,6 +487,7 @@ def sort_block_access_list_optimized_both_indexed(block_access_list: BlockAccess
     return BlockAccessListOptimizedMappings(
         address_mapping=block_access_list.address_mapping,  # Address mapping doesn't need sorting
         slot_mapping=block_access_list.slot_mapping,  # Slot mapping doesn't need sorting
+        value_mapping=block_access_list.value_mapping,  # Value mapping doesn't need sorting
         storage_writes=sort_account_writes_indexed(block_access_list.storage_writes),
         storage_reads=sort_account_reads_indexed(block_access_list.storage_reads),
         balance_diffs=sort_diffs(block_access_list.balance_diffs, AccountBalanceDiff),
@@ -520,19 +526,25 @@ def main():
             print(f"  Fetching reads for block {block_number}...")
             block_reads = extract_reads_from_block(block_number, RPC_URL)
 
-        # Get diffs using both address and slot indexed optimized format
-        writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager = get_storage_diff_from_block_optimized_both_indexed(
-            trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
-        )
-        balance_diff, acc_bal_diffs = get_balance_diff_from_block(trace_result, address_manager)
-        code_diff, acc_code_diffs = get_code_diff_from_block(trace_result, address_manager)
-        nonce_diff, account_nonce_list = build_contract_nonce_diffs_from_state(
-            trace_result, address_manager
-        )
+        # Get diffs using both address and slot indexed optimized format.
+        # A block past a 16-bit index limit cannot be encoded in this format
+        try:
+            writes_encoded, reads_encoded, account_writes_list, account_reads_list, address_mapping, slot_mapping, address_manager, slot_manager, value_mapping, value_manager = get_storage_diff_from_block_optimized_both_indexed(
+                trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
+            )
+            balance_diff, acc_bal_diffs = get_balance_diff_from_block(trace_result, address_manager)
+            code_diff, acc_code_diffs = get_code_diff_from_block(trace_result, address_manager)
+            nonce_diff, account_nonce_list = build_contract_nonce_diffs_from_state(
+                trace_result, address_manager
+            )
+        except ValueError as e:
+            print(f"  Skipping block {block_number}: {e}")
+            continue
 
         block_obj = BlockAccessListOptimizedMappings(
             address_mapping=address_mapping,
             slot_mapping=slot_mapping,
+            value_mapping=value_mapping,
             storage_writes=account_writes_list,
             storage_reads=account_reads_list,
             balance_diffs=acc_bal_diffs,
@@ -559,13 +571,14 @@ def main():
         # Get sizes (in KiB)
         address_mapping_size = get_compressed_size(ssz.encode(address_mapping, sedes=AddressMapping))
         slot_mapping_size = get_compressed_size(ssz.encode(slot_mapping, sedes=SlotMapping))
+        value_mapping_size = get_compressed_size(ssz.encode(value_mapping, sedes=ValueMapping))
         writes_size = get_compressed_size(writes_encoded)
         reads_size = get_compressed_size(reads_encoded) if not IGNORE_STORAGE_LOCATIONS else 0
         balance_size = get_compressed_size(balance_diff)
         code_size = get_compressed_size(code_diff)
         nonce_size = get_compressed_size(nonce_diff)
 
-        total_size = address_mapping_size + slot_mapping_size + writes_size + reads_size + balance_size + code_size + nonce_size
+        total_size = address_mapping_size + slot_mapping_size + value_mapping_size + writes_size + reads_size + balance_size + code_size + nonce_size
 
         # Count affected accounts and slots
         accs, slots = count_accounts_and_slots(trace_result)
@@ -573,13 +586,16 @@ def main():
         # Get statistics from both managers
         address_stats = address_manager.get_stats()
         slot_stats = slot_manager.get_stats()
+        value_stats = value_manager.get_stats()
 
         print(f"  Block {block_number} mapping stats:")
         print(f"    Unique addresses: {address_stats['unique_addresses']}")
         print(f"    Unique slots: {slot_stats['unique_slots']}")
+        print(f"    Unique written values: {value_stats['unique_values']}")
         print(f"    Address mapping overhead: {address_mapping_size:.2f} KiB")
         print(f"    Slot mapping overhead: {slot_mapping_size:.2f} KiB")
-        print(f"    Total mapping overhead: {address_mapping_size + slot_mapping_size:.2f} KiB")
+        print(f"    Value mapping overhead: {value_mapping_size:.2f} KiB")
+        print(f"    Total mapping overhead: {address_mapping_size + slot_mapping_size + value_mapping_size:.2f} KiB")
 
         # Store stats
         data.append(
@@ -588,6 +604,7 @@ def main():
                 "sizes": {
                     "address_mapping_kb": address_mapping_size,
                     "slot_mapping_kb": slot_mapping_size,
+                    "value_mapping_kb": value_mapping_size,
                     "storage_writes_kb": writes_size,
                     "storage_reads_kb": reads_size,
                     "balance_diffs_kb": balance_size,
@@ -601,12 +618,14 @@ def main():
                 },
                 "address_stats": address_stats,
                 "slot_stats": slot_stats,
+                "value_stats": value_stats,
             }
         )
 
         # Totals for averages
         totals["address_mapping"].append(address_mapping_size)
         totals["slot_mapping"].append(slot_mapping_size)
+        totals["value_mapping"].append(value_mapping_size)
         totals["writes"].append(writes_size)
         totals["reads"].append(reads_size)
         totals["balance"].append(balance_size)
@@ -629,18 +648,24 @@ def main():
     overall_avg = sum(block_totals) / len(block_totals) if block_totals else 0
     print(f"\nOverall average compressed size per block: {overall_avg:.2f} KiB")
 
+    # Nothing to average if every block was skipped
+    if not data:
+        return
+
     # Calculate combined mapping efficiency
     avg_unique_addresses = sum(d["address_stats"]["unique_addresses"] for d in data) / len(data)
     avg_unique_slots = sum(d["slot_stats"]["unique_slots"] for d in data) / len(data)
     avg_address_mapping_size = sum(totals["address_mapping"]) / len(totals["address_mapping"])
     avg_slot_mapping_size = sum(totals["slot_mapping"]) / len(totals["slot_mapping"])
-    total_mapping_overhead = avg_address_mapping_size + avg_slot_mapping_size
+    avg_value_mapping_size = sum(totals["value_mapping"]) / len(totals["value_mapping"])
+    total_mapping_overhead = avg_address_mapping_size + avg_slot_mapping_size + avg_value_mapping_size
     
     print(f"\nCombined mapping efficiency:")
     print(f"Average unique addresses per block: {avg_unique_addresses:.1f}")
     print(f"Average unique slots per block: {avg_unique_slots:.1f}")
     print(f"Average address mapping overhead: {avg_address_mapping_size:.2f} KiB")
     print(f"Average slot mapping overhead: {avg_slot_mapping_size:.2f} KiB")
+    print(f"Average value mapping overhead: {avg_value_mapping_size:.2f} KiB")
     print(f"Total mapping overhead: {total_mapping_overhead:.2f} KiB")
 
 
@@ -6,7 +6,6 @@ import argparse
 from pathlib import Path
 from collections import defaultdict
 from typing import Any, Dict, List, Optional, Set, Tuple
-from eth_utils import to_canonical_address
 
 project_root = str(Path(__file__).parent.parent)
 src_dir = os.path.join(project_root, "src")
@@ -46,7 +45,7 @@ def get_deltas(tx_id, pres, posts, pre_balances, post_balances):
         if address in acc_map:
             acc_map[address].changes.append(bal_diff)
         else:
-            canonical = to_canonical_address(address)
+            canonical = canonical_address(address)
             acc_map[address] = AccountBalanceDiff(address=canonical, changes=[bal_diff])
     return acc_map
 
@@ -88,7 +87,7 @@ def get_balance_diff_from_block(trace_result):
     # Build final list of AccountBalanceDiff objects
     acc_bal_diffs = []
     for address, changes in address_balance_changes.items():
-        canonical = to_canonical_address(address)
+        canonical = canonical_address(address)
         acc_bal_diffs.append(AccountBalanceDiff(address=canonical, changes=changes))
 
     balance_diff = ssz.encode(acc_bal_diffs, sedes=BalanceDiffs)
@@ -132,7 +131,7 @@ def process_code_change(
 
     # Each account can only have one code change per block
     acc_map[address_hex] = AccountCodeDiff(
-        address=to_canonical_address(address_hex), change=change
+        address=canonical_address(address_hex), change=change
     )
 
 
@@ -190,6 +189,7 @@ def _build_slot_writes_indexed(
     acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
     address_hex: str,
     slot_manager: SlotIndexManager,
+    value_manager: ValueIndexManager,
 ) -> List[SlotWriteIndexed]:
     """Build all SlotWriteIndexed entries for one address."""
     slot_writes: List[SlotWriteIndexed] = []
@@ -197,11 +197,11 @@ def _build_slot_writes_indexed(
     # Handle writes
     for slot_hex, write_entries in acc_map_write.get(address_hex, {}).items():
         slot_index = slot_manager.get_or_create_index(slot_hex)
-        writes = [
-            PerTxWriteIndexed(tx_index=tx_id, value_after=hex_to_bytes32(val_hex))
-            for tx_id, val_hex in write_entries
-        ]
-        slot_writes.append(SlotWriteIndexed(slot_index=slot_index, writes=writes))
+        tx_indices = [tx_id for tx_id, _ in write_entries]
+        value_indices = value_manager.get_or_create_indices([val_hex for _, val_hex in write_entries])
+        slot_writes.append(SlotWriteIndexed(
+            slot_index=slot_index, tx_indices=tx_indices, value_indices=value_indices
+        ))
 
     return slot_writes
 
@@ -213,17 +213,16 @@ def _build_slot_reads_indexed(
     slot_manager: SlotIndexManager,
 ) -> List[SlotReadIndexed]:
     """Build all SlotReadIndexed entries for one address (excluding written slots)."""
-    slot_reads: List[SlotReadIndexed] = []
-
     # Handle reads (only if not written)
     written_slots = set(acc_map_write.get(address_hex, {}).keys())
-    for slot_hex in acc_map_reads.get(address_hex, set()):
-        if slot_hex in written_slots:
-            continue
-        slot_index = slot_manager.get_or_create_index(slot_hex)
-        slot_reads.append(SlotReadIndexed(slot_index=slot_index))
-
-    return slot_reads
+    read_slots = [
+        slot_hex for slot_hex in acc_map_reads.get(address_hex, set())
+        if slot_hex not in written_slots
+    ]
+    return [
+        SlotReadIndexed(slot_index=slot_index)
+        for slot_index in slot_manager.get_or_create_indices(read_slots)
+    ]
 
 
 def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
@@ -248,14 +247,15 @@ def get_storage_diff_from_block_optimized_indexed(
     trace_result: List[dict], 
     additional_reads: Optional[Dict[str, Set[str]]] = None,
     ignore_reads: bool = IGNORE_STORAGE_LOCATIONS
-) -> Tuple[bytes, bytes, List[AccountWritesIndexed], List[AccountReadsIndexed], SlotMapping, SlotIndexManager]:
+) -> Tuple[bytes, bytes, List[AccountWritesIndexed], List[AccountReadsIndexed], SlotMapping, SlotIndexManager, ValueMapping, ValueIndexManager]:
     """
     Build and SSZ‐encode separate AccountWritesIndexed and AccountReadsIndexed with slot mapping.
     Returns:
-        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager)
+        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager, value_mapping, value_manager)
     """
-    # Initialize slot index manager
+    # Initialize slot and value index managers
     slot_manager = SlotIndexManager()
+    value_manager = ValueIndexManager()
     
     # Track all writes and reads across the entire block
     block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
@@ -317,47 +317,46 @@ def get_storage_diff_from_block_optimized_indexed(
 
     # Build writes
     for address in block_writes.keys():
-        canonical = to_canonical_address(address)
-        slot_writes = _build_slot_writes_indexed(block_writes, address, slot_manager)
+        canonical = canonical_address(address)
+        slot_writes = _build_slot_writes_indexed(block_writes, address, slot_manager, value_manager)
         if slot_writes:
             account_writes_list.append(AccountWritesIndexed(address=canonical, slot_writes=slot_writes))
 
     # Build reads
     if not ignore_reads:
         for address in block_reads.keys():
-            canonical = to_canonical_address(address)
+            canonical = canonical_address(address)
             slot_reads = _build_slot_reads_indexed(block_reads, block_writes, address, slot_manager)
             if slot_reads:
                 account_reads_list.append(AccountReadsIndexed(address=canonical, slot_reads=slot_reads))
 
-    # Get the slot mapping
+    # Get the slot and value mappings
     slot_mapping = slot_manager.get_slot_mapping()
+    value_mapping = value_manager.get_value_mapping()
 
     writes_encoded = ssz.encode(account_writes_list, sedes=AccountWritesIndexedList)
     reads_encoded = ssz.encode(account_reads_list, sedes=AccountReadsIndexedList)
     
-    return writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager
+    return writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager, value_mapping, value_manager
 
 
 def _get_nonce(info: dict, fallback: str = "0") -> int:
     """Safely parse a nonce string from a state dict, with fallback."""
-    nonce_str = info.get("nonce", fallback)
-    return int(nonce_str, 16) if isinstance(nonce_str, str) and nonce_str.startswith('0x') else int(nonce_str)
+    return parse_nonce(info.get("nonce", fallback))
 
 
-def _should_record_nonce_diff(pre_info: dict, post_info: dict) -> bool:
+def _nonce_diff(pre_info: dict, post_info: dict) -> Optional[int]:
     """
-    Determine whether a nonce diff should be recorded:
+    Return the post-tx nonce if a nonce diff should be recorded, else None:
     - pre_info has both 'nonce' and 'code'
     - post_nonce > pre_nonce
     """
     if "nonce" not in pre_info or "code" not in pre_info:
-        return False
+        return None
 
-    pre_nonce_str = pre_info["nonce"]
-    pre_nonce = int(pre_nonce_str, 16) if isinstance(pre_nonce_str, str) and pre_nonce_str.startswith('0x') else int(pre_nonce_str)
-    post_nonce = _get_nonce(post_info, fallback=str(pre_nonce))
-    return post_nonce > pre_nonce
+    pre_nonce = _get_nonce(pre_info)
+    post_nonce = _get_nonce(post_info) if "nonce" in post_info else pre_nonce
+    return post_nonce if post_nonce > pre_nonce else None
 
 
 def _record_nonce_diff(
@@ -376,7 +375,7 @@ def _build_account_nonce_diffs(
     """Convert raw nonce map into SSZ-serializable objects."""
     account_nonce_list: List[AccountNonceDiff] = []
     for address_hex, changes in nonce_map.items():
-        addr_bytes20 = to_canonical_address(address_hex)
+        addr_bytes20 = canonical_address(address_hex)
         nonce_changes = [
             TxNonceDiff(tx_index=tx_idx, nonce_after=nonce_after) for tx_idx, nonce_after in changes
         ]
@@ -407,9 +406,9 @@ def build_contract_nonce_diffs_from_state(
 
         for address_hex, pre_info in pre_state.items():
             post_info = post_state.get(address_hex, {})
-            if not _should_record_nonce_diff(pre_info, post_info):
+            post_nonce = _nonce_diff(pre_info, post_info)
+            if post_nonce is None:
                 continue
-            post_nonce = _get_nonce(post_info, fallback=pre_info["nonce"])
             _record_nonce_diff(nonce_map, address_hex, tx_index, post_nonce)
 
     account_nonce_list = _build_account_nonce_diffs(nonce_map)
@@ -423,9 +422,14 @@ def sort_block_access_list_optimized_indexed(block_access_list: BlockAccessListO
         for account in sorted(account_writes, key=lambda a: bytes(a.address) if hasattr(a, 'address') else a.address_index):
             sorted_slot_writes = []
             for slot_write in account.slot_writes:
-                # Sort the per-tx writes by tx_index
-                writes_sorted = sorted(slot_write.writes, key=lambda x: x.tx_index)
-                slot_write_sorted = SlotWriteIndexed(slot_index=slot_write.slot_index, writes=writes_sorted)
+                # Sort the per-tx write columns together by tx_index
+                tx_indices, value_indices = slot_write.tx_indices, slot_write.value_indices
+                order = sorted(range(len(tx_indices)), key=tx_indices.__getitem__)
+                slot_write_sorted = SlotWriteIndexed(
+                    slot_index=slot_write.slot_index,
+                    tx_indices=[tx_indices[i] for i in order],
+                    value_indices=[value_indices[i] for i in order],
+                )
                 sorted_slot_writes.append(slot_write_sorted)
 
             # Sort slots by slot index
@@ -475,6 +479,7 @@ def sort_block_access_list_optimized_indexed(block_access_list: BlockAccessListO
 
     return BlockAccessListOptimizedSlots(
         slot_mapping=block_access_list.slot_mapping,  # Slot mapping doesn't need sorting
+        value_mapping=block_access_list.value_mapping,  # Value mapping doesn't need sorting
         storage_writes=sort_account_writes_indexed(block_access_list.storage_writes),
         storage_reads=sort_account_reads_indexed(block_access_list.storage_reads),
         balance_diffs=sort_diffs(block_access_list.balance_diffs, AccountBalanceDiff),
@@ -513,10 +518,15 @@ def main():
             print(f"  Fetching reads for block {block_number}...")
             block_reads = extract_reads_from_block(block_number, RPC_URL)
 
-        # Get diffs using slot-indexed optimized format
-        writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager = get_storage_diff_from_block_optimized_indexed(
-            trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
-        )
+        # Get diffs using slot-indexed optimized format.
+        # A block past a 16-bit index limit cannot be encoded in this format
+        try:
+            writes_encoded, reads_encoded, account_writes_list, account_reads_list, slot_mapping, slot_manager, value_mapping, value_manager = get_storage_diff_from_block_optimized_indexed(
+                trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
+            )
+        except ValueError as e:
+            print(f"  Skipping block {block_number}: {e}")
+            continue
         balance_diff, acc_bal_diffs = get_balance_diff_from_block(trace_result)
         code_diff, acc_code_diffs = get_code_diff_from_block(trace_result)
         nonce_diff, account_nonce_list = build_contract_nonce_diffs_from_state(
@@ -526,6 +536,7 @@ def main():
         block_obj = BlockAccessListOptimizedMappings(
             address_mapping=AddressMapping(addresses=[]),  # Empty for slot-only
             slot_mapping=slot_mapping,
+            value_mapping=value_mapping,
             storage_writes=account_writes_list,
             storage_reads=account_reads_list,
             balance_diffs=acc_bal_diffs,
@@ -551,24 +562,28 @@ def main():
 
         # Get sizes (in KiB)
         slot_mapping_size = get_compressed_size(ssz.encode(slot_mapping, sedes=SlotMapping))
+        value_mapping_size = get_compressed_size(ssz.encode(value_mapping, sedes=ValueMapping))
         writes_size = get_compressed_size(writes_encoded)
         reads_size = get_compressed_size(reads_encoded) if not IGNORE_STORAGE_LOCATIONS else 0
         balance_size = get_compressed_size(balance_diff)
         code_size = get_compressed_size(code_diff)
         nonce_size = get_compressed_size(nonce_diff)
 
-        total_size = slot_mapping_size + writes_size + reads_size + balance_size + code_size + nonce_size
+        total_size = slot_mapping_size + value_mapping_size + writes_size + reads_size + balance_size + code_size + nonce_size
 
         # Count affected accounts and slots
         accs, slots = count_accounts_and_slots(trace_result)
 
         # Get slot manager statistics
         slot_stats = slot_manager.get_stats()
+        value_stats = value_manager.get_stats()
 
         print(f"  Block {block_number} slot mapping stats:")
         print(f"    Unique slots: {slot_stats['unique_slots']}")
+        print(f"    Unique written values: {value_stats['unique_values']}")
         print(f"    Bytes saved per slot reference: {slot_stats['bytes_saved_per_reference']}")
         print(f"    Slot mapping overhead: {slot_mapping_size:.2f} KiB")
+        print(f"    Value mapping overhead: {value_mapping_size:.2f} KiB")
 
         # Store stats
         data.append(
@@ -576,6 +591,7 @@ def main():
                 "block_number": block_number,
                 "sizes": {
                     "slot_mapping_kb": slot_mapping_size,
+                    "value_mapping_kb": value_mapping_size,
                     "storage_writes_kb": writes_size,
                     "storage_reads_kb": reads_size,
                     "balance_diffs_kb": balance_size,
@@ -588,11 +604,13 @@ def main():
                     "slots": slots,
                 },
                 "slot_stats": slot_stats,
+                "value_stats": value_stats,
             }
         )
 
         # Totals for averages
         totals["slot_mapping"].append(slot_mapping_size)
+        totals["value_mapping"].append(value_mapping_size)
         totals["writes"].append(writes_size)
         totals["reads"].append(reads_size)
         totals["balance"].append(balance_size)
@@ -615,12 +633,17 @@ def main():
     overall_avg = sum(block_totals) / len(block_totals) if block_totals else 0
     print(f"\nOverall average compressed size per block: {overall_avg:.2f} KiB")
 
+    # Nothing to average if every block was skipped
+    if not data:
+        return
+
     # Calculate average slot mapping efficiency
     avg_unique_slots = sum(d["slot_stats"]["unique_slots"] for d in data) / len(data)
     avg_slot_mapping_size = sum(totals["slot_mapping"]) / len(totals["slot_mapping"])
     print(f"\nSlot mapping efficiency:")
     print(f"Average unique slots per block: {avg_unique_slots:.1f}")
     print(f"Average slot mapping overhead: {avg_slot_mapping_size:.2f} KiB")
+    print(f"Average value mapping overhead: {sum(totals['value_mapping']) / len(totals['value_mapping']):.2f} KiB")
 
 
 if __name__ == "__main__":
@@ -4,9 +4,11 @@ import sys
 import json
 import argparse
 from pathlib import Path
+from functools import partial
+from itertools import chain
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Set, Tuple
-from eth_utils import to_canonical_address
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 project_root = str(Path(__file__).parent.parent)
 src_dir = os.path.join(project_root, "src")
@@ -23,20 +25,28 @@ with open(rpc_file, "r") as file:
 IGNORE_STORAGE_LOCATIONS = False
 
 
-def extract_balances(state):
+def extract_balances(state: Dict[str, dict]) -> Dict[str, int]:
     return {
         addr: parse_hex_or_zero(changes.get("balance"))
         for addr, changes in state.items()
     }
 
 
-def parse_pre_and_post_balances(pre_state, post_state):
+def parse_pre_and_post_balances(
+    pre_state: Dict[str, dict], post_state: Dict[str, dict]
+) -> Tuple[Dict[str, int], Dict[str, int]]:
     return extract_balances(pre_state), extract_balances(post_state)
 
 
-def get_deltas(tx_id, pres, posts, pre_balances, post_balances):
+def get_deltas(
+    tx_id: int,
+    pres: Set[str],
+    posts: Set[str],
+    pre_balances: Dict[str, int],
+    post_balances: Dict[str, int],
+) -> Dict[str, AccountBalanceDiffRLP]:
     balance_delta = get_balance_delta(pres, posts, pre_balances, post_balances)
-    acc_map: dict[bytes, AccountBalanceDiffRLP] = {}
+    acc_map: Dict[str, AccountBalanceDiffRLP] = {}
     for address, delta_val in balance_delta.items():
         if delta_val == 0:
             continue
@@ -46,14 +56,19 @@ def get_deltas(tx_id, pres, posts, pre_balances, post_balances):
         if address in acc_map:
             acc_map[address].changes.append(bal_diff)
         else:
-            canonical = to_canonical_address(address)
+            canonical = canonical_address(address)
             acc_map[address] = AccountBalanceDiffRLP(address=canonical, changes=[bal_diff])
     return acc_map
 
 
-def get_balance_delta(pres, posts, pre_balances, post_balances):
+def get_balance_delta(
+    pres: Set[str],
+    posts: Set[str],
+    pre_balances: Dict[str, int],
+    post_balances: Dict[str, int],
+) -> Dict[str, int]:
     all_addresses = pres.union(posts)  # Use union instead of intersection
-    balance_delta = {}
+    balance_delta: Dict[str, int] = {}
     for addr in all_addresses:
         pre_balance = pre_balances.get(addr, 0)
         post_balance = post_balances.get(addr, 0)
@@ -63,46 +78,54 @@ def get_balance_delta(pres, posts, pre_balances, post_balances):
     return balance_delta
 
 
-def get_balance_diff_from_block(trace_result):
-    # Aggregate all balance changes per address across the entire block
-    address_balance_changes: Dict[str, List[BalanceChangeRLP]] = {}
-
-    for tx_id, tx in enumerate(trace_result):
-        tx_hash = tx.get("txHash")
-        result = tx.get("result")
-        if not isinstance(result, dict):
-            print(type(result))
-            continue
+def _collect_balance_change(
+    tx_id: int,
+    address: str,
+    pre_info: dict,
+    post_info: dict,
+    balance_changes: Dict[str, List[BalanceChangeRLP]],
+) -> None:
+    """Record a balance increase of `address` in this tx; same rule as `get_balance_delta`."""
+    delta = parse_hex_or_zero(post_info.get("balance")) - parse_hex_or_zero(pre_info.get("balance"))
+    if delta > 0:
+        balance_changes.setdefault(address, []).append(
+            BalanceChangeRLP(tx_index=tx_id, delta=encode_balance_delta(delta))
+        )
 
-        pre_state, post_state = tx["result"]["pre"], tx["result"]["post"]
-        pre_balances, post_balances = parse_pre_and_post_balances(pre_state, post_state)
-        pres, posts = set(pre_balances.keys()), set(post_balances.keys())
-        acc_map = get_deltas(tx_id, pres, posts, pre_balances, post_balances)
 
-        # Aggregate changes by address
-        for address, account_diff in acc_map.items():
-            if address not in address_balance_changes:
-                address_balance_changes[address] = []
-            address_balance_changes[address].extend(account_diff.changes)
+def _build_balance_diffs(
+    balance_changes: Dict[str, List[BalanceChangeRLP]],
+) -> List[AccountBalanceDiffRLP]:
+    """Build the final list of AccountBalanceDiffRLP objects, sorted by address."""
+    acc_bal_diffs = [
+        AccountBalanceDiffRLP(address=canonical_address(address), changes=changes)
+        for address, changes in balance_changes.items()
+    ]
+    acc_bal_diffs.sort(key=lambda diff: diff.address)
+    return acc_bal_diffs
 
-    # Build final list of AccountBalanceDiffRLP objects
-    acc_bal_diffs = []
-    for address, changes in address_balance_changes.items():
-        canonical = to_canonical_address(address)
-        acc_bal_diffs.append(AccountBalanceDiffRLP(address=canonical, changes=changes))
 
-    balance_diff = rlp.encode(acc_bal_diffs)
+def get_balance_diff_from_block(
+    trace_result: Iterable[dict],
+) -> Tuple[bytes, List[AccountBalanceDiffRLP]]:
+    _, _, acc_bal_diffs, _, _, _ = build_all_diffs(trace_result, ignore_reads=True)
+    balance_diff = rlp.encode(acc_bal_diffs, sedes=BalanceDiffsRLP)
     return balance_diff, acc_bal_diffs
 
 
-def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
-    """Returns the code from state if it's non-empty, else None."""
-    code = state.get(address, {}).get("code")
+def _non_empty_code(info: dict) -> Optional[str]:
+    """Returns the code of an account's state if it's non-empty, else None."""
+    code = info.get("code")
     if code and code not in ("", "0x"):
         return code
     return None
 
 
+def extract_non_empty_code(state: dict, address: str) -> Optional[str]:
+    """Returns the code from state if it's non-empty, else None."""
+    return _non_empty_code(state.get(address, {}))
+
+
 def decode_hex_code(code_hex: str) -> bytes:
     """Converts a hex code string (with or without 0x) to raw bytes."""
     code_str = code_hex[2:] if code_hex.startswith("0x") else code_hex
@@ -115,7 +138,7 @@ def process_code_change(
     pre_code: Optional[str],
     post_code: Optional[str],
     acc_map: Dict[str, AccountCodeDiffRLP],
-):
+) -> None:
     """If there's a code change, update acc_map with a new CodeChangeRLP."""
     if post_code is None or post_code == pre_code:
         return
@@ -132,37 +155,19 @@ def process_code_change(
 
     # Each account can only have one code change per block
     acc_map[address_hex] = AccountCodeDiffRLP(
-        address=to_canonical_address(address_hex), change=change
+        address=canonical_address(address_hex), change=change
     )
 
 
-def get_code_diff_from_block(trace_result: List[dict]) -> bytes:
+def get_code_diff_from_block(
+    trace_result: Iterable[dict],
+) -> Tuple[bytes, List[AccountCodeDiffRLP]]:
     """
     Builds and RLP‐encodes all AccountCodeDiffRLP entries for the given trace_result.
-    Returns an RLP-encoded byte blob.
+    Returns the RLP-encoded bytes and the list of AccountCodeDiffRLP entries.
     """
-    # Track code changes per address across the entire block
-    acc_map: Dict[str, AccountCodeDiffRLP] = {}
-
-    for tx_id, tx in enumerate(trace_result):
-        tx_hash = tx.get("txHash")
-        result = tx.get("result")
-        if not isinstance(result, dict):
-            print(f"Unexpected result type for tx {tx_hash}: {type(result)}")
-            continue
-
-        pre_state, post_state = result.get("pre", {}), result.get("post", {})
-        all_addresses = set(pre_state) | set(post_state)
-
-        for address in all_addresses:
-            pre_code = extract_non_empty_code(pre_state, address)
-            post_code = extract_non_empty_code(post_state, address)
-            process_code_change(tx_id, address, pre_code, post_code, acc_map)
-
-    # Build final list of AccountCodeDiffRLP objects
-    acc_code_diffs = list(acc_map.values())
-
-    return rlp.encode(acc_code_diffs), acc_code_diffs
+    _, _, _, acc_code_diffs, _, _ = build_all_diffs(trace_result, ignore_reads=True)
+    return rlp.encode(acc_code_diffs, sedes=CodeDiffsRLP), acc_code_diffs
 
 
 def _is_non_write_read(pre_val_hex: Optional[str], post_val_hex: Optional[str]) -> bool:
@@ -170,38 +175,32 @@ def _is_non_write_read(pre_val_hex: Optional[str], post_val_hex: Optional[str])
     return pre_val_hex is not None and post_val_hex is None
 
 
-def _add_write(
-    acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
-    address: str,
-    slot: str,
-    tx_id: int,
-    new_val_hex: str,
-) -> None:
-    acc_map_write.setdefault(address, {}).setdefault(slot, []).append(
-        (tx_id, new_val_hex)
-    )
-
-
-def _add_read(acc_map_reads: Dict[str, Set[str]], address: str, slot: str) -> None:
-    acc_map_reads.setdefault(address, set()).add(slot)
-
-
 def _build_slot_writes(
     acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
     address_hex: str,
 ) -> List[SlotWriteRLP]:
-    """Build all SlotWriteRLP entries for one address."""
-    slot_writes: List[SlotWriteRLP] = []
-
-    # Handle writes
-    for slot_hex, write_entries in acc_map_write.get(address_hex, {}).items():
-        slot = encode_storage_key(slot_hex)
-        writes = [
-            PerTxWriteRLP(tx_index=tx_id, value_after=encode_storage_value(val_hex))
-            for tx_id, val_hex in write_entries
-        ]
-        slot_writes.append(SlotWriteRLP(slot=slot, writes=writes))
-
+    """Build all SlotWriteRLP entries for one address, sorted by slot."""
+    address_writes = acc_map_write.get(address_hex, {})
+    # All slots and all written values of the address are each decoded in one
+    # batch; the values come back in the same order they are consumed below
+    slots = encode_storage_keys(address_writes)
+    values = iter(encode_storage_values([
+        val_hex for write_entries in address_writes.values() for _, val_hex in write_entries
+    ]))
+    # Built in one comprehension rather than appended to: the number of slots
+    # and of writes per slot is known up front, and CPython has no cheaper way
+    # to presize a list than letting the comprehension fill it
+    slot_writes = [
+        SlotWriteRLP(
+            slot=slot,
+            writes=[
+                PerTxWriteRLP(tx_index=tx_id, value_after=next(values))
+                for tx_id, _ in write_entries
+            ],
+        )
+        for slot, write_entries in zip(slots, address_writes.values())
+    ]
+    slot_writes.sort(key=lambda slot_write: slot_write.slot)
     return slot_writes
 
 
@@ -210,146 +209,141 @@ def _build_slot_reads(
     acc_map_write: Dict[str, Dict[str, List[Tuple[int, str]]]],
     address_hex: str,
 ) -> List[SlotReadRLP]:
-    """Build all SlotReadRLP entries for one address (excluding written slots)."""
-    slot_reads: List[SlotReadRLP] = []
-
+    """Build all SlotReadRLP entries for one address (excluding written slots), sorted by slot."""
     # Handle reads (only if not written)
-    written_slots = set(acc_map_write.get(address_hex, {}).keys())
-    for slot_hex in acc_map_reads.get(address_hex, set()):
-        if slot_hex in written_slots:
-            continue
-        slot = encode_storage_key(slot_hex)
-        slot_reads.append(SlotReadRLP(slot=slot))
-
+    read_slots = acc_map_reads.get(address_hex, set()) - acc_map_write.get(address_hex, {}).keys()
+    slot_reads = [SlotReadRLP(slot=slot) for slot in encode_storage_keys(read_slots)]
+    slot_reads.sort(key=lambda slot_read: slot_read.slot)
     return slot_reads
 
 
-def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
+def extract_reads_from_trace(trace_result: Iterable[dict]) -> Dict[str, Set[str]]:
     """
-    Extract reads from a block using diff_mode=False.
+    Extract reads from a diff_mode=False trace.
     Returns a dictionary mapping addresses to sets of storage slots that were read.
     """
-    trace_result = fetch_block_trace(block_number, rpc_url, diff_mode=False)
     reads = defaultdict(set)
-    
+
+    # prestateTracer already emits lowercase hex slot keys, so each storage
+    # dict is merged with one C-level set update instead of a per-slot loop
     for tx_trace in trace_result:
         result = tx_trace.get("result", {})
         for address, acc_data in result.items():
-            storage = acc_data.get("storage", {})
-            for slot in storage.keys():
-                reads[address.lower()].add(slot.lower())
-    
+            storage = acc_data.get("storage")
+            if storage:
+                reads[address.lower()].update(storage)
+
     return reads
 
 
-def get_storage_diff_from_block_optimized(
-    trace_result: List[dict], 
-    additional_reads: Optional[Dict[str, Set[str]]] = None,
-    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS
-) -> Tuple[bytes, bytes, List[AccountWritesRLP], List[AccountReadsRLP]]:
+def extract_reads_from_block(block_number: int, rpc_url: str) -> Dict[str, Set[str]]:
     """
-    Build and RLP‐encode separate AccountWritesRLP and AccountReadsRLP for optimized format.
-    Returns:
-        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list)
+    Extract reads from a block using diff_mode=False.
+    Returns a dictionary mapping addresses to sets of storage slots that were read.
     """
-    # Track all writes and reads across the entire block
-    block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = {}
-    block_reads: Dict[str, Set[str]] = {}
+    return extract_reads_from_trace(stream_block_trace(block_number, rpc_url, diff_mode=False))
 
-    for tx_id, tx in enumerate(trace_result):
-        result = tx.get("result")
-        if not isinstance(result, dict):
-            continue
 
-        pre_state = result.get("pre", {})
-        post_state = result.get("post", {})
-
-        all_addresses = set(pre_state) | set(post_state)
-
-        for address in all_addresses:
-            pre_storage = pre_state.get(address, {}).get("storage", {})
-            post_storage = post_state.get(address, {}).get("storage", {})
+def _collect_storage_diff(
+    tx_id: int,
+    address: str,
+    pre_storage: dict,
+    post_storage: dict,
+    pending_writes: PendingStorageWrites,
+    block_reads: Dict[str, Set[str]],
+    ignore_reads: bool,
+) -> None:
+    """
+    Queue the candidate storage writes of `address` in this tx and record its
+    pure reads. Candidates are compared by `PendingStorageWrites.changed_writes`;
+    reads of slots that are written anywhere in the block are dropped by
+    `_build_slot_reads`.
+    """
+    if post_storage:
+        pending_writes.add(tx_id, address, pre_storage, post_storage)
 
-            all_slots = set(pre_storage) | set(post_storage)
+    if ignore_reads or not pre_storage:
+        return
 
-            for slot in all_slots:
-                pre_val = pre_storage.get(slot)
-                post_val = post_storage.get(slot)
+    # Accounts whose storage is untouched in this tx (hot contracts that are
+    # only read) have no post storage at all: every pre slot is then a pure
+    # read and the whole snapshot is merged with a single set update
+    if not post_storage and None not in pre_storage.values():
+        block_reads[address].update(pre_storage)
+        return
 
-                # If written (non-equal values or fresh write)
-                if post_val is not None:
-                    pre_bytes = (
-                        hex_to_bytes32(pre_val) if pre_val is not None else b"\x00" * 32
-                    )
-                    post_bytes = hex_to_bytes32(post_val)
-                    if pre_bytes != post_bytes:
-                        _add_write(block_writes, address, slot, tx_id, post_val)
+    for slot, pre_val in pre_storage.items():
+        # If read-only (appears in pre but not modified in post)
+        if _is_non_write_read(pre_val, post_storage.get(slot)):
+            block_reads[address].add(slot)
 
-                # If read-only (appears in pre but not modified in post)
-                elif not ignore_reads and _is_non_write_read(pre_val, post_val):
-                    # Only add as read if this slot wasn't written to in this block
-                    if address not in block_writes or slot not in block_writes.get(
-                        address, {}
-                    ):
-                        _add_read(block_reads, address, slot)
 
-    # Add additional reads from diff_mode=False if provided and not ignoring reads
-    if not ignore_reads and additional_reads is not None:
-        for address, read_slots in additional_reads.items():
-            # Only add reads that aren't already written to
-            if address not in block_writes:
-                for slot in read_slots:
-                    _add_read(block_reads, address, slot)
-            else:
-                written_slots = set(block_writes[address].keys())
-                for slot in read_slots:
-                    if slot not in written_slots:
-                        _add_read(block_reads, address, slot)
-
-    # Build separate writes and reads lists
+def _build_storage_diffs(
+    block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]],
+    block_reads: Dict[str, Set[str]],
+    ignore_reads: bool,
+) -> Tuple[List[AccountWritesRLP], List[AccountReadsRLP]]:
+    """Build separate writes and reads lists, each sorted by address and slot."""
     account_writes_list = []
     account_reads_list = []
 
     # Build writes
     for address in block_writes.keys():
-        canonical = to_canonical_address(address)
+        canonical = canonical_address(address)
         slot_writes = _build_slot_writes(block_writes, address)
         if slot_writes:
             account_writes_list.append(AccountWritesRLP(address=canonical, slot_writes=slot_writes))
+    account_writes_list.sort(key=lambda account: account.address)
 
     # Build reads
     if not ignore_reads:
         for address in block_reads.keys():
-            canonical = to_canonical_address(address)
+            canonical = canonical_address(address)
             slot_reads = _build_slot_reads(block_reads, block_writes, address)
             if slot_reads:
                 account_reads_list.append(AccountReadsRLP(address=canonical, slot_reads=slot_reads))
+        account_reads_list.sort(key=lambda account: account.address)
 
-    writes_encoded = rlp.encode(account_writes_list)
-    reads_encoded = rlp.encode(account_reads_list)
-    
-    return writes_encoded, reads_encoded, account_writes_list, account_reads_list
+    return account_writes_list, account_reads_list
 
 
-def _get_nonce(info: dict, fallback: str = "0") -> int:
-    """Safely parse a nonce string from a state dict, with fallback."""
-    nonce_str = info.get("nonce", fallback)
-    return int(nonce_str, 16) if isinstance(nonce_str, str) and nonce_str.startswith('0x') else int(nonce_str)
+def get_storage_diff_from_block_optimized(
+    trace_result: List[dict], 
+    additional_reads: Optional[Dict[str, Set[str]]] = None,
+    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS
+) -> Tuple[bytes, bytes, List[AccountWritesRLP], List[AccountReadsRLP]]:
+    """
+    Build and RLP‐encode separate AccountWritesRLP and AccountReadsRLP for optimized format.
+    Returns:
+        A tuple of (writes_encoded, reads_encoded, account_writes_list, account_reads_list)
+    """
+    account_writes_list, account_reads_list, _, _, _, _ = build_all_diffs(
+        trace_result, additional_reads, ignore_reads
+    )
+
+    writes_encoded = rlp.encode(account_writes_list, sedes=AccountWritesListRLP)
+    reads_encoded = rlp.encode(account_reads_list, sedes=AccountReadsListRLP)
+    
+    return writes_encoded, reads_encoded, account_writes_list, account_reads_list
 
 
-def _should_record_nonce_diff(pre_info: dict, post_info: dict) -> bool:
+def _nonce_diff(pre_info: dict, post_info: dict) -> Optional[int]:
     """
-    Determine whether a nonce diff should be recorded:
+    Return the post-tx nonce if a nonce diff should be recorded, else None:
     - pre_info has both 'nonce' and 'code'
     - post_nonce > pre_nonce
     """
     if "nonce" not in pre_info or "code" not in pre_info:
-        return False
+        return None
 
-    pre_nonce_str = pre_info["nonce"]
-    pre_nonce = int(pre_nonce_str, 16) if isinstance(pre_nonce_str, str) and pre_nonce_str.startswith('0x') else int(pre_nonce_str)
-    post_nonce = _get_nonce(post_info, fallback=str(pre_nonce))
-    return post_nonce > pre_nonce
+    # An absent or unchanged post nonce can never be an increase, so neither
+    # side needs parsing; otherwise each side is parsed exactly once
+    pre_raw = pre_info["nonce"]
+    post_raw = post_info.get("nonce")
+    if post_raw is None or post_raw == pre_raw:
+        return None
+    post_nonce = parse_nonce(post_raw)
+    return post_nonce if post_nonce > parse_nonce(pre_raw) else None
 
 
 def _record_nonce_diff(
@@ -365,16 +359,17 @@ def _record_nonce_diff(
 def _build_account_nonce_diffs(
     nonce_map: Dict[str, List[Tuple[int, int]]],
 ) -> List[AccountNonceDiffRLP]:
-    """Convert raw nonce map into RLP-serializable objects."""
-    account_nonce_list: List[AccountNonceDiffRLP] = []
-    for address_hex, changes in nonce_map.items():
-        addr_bytes20 = to_canonical_address(address_hex)
-        nonce_changes = [
-            TxNonceDiffRLP(tx_index=tx_idx, nonce_after=nonce_after) for tx_idx, nonce_after in changes
-        ]
-        account_nonce_list.append(
-            AccountNonceDiffRLP(address=addr_bytes20, changes=nonce_changes)
+    """Convert raw nonce map into RLP-serializable objects, sorted by address."""
+    account_nonce_list = [
+        AccountNonceDiffRLP(
+            address=canonical_address(address_hex),
+            changes=[
+                TxNonceDiffRLP(tx_index=tx_idx, nonce_after=nonce_after) for tx_idx, nonce_after in changes
+            ],
         )
+        for address_hex, changes in nonce_map.items()
+    ]
+    account_nonce_list.sort(key=lambda diff: diff.address)
     return account_nonce_list
 
 
@@ -387,91 +382,253 @@ def build_contract_nonce_diffs_from_state(
       1) the RLP-encoded bytes,
       2) the raw list[AccountNonceDiffRLP].
     """
+    _, _, _, _, account_nonce_list, _ = build_all_diffs(trace_result, ignore_reads=True)
+    encoded_bytes = rlp.encode(account_nonce_list, sedes=NonceDiffsRLP)
+    return encoded_bytes, account_nonce_list
+
+
+def build_all_diffs(
+    trace_result: Iterable[dict],
+    additional_reads: Optional[Union[Dict[str, Set[str]], Future]] = None,
+    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS,
+) -> Tuple[
+    List[AccountWritesRLP], List[AccountReadsRLP], List[AccountBalanceDiffRLP],
+    List[AccountCodeDiffRLP], List[AccountNonceDiffRLP], Tuple[int, int],
+]:
+    """
+    Collect storage, balance, code and nonce diffs in a single pass over
+    trace_result, with the same rules as the per-diff-type functions above.
+    trace_result is consumed exactly once, so it can be a stream of tx traces
+    (e.g. ``stream_block_trace``) and each tx can be freed once processed.
+    Every list comes out in BAL order (accounts by address, slots by key,
+    changes by tx index), so no separate sorting pass is needed.
+    The account/slot counts of `count_accounts_and_slots` are gathered in
+    the same pass.
+    additional_reads may be a Future still being fetched; it is only
+    waited for once the trace has been consumed.
+    Returns:
+        A tuple of (account_writes_list, account_reads_list, acc_bal_diffs,
+        acc_code_diffs, account_nonce_list, (accounts, slots))
+    """
+    block_writes: Dict[str, Dict[str, List[Tuple[int, str]]]] = defaultdict(partial(defaultdict, list))
+    block_reads: Dict[str, Set[str]] = defaultdict(set)
+    pending_writes = PendingStorageWrites()
+    balance_changes: Dict[str, List[BalanceChangeRLP]] = {}
+    code_map: Dict[str, AccountCodeDiffRLP] = {}
     nonce_map: Dict[str, List[Tuple[int, int]]] = {}
+    post_accounts: Set[str] = set()
+    post_slot_count = 0
 
-    for tx_index, tx in enumerate(trace_result):
+    for tx_id, tx in enumerate(trace_result):
         result = tx.get("result")
         if not isinstance(result, dict):
+            print(f"Unexpected result type for tx {tx.get('txHash')}: {type(result)}")
             continue
 
         pre_state = result.get("pre", {})
         post_state = result.get("post", {})
+        post_accounts.update(post_state)
+
+        # Every touched account is visited once and shared by all four diff
+        # types: pre_state entries with their post counterpart, then accounts
+        # only present in post_state (creations), so no side is looked up twice
+        for address, pre_info, post_info in chain(
+            ((address, pre_info, post_state.get(address, {})) for address, pre_info in pre_state.items()),
+            ((address, {}, post_info) for address, post_info in post_state.items() if address not in pre_state),
+        ):
+            _collect_balance_change(tx_id, address, pre_info, post_info, balance_changes)
+            process_code_change(
+                tx_id, address, _non_empty_code(pre_info), _non_empty_code(post_info), code_map
+            )
+            _collect_storage_diff(
+                tx_id, address, pre_info.get("storage", {}), post_info.get("storage", {}),
+                pending_writes, block_reads, ignore_reads,
+            )
+            if "storage" in post_info:
+                post_slot_count += len(post_info["storage"])
+            # Created accounts have an empty pre_info, which never yields a nonce diff
+            post_nonce = _nonce_diff(pre_info, post_info)
+            if post_nonce is not None:
+                _record_nonce_diff(nonce_map, address, tx_id, post_nonce)
 
-        for address_hex, pre_info in pre_state.items():
-            post_info = post_state.get(address_hex, {})
-            if not _should_record_nonce_diff(pre_info, post_info):
-                continue
-            post_nonce = _get_nonce(post_info, fallback=pre_info["nonce"])
-            _record_nonce_diff(nonce_map, address_hex, tx_index, post_nonce)
+    for address, slot, tx_id, post_val in pending_writes.changed_writes():
+        block_writes[address][slot].append((tx_id, post_val))
 
-    account_nonce_list = _build_account_nonce_diffs(nonce_map)
-    encoded_bytes = rlp.encode(account_nonce_list)
-    return encoded_bytes, account_nonce_list
+    if isinstance(additional_reads, Future):
+        additional_reads = additional_reads.result()
 
+    # Add additional reads from diff_mode=False if provided and not ignoring reads
+    if not ignore_reads and additional_reads is not None:
+        for address, read_slots in additional_reads.items():
+            if read_slots:
+                block_reads[address].update(read_slots)
 
-def sort_block_access_list_optimized(block_access_list: BlockAccessListRLP) -> BlockAccessListRLP:
-    def sort_account_writes(account_writes):
-        sorted_accounts = []
-        for account in sorted(account_writes, key=lambda a: bytes(a.address)):
-            sorted_slot_writes = []
-            for slot_write in account.slot_writes:
-                # Sort the per-tx writes by tx_index
-                writes_sorted = sorted(slot_write.writes, key=lambda x: x.tx_index)
-                slot_write_sorted = SlotWriteRLP(slot=slot_write.slot, writes=writes_sorted)
-                sorted_slot_writes.append(slot_write_sorted)
+    account_writes_list, account_reads_list = _build_storage_diffs(
+        block_writes, block_reads, ignore_reads
+    )
+    return (
+        account_writes_list,
+        account_reads_list,
+        _build_balance_diffs(balance_changes),
+        sorted(code_map.values(), key=lambda diff: diff.address),
+        _build_account_nonce_diffs(nonce_map),
+        (len(post_accounts), post_slot_count),
+    )
 
-            # Sort slots by slot key
-            sorted_slot_writes = sorted(sorted_slot_writes, key=lambda s: bytes(s.slot))
 
-            account_sorted = AccountWritesRLP(
-                address=account.address, slot_writes=sorted_slot_writes
-            )
-            sorted_accounts.append(account_sorted)
+def build_block_diffs(
+    trace_result: Iterable[dict],
+    additional_reads: Optional[Union[Dict[str, Set[str]], Future]] = None,
+    ignore_reads: bool = IGNORE_STORAGE_LOCATIONS,
+) -> Tuple[
+    Tuple[bytes, bytes, List[AccountWritesRLP], List[AccountReadsRLP]],
+    Tuple[bytes, List[AccountBalanceDiffRLP]],
+    Tuple[bytes, List[AccountCodeDiffRLP]],
+    Tuple[bytes, List[AccountNonceDiffRLP]],
+    Tuple[int, int],
+]:
+    """
+    Fused equivalent of `get_storage_diff_from_block_optimized`,
+    `get_balance_diff_from_block`, `get_code_diff_from_block` and
+    `build_contract_nonce_diffs_from_state`: one pass over trace_result,
+    returning each of their results plus the (accounts, slots) counts.
+    """
+    (
+        account_writes_list, account_reads_list, acc_bal_diffs, acc_code_diffs, account_nonce_list,
+        counts,
+    ) = build_all_diffs(trace_result, additional_reads, ignore_reads)
+    return (
+        (
+            rlp.encode(account_writes_list, sedes=AccountWritesListRLP),
+            rlp.encode(account_reads_list, sedes=AccountReadsListRLP),
+            account_writes_list,
+            account_reads_list,
+        ),
+        (rlp.encode(acc_bal_diffs, sedes=BalanceDiffsRLP), acc_bal_diffs),
+        (rlp.encode(acc_code_diffs, sedes=CodeDiffsRLP), acc_code_diffs),
+        (rlp.encode(account_nonce_list, sedes=NonceDiffsRLP), account_nonce_list),
+        counts,
+    )
 
-        return sorted_accounts
 
-    def sort_account_reads(account_reads):
-        sorted_accounts = []
-        for account in sorted(account_reads, key=lambda a: bytes(a.address)):
-            # Sort slots by slot key
-            sorted_slot_reads = sorted(account.slot_reads, key=lambda s: bytes(s.slot))
+def build_block(
+    block_number: int,
+    trace_result: Iterable[dict],
+    block_reads: Optional[Union[Dict[str, Set[str]], Future]],
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+    write_hex: bool = False,
+) -> Dict[str, Any]:
+    """Build, encode and persist the BAL of one fetched block; returns its stats entry."""
+    print(f"Processing block {block_number}...")
+
+    # Get diffs using optimized format, in one pass over the trace
+    (
+        (writes_encoded, reads_encoded, _, _),
+        (balance_diff, _),
+        (code_diff, _),
+        (nonce_diff, _),
+        (accs, slots),
+    ) = build_block_diffs(trace_result, block_reads, ignore_reads)
+
+    # The diff lists are already in BAL order, and a BlockAccessListRLP is
+    # just the list of its five components: reuse their encodings instead
+    # of serializing every account a second time
+    block_al = encode_rlp_list([writes_encoded, reads_encoded, balance_diff, code_diff, nonce_diff])
+
+    # Create filename indicating optimized version and with/without reads and RLP encoding
+    filename = f"{block_number}_block_access_list_rlp_optimized_{reads_suffix}"
+    filepath = os.path.join(bal_raw_dir, filename)
+
+    if write_hex:
+        with open(filepath + ".txt", "w") as f:
+            f.write(block_al.hex())
+    else:
+        write_zstd(filepath + ".rlp.zst", block_al)
 
-            account_sorted = AccountReadsRLP(
-                address=account.address, slot_reads=sorted_slot_reads
-            )
-            sorted_accounts.append(account_sorted)
+    # Get sizes (in KiB)
+    writes_size = get_compressed_size(writes_encoded)
+    reads_size = get_compressed_size(reads_encoded) if not ignore_reads else 0
+    balance_size = get_compressed_size(balance_diff)
+    code_size = get_compressed_size(code_diff)
+    nonce_size = get_compressed_size(nonce_diff)
 
-        return sorted_accounts
+    total_size = writes_size + reads_size + balance_size + code_size + nonce_size
 
-    def sort_diffs(diffs, container_cls):
-        sorted_accounts = []
-        for account in sorted(diffs, key=lambda d: bytes(d.address)):
-            changes_sorted = sorted(account.changes, key=lambda x: x.tx_index)
+    return {
+        "block_number": block_number,
+        "sizes": {
+            "storage_writes_kb": writes_size,
+            "storage_reads_kb": reads_size,
+            "balance_diffs_kb": balance_size,
+            "nonce_diffs_kb": nonce_size,
+            "code_diffs_kb": code_size,
+            "total_kb": total_size,
+        },
+        "counts": {
+            "accounts": accs,
+            "slots": slots,
+        },
+    }
 
-            account_sorted = container_cls(
-                address=account.address, changes=changes_sorted
-            )
-            sorted_accounts.append(account_sorted)
 
-        return sorted_accounts
+def process_block(
+    block_number: int,
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+    write_hex: bool = False,
+) -> Dict[str, Any]:
+    """Fetch, build, encode and persist the BAL of one block; returns its stats entry."""
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        # Fetch reads separately only if not ignoring storage locations, in
+        # the background while the diff trace is streamed and processed
+        block_reads = None
+        if not ignore_reads:
+            print(f"  Fetching reads for block {block_number}...")
+            block_reads = prefetcher.submit(extract_reads_from_block, block_number, RPC_URL)
 
-    def sort_code_diffs(diffs):
-        sorted_accounts = []
-        for account in sorted(diffs, key=lambda d: bytes(d.address)):
-            account_sorted = AccountCodeDiffRLP(
-                address=account.address, change=account.change
-            )
-            sorted_accounts.append(account_sorted)
+        return build_block(
+            block_number, stream_block_trace(block_number, RPC_URL), block_reads,
+            ignore_reads, bal_raw_dir, reads_suffix, write_hex,
+        )
 
-        return sorted_accounts
 
-    return BlockAccessListRLP(
-        storage_writes=sort_account_writes(block_access_list.storage_writes),
-        storage_reads=sort_account_reads(block_access_list.storage_reads),
-        balance_diffs=sort_diffs(block_access_list.balance_diffs, AccountBalanceDiffRLP),
-        code_diffs=sort_code_diffs(block_access_list.code_diffs),
-        nonce_diffs=sort_diffs(block_access_list.nonce_diffs, AccountNonceDiffRLP),
-    )
+def process_block_batch(
+    block_numbers: List[int],
+    ignore_reads: bool,
+    bal_raw_dir: str,
+    reads_suffix: str,
+    write_hex: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Like `process_block` for several blocks, fetching their traces with one
+    JSON-RPC batch request per trace mode instead of one request per block.
+    """
+    print(f"Fetching blocks {block_numbers[0]}..{block_numbers[-1]}...")
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        prestate_traces = None
+        if not ignore_reads:
+            prestate_traces = prefetcher.submit(
+                fetch_block_traces_batch, block_numbers, RPC_URL, diff_mode=False
+            )
+        traces = fetch_block_traces_batch(block_numbers, RPC_URL)
+        if prestate_traces is not None:
+            prestate_traces = prestate_traces.result()
+
+    entries = []
+    for i, block_number in enumerate(block_numbers):
+        # Drop each trace once built, so the batch is freed block by block
+        trace_result, traces[i] = traces[i], None
+        block_reads = None
+        if prestate_traces is not None:
+            block_reads = extract_reads_from_trace(prestate_traces[i])
+            prestate_traces[i] = None
+        entries.append(build_block(
+            block_number, trace_result, block_reads, ignore_reads, bal_raw_dir, reads_suffix, write_hex
+        ))
+    return entries
 
 
 def main():
@@ -481,7 +638,15 @@ def main():
     parser = argparse.ArgumentParser(description='Build optimized Block Access Lists (BALs) from Ethereum blocks using RLP encoding')
     parser.add_argument('--no-reads', action='store_true', 
                         help='Ignore storage read locations (only include writes)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for building BALs (default: one per CPU core)')
+    parser.add_argument('--batch-size', type=int, default=5,
+                        help=f'Blocks per JSON-RPC batch request, at most {MAX_RPC_BATCH_SIZE} (default: 5)')
+    parser.add_argument('--hex', action='store_true',
+                        help='Write each BAL as hex text (.txt) instead of zstd-compressed RLP (.rlp.zst)')
     args = parser.parse_args()
+    if not 1 <= args.batch_size <= MAX_RPC_BATCH_SIZE:
+        parser.error(f"--batch-size must be between 1 and {MAX_RPC_BATCH_SIZE}")
     
     # Set IGNORE_STORAGE_LOCATIONS based on command line flag
     IGNORE_STORAGE_LOCATIONS = args.no_reads
@@ -494,92 +659,40 @@ def main():
     # random_blocks = random.sample(range(22616032 - 7200 * 30, 22616032 + 1), 1000)
     random_blocks = range(22616032 - 7200 * 30, 22616032 + 1, 216)
 
-    for block_number in random_blocks:
-        print(f"Processing block {block_number}...")
-        trace_result = fetch_block_trace(block_number, RPC_URL)
-        
-        # Fetch reads separately only if not ignoring storage locations
-        block_reads = None
-        if not IGNORE_STORAGE_LOCATIONS:
-            print(f"  Fetching reads for block {block_number}...")
-            block_reads = extract_reads_from_block(block_number, RPC_URL)
-
-        # Get diffs using optimized format
-        writes_encoded, reads_encoded, account_writes_list, account_reads_list = get_storage_diff_from_block_optimized(
-            trace_result, block_reads, IGNORE_STORAGE_LOCATIONS
-        )
-        balance_diff, acc_bal_diffs = get_balance_diff_from_block(trace_result)
-        code_diff, acc_code_diffs = get_code_diff_from_block(trace_result)
-        nonce_diff, account_nonce_list = build_contract_nonce_diffs_from_state(
-            trace_result
-        )
-
-        block_obj = BlockAccessListRLP(
-            storage_writes=account_writes_list,
-            storage_reads=account_reads_list,
-            balance_diffs=acc_bal_diffs,
-            code_diffs=acc_code_diffs,
-            nonce_diffs=account_nonce_list,
-        )
-
-        block_obj_sorted = sort_block_access_list_optimized(block_obj)
-
-        block_al = rlp.encode(block_obj_sorted)
-
-        # Create bal_raw directory in main project directory if it doesn't exist
-        bal_raw_dir = os.path.join(project_root, "bal_raw")
-        os.makedirs(bal_raw_dir, exist_ok=True)
-        
-        # Create filename indicating optimized version and with/without reads and RLP encoding
-        reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-        filename = f"{block_number}_block_access_list_rlp_optimized_{reads_suffix}.txt"
-        filepath = os.path.join(bal_raw_dir, filename)
-        
-        with open(filepath, "w") as f:
-            f.write(block_al.hex())
-
-        # Get sizes (in KiB)
-        writes_size = get_compressed_size(writes_encoded)
-        reads_size = get_compressed_size(reads_encoded) if not IGNORE_STORAGE_LOCATIONS else 0
-        balance_size = get_compressed_size(balance_diff)
-        code_size = get_compressed_size(code_diff)
-        nonce_size = get_compressed_size(nonce_diff)
-
-        total_size = writes_size + reads_size + balance_size + code_size + nonce_size
-
-        # Count affected accounts and slots
-        accs, slots = count_accounts_and_slots(trace_result)
-
-        # Store stats
-        data.append(
-            {
-                "block_number": block_number,
-                "sizes": {
-                    "storage_writes_kb": writes_size,
-                    "storage_reads_kb": reads_size,
-                    "balance_diffs_kb": balance_size,
-                    "nonce_diffs_kb": nonce_size,
-                    "code_diffs_kb": code_size,
-                    "total_kb": total_size,
-                },
-                "counts": {
-                    "accounts": accs,
-                    "slots": slots,
-                },
-            }
-        )
-
-        # Totals for averages
-        totals["writes"].append(writes_size)
-        totals["reads"].append(reads_size)
-        totals["balance"].append(balance_size)
-        totals["code"].append(code_size)
-        totals["nonce"].append(nonce_size)
-        block_totals.append(total_size)
-
-    # Save JSON to file
+    # Create bal_raw directory in main project directory if it doesn't exist
+    bal_raw_dir = os.path.join(project_root, "bal_raw")
+    os.makedirs(bal_raw_dir, exist_ok=True)
     reads_suffix = "without_reads" if IGNORE_STORAGE_LOCATIONS else "with_reads"
-    json_filename = f"bal_analysis_rlp_optimized_{reads_suffix}.json"
+
+    # Blocks are independent: fetch them in JSON-RPC batches and build the
+    # batches in parallel worker processes; map() still yields the stats in
+    # block order
+    batch_worker = partial(
+        process_block_batch,
+        ignore_reads=IGNORE_STORAGE_LOCATIONS,
+        bal_raw_dir=bal_raw_dir,
+        reads_suffix=reads_suffix,
+        write_hex=args.hex,
+    )
+    batches = [
+        list(random_blocks[i:i + args.batch_size])
+        for i in range(0, len(random_blocks), args.batch_size)
+    ]
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as executor:
+        for entry in chain.from_iterable(executor.map(batch_worker, batches)):
+            data.append(entry)
+
+            # Totals for averages
+            sizes = entry["sizes"]
+            totals["writes"].append(sizes["storage_writes_kb"])
+            totals["reads"].append(sizes["storage_reads_kb"])
+            totals["balance"].append(sizes["balance_diffs_kb"])
+            totals["code"].append(sizes["code_diffs_kb"])
+            totals["nonce"].append(sizes["nonce_diffs_kb"])
+            block_totals.append(sizes["total_kb"])
+
+    # Save JSON next to the raw BALs so runs don't leave it in the working directory
+    json_filename = os.path.join(bal_raw_dir, f"bal_analysis_rlp_optimized_{reads_suffix}.json")
     with open(json_filename, "w") as f:
         json.dump(data, f, indent=2)
 
@@ -594,4 +707,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -44,6 +44,10 @@ def main():
         ("test_data_structure_integrity.py", "Data Structure Integrity"),
         ("test_builder_functionality.py", "Builder Functionality"), 
         ("test_ssz_encoding.py", "SSZ Encoding/Decoding"),
+        ("test_component_sizes.py", "Component Sizes"),
+        ("test_rlp_encoding.py", "RLP Encoding"),
+        ("test_bal_to_json.py", "BAL to JSON"),
+        ("test_slot_mapping.py", "Slot Mapping"),
         ("test_real_world_integration.py", "Real-World Integration"),
     ]
     
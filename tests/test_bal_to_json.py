@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the JSON export of BALs in bal_to_json.
+Checks that the streamed write_bal_json output matches json.dump exactly.
+"""
+
+import io
+import os
+import sys
+import json
+from pathlib import Path
+from typing import Dict
+
+# Add src directory to path
+project_root = str(Path(__file__).parent.parent)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from BALs import BALBuilder, BlockAccessList
+from bal_to_json import bal_to_dict, write_bal_json
+
+
+def build_bal(num_accounts: int) -> BlockAccessList:
+    """A BAL with num_accounts accounts, each with a different mix of components."""
+    builder = BALBuilder()
+    for i in range(num_accounts):
+        addr = (i + 1).to_bytes(20, 'big')
+        kind = i % 4
+        if kind == 0:
+            builder.add_storage_write(addr, (1).to_bytes(32, 'big'), 0, (5).to_bytes(32, 'big'))
+            builder.add_storage_write(addr, (1).to_bytes(32, 'big'), 3, (6).to_bytes(32, 'big'))
+            builder.add_storage_read(addr, (2).to_bytes(32, 'big'))
+            builder.add_balance_change(addr, 1, (10**18).to_bytes(16, 'big'))
+            builder.add_nonce_change(addr, 1, 7)
+            builder.add_code_change(addr, 1, b"\x60\x80\x60\x40\x52")
+        elif kind == 1:
+            builder.add_balance_change(addr, 0, (0).to_bytes(16, 'big'))
+        elif kind == 2:
+            builder.add_storage_read(addr, (3).to_bytes(32, 'big'))
+            builder.add_storage_read(addr, (4).to_bytes(32, 'big'))
+        else:
+            # Touched only, so every list is empty
+            builder.add_touched_account(addr)
+    return builder.build()
+
+
+class TestBalToJson:
+    """Test suite for write_bal_json."""
+
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.total = 0
+
+    def assert_test(self, condition: bool, test_name: str, error_msg: str = ""):
+        """Assert a test condition and track results."""
+        self.total += 1
+        if condition:
+            self.passed += 1
+            print(f"  ✅ {test_name}")
+        else:
+            self.failed += 1
+            print(f"  ❌ {test_name}: {error_msg}")
+
+    def check_matches_json_dump(self, num_accounts: int) -> bool:
+        """Compare write_bal_json with json.dump(indent=2) for a BAL of num_accounts accounts."""
+        test_name = f"write_bal_json matches json.dump for {num_accounts} account(s)"
+        try:
+            bal = build_bal(num_accounts)
+
+            expected = io.StringIO()
+            json.dump(bal_to_dict(bal), expected, indent=2)
+            actual = io.StringIO()
+            write_bal_json(bal, actual)
+
+            self.assert_test(
+                actual.getvalue() == expected.getvalue(),
+                test_name,
+                f"{actual.getvalue()[:80]!r} != {expected.getvalue()[:80]!r}"
+            )
+            self.assert_test(
+                json.loads(actual.getvalue()) == bal_to_dict(bal),
+                f"Output for {num_accounts} account(s) parses back to bal_to_dict"
+            )
+
+        except Exception as e:
+            self.assert_test(False, test_name, str(e))
+            return False
+
+        return actual.getvalue() == expected.getvalue()
+
+    def test_no_accounts(self) -> bool:
+        """Test an empty BAL."""
+        return self.check_matches_json_dump(0)
+
+    def test_single_account(self) -> bool:
+        """Test a BAL with one fully populated account."""
+        return self.check_matches_json_dump(1)
+
+    def test_several_accounts(self) -> bool:
+        """Test a BAL mixing populated and empty accounts."""
+        return self.check_matches_json_dump(9)
+
+    def run_all_tests(self) -> Dict[str, bool]:
+        """Run all JSON export tests."""
+        print("📝 Running BAL to JSON Tests...")
+        print("-" * 50)
+
+        results = {}
+        results['no_accounts'] = self.test_no_accounts()
+        results['single_account'] = self.test_single_account()
+        results['several_accounts'] = self.test_several_accounts()
+
+        print(f"\nTest Results: {self.passed}/{self.total} passed, {self.failed}/{self.total} failed")
+
+        return results
+
+def main():
+    """Main test function."""
+    print("🧪 BAL to JSON Test Suite")
+    print("=" * 60)
+
+    # Run tests
+    tester = TestBalToJson()
+    results = tester.run_all_tests()
+
+    # Summary
+    all_passed = all(results.values())
+    status = "✅ ALL TESTS PASSED" if all_passed else "❌ SOME TESTS FAILED"
+    print(f"\n{status}")
+
+    if not all_passed:
+        print("\nFailed tests:")
+        for test_name, passed in results.items():
+            if not passed:
+                print(f"  - {test_name}")
+
+    return all_passed
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-component SSZ sizes in bal_builder.
+Checks that slicing the _BlockComponents container matches encoding each list on its own.
+"""
+
+import os
+import sys
+import ssz
+from pathlib import Path
+from typing import Dict, List
+
+# Add src directory to path
+project_root = str(Path(__file__).parent.parent)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from BALs import (
+    BlockAccessList, StorageAccess, BalanceChange, NonceChange, CodeChange,
+    BALBuilder, StorageKey, SSZList, MAX_SLOTS, MAX_TXS
+)
+from bal_builder import (
+    _BlockComponents,
+    _encode_component_chunks,
+    get_component_sizes,
+)
+from helpers import get_compressed_size
+
+COMPONENT_SEDES = [
+    ('storage_writes', SSZList(StorageAccess, MAX_SLOTS)),
+    ('storage_reads', SSZList(StorageKey, MAX_SLOTS)),
+    ('balance_changes', SSZList(BalanceChange, MAX_TXS)),
+    ('nonce_changes', SSZList(NonceChange, MAX_TXS)),
+    ('code_changes', SSZList(CodeChange, MAX_TXS)),
+]
+
+SIZE_KEYS = ['storage_writes_kb', 'storage_reads_kb', 'balance_diffs_kb', 'nonce_diffs_kb', 'code_diffs_kb']
+
+
+def standalone_encodings(bal: BlockAccessList) -> List[bytes]:
+    """Encode each component list separately, as get_component_sizes originally did."""
+    encodings = []
+    for name, sedes in COMPONENT_SEDES:
+        items = [item for account in bal.account_changes for item in getattr(account, name)]
+        encodings.append(ssz.encode(items, sedes=sedes))
+    return encodings
+
+
+def build_full_bal() -> BlockAccessList:
+    """A BAL with every component populated across several accounts."""
+    builder = BALBuilder()
+    for i in range(1, 6):
+        addr = i.to_bytes(20, 'big')
+        builder.add_storage_write(addr, i.to_bytes(32, 'big'), 0, (i * 7).to_bytes(32, 'big'))
+        builder.add_storage_write(addr, i.to_bytes(32, 'big'), 2, (i * 9).to_bytes(32, 'big'))
+        builder.add_storage_read(addr, (100 + i).to_bytes(32, 'big'))
+        builder.add_balance_change(addr, i, (i * 10**18).to_bytes(16, 'big'))
+        builder.add_nonce_change(addr, i, i + 1)
+        builder.add_code_change(addr, i, bytes([0x60, i]) * (i * 10))
+    return builder.build()
+
+
+class TestComponentSizes:
+    """Test suite for get_component_sizes and its SSZ slicing."""
+
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.total = 0
+
+    def assert_test(self, condition: bool, test_name: str, error_msg: str = ""):
+        """Assert a test condition and track results."""
+        self.total += 1
+        if condition:
+            self.passed += 1
+            print(f"  ✅ {test_name}")
+        else:
+            self.failed += 1
+            print(f"  ❌ {test_name}: {error_msg}")
+
+    def check_chunks(self, bal: BlockAccessList, label: str) -> bool:
+        """Compare every sliced chunk with the standalone list encoding."""
+        failed_before = self.failed
+        chunks = _encode_component_chunks(bal)
+        expected = standalone_encodings(bal)
+
+        self.assert_test(
+            len(chunks) == len(COMPONENT_SEDES),
+            f"{label}: one chunk per component",
+            f"Got {len(chunks)} chunks"
+        )
+        for (name, _), chunk, standalone in zip(COMPONENT_SEDES, chunks, expected):
+            self.assert_test(
+                chunk == standalone,
+                f"{label}: {name} slice matches ssz.encode of the list",
+                f"{len(chunk)} bytes != {len(standalone)} bytes"
+            )
+
+        sizes = get_component_sizes(bal)
+        for key, standalone in zip(SIZE_KEYS, expected):
+            expected_size = get_compressed_size(standalone) if standalone else 0
+            self.assert_test(
+                sizes[key] == expected_size,
+                f"{label}: {key} matches compressed standalone encoding",
+                f"{sizes[key]} != {expected_size}"
+            )
+
+        return self.failed == failed_before
+
+    def test_offset_table_size(self) -> bool:
+        """The container starts with one 4-byte offset per field."""
+        try:
+            fields = _BlockComponents._meta.fields
+            self.assert_test(
+                [name for name, _ in fields] == [name for name, _ in COMPONENT_SEDES],
+                "_BlockComponents fields are the five components in order"
+            )
+
+            encoded = ssz.encode(_BlockComponents(
+                storage_writes=[], storage_reads=[], balance_changes=[],
+                nonce_changes=[], code_changes=[],
+            ))
+            table_size = int.from_bytes(encoded[:4], "little")
+            self.assert_test(
+                table_size == 4 * len(fields),
+                f"Offset table size is 4 * {len(fields)}",
+                f"Got {table_size}"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "Offset table size", str(e))
+            return False
+
+        return True
+
+    def test_all_components(self) -> bool:
+        """Every component populated."""
+        try:
+            return self.check_chunks(build_full_bal(), "Full BAL")
+        except Exception as e:
+            self.assert_test(False, "All components", str(e))
+            return False
+
+    def test_some_empty_components(self) -> bool:
+        """Empty components in between populated ones slice to nothing."""
+        failed_before = self.failed
+        try:
+            builder = BALBuilder()
+            addr = (1).to_bytes(20, 'big')
+            builder.add_storage_read(addr, (1).to_bytes(32, 'big'))
+            builder.add_nonce_change(addr, 0, 1)
+            self.check_chunks(builder.build(), "Reads and nonces only")
+
+            chunks = _encode_component_chunks(builder.build())
+            self.assert_test(
+                chunks[0] == b"" and chunks[2] == b"" and chunks[4] == b"",
+                "Empty components encode to empty slices"
+            )
+
+            self.check_chunks(BALBuilder().build(), "Empty BAL")
+            self.assert_test(
+                get_component_sizes(BALBuilder().build())['total_kb'] == 0,
+                "Empty BAL has zero total size"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "Some empty components", str(e))
+            return False
+
+        return self.failed == failed_before
+
+    def run_all_tests(self) -> Dict[str, bool]:
+        """Run all component size tests."""
+        print("📏 Running Component Size Tests...")
+        print("-" * 50)
+
+        results = {}
+        results['offset_table_size'] = self.test_offset_table_size()
+        results['all_components'] = self.test_all_components()
+        results['some_empty_components'] = self.test_some_empty_components()
+
+        print(f"\nTest Results: {self.passed}/{self.total} passed, {self.failed}/{self.total} failed")
+
+        return results
+
+def main():
+    """Main test function."""
+    print("🧪 BAL Component Size Test Suite")
+    print("=" * 60)
+
+    # Run tests
+    tester = TestComponentSizes()
+    results = tester.run_all_tests()
+
+    # Summary
+    all_passed = all(results.values())
+    status = "✅ ALL TESTS PASSED" if all_passed else "❌ SOME TESTS FAILED"
+    print(f"\n{status}")
+
+    if not all_passed:
+        print("\nFailed tests:")
+        for test_name, passed in results.items():
+            if not passed:
+                print(f"  - {test_name}")
+
+    return all_passed
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
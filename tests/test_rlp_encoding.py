@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Tests for the RLP encoding of BALs in bal_builder_rlp.
+Checks the hand-written encoder byte-for-byte against pyrlp's rlp.encode.
+"""
+
+import os
+import sys
+import rlp
+from pathlib import Path
+from typing import Dict
+
+# Add src directory to path
+project_root = str(Path(__file__).parent.parent)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from BALs import BALBuilder, BlockAccessList
+from bal_builder_rlp import (
+    RLP_COMPONENTS,
+    encode_bal_components,
+    encode_bal_to_rlp,
+    get_rlp_component_sizes,
+)
+from helpers import get_compressed_size
+
+
+def reference_component_data(account) -> Dict[str, list]:
+    """The per-component lists that rlp.encode was originally called on."""
+    return {
+        'storage_writes': [
+            [bytes(access.slot), [[change.tx_index, bytes(change.new_value)] for change in access.changes]]
+            for access in account.storage_writes
+        ],
+        'storage_reads': [bytes(slot) for slot in account.storage_reads],
+        'balance_changes': [
+            [change.tx_index, int.from_bytes(bytes(change.post_balance), 'big')]
+            for change in account.balance_changes
+        ],
+        'nonce_changes': [[change.tx_index, change.new_nonce] for change in account.nonce_changes],
+        'code_changes': [[change.tx_index, bytes(change.new_code)] for change in account.code_changes],
+    }
+
+
+def reference_rlp(bal: BlockAccessList) -> bytes:
+    """RLP-encode a BAL with rlp.encode, as bal_builder_rlp did before its own encoder."""
+    accounts_data = []
+    for account in bal.account_changes:
+        data = reference_component_data(account)
+        accounts_data.append([bytes(account.address)] + [data[name] for name in RLP_COMPONENTS])
+    return rlp.encode(accounts_data)
+
+
+def build_edge_case_bal() -> BlockAccessList:
+    """A BAL whose values sit on every RLP length boundary."""
+    builder = BALBuilder()
+
+    def addr(i: int) -> bytes:
+        return i.to_bytes(20, 'big')
+
+    # Zero ints (tx_index 0, nonce 0, balance 0) and single bytes below/at 0x80
+    builder.add_balance_change(addr(1), 0, (0).to_bytes(16, 'big'))
+    builder.add_balance_change(addr(1), 1, (0x7f).to_bytes(16, 'big'))
+    builder.add_balance_change(addr(1), 2, (0x80).to_bytes(16, 'big'))
+    builder.add_balance_change(addr(1), 3, (2**128 - 1).to_bytes(16, 'big'))
+    builder.add_nonce_change(addr(1), 0, 0)
+    builder.add_nonce_change(addr(1), 1, 0x7f)
+    builder.add_nonce_change(addr(1), 2, 0x80)
+    builder.add_nonce_change(addr(1), 3, 2**64 - 1)
+    builder.add_code_change(addr(2), 0, b"")
+    builder.add_code_change(addr(2), 1, b"\x00")
+    builder.add_code_change(addr(2), 2, b"\x7f")
+    builder.add_code_change(addr(2), 3, b"\x80")
+
+    # [tx_index, code] payloads of exactly 55 and 56 bytes, and codes of 55 and 56+ bytes
+    for i, code_length in enumerate((53, 54, 55, 56, 300, 24_576)):
+        builder.add_code_change(addr(10 + i), 1, bytes([0x60]) * code_length)
+
+    # Storage: a lone write, many writes to one slot (long list) and reads
+    builder.add_storage_write(addr(3), (0).to_bytes(32, 'big'), 0, (0).to_bytes(32, 'big'))
+    for tx_index in range(5):
+        builder.add_storage_write(addr(4), (1).to_bytes(32, 'big'), tx_index, bytes([tx_index]) * 32)
+    builder.add_storage_read(addr(4), (2).to_bytes(32, 'big'))
+    builder.add_storage_read(addr(5), (3).to_bytes(32, 'big'))
+    for i in range(3):
+        builder.add_storage_read(addr(6), (100 + i).to_bytes(32, 'big'))
+
+    # An account that is only touched has all components empty
+    builder.add_touched_account(addr(7))
+    return builder.build()
+
+
+class TestRLPEncoding:
+    """Test suite for the RLP encoder in bal_builder_rlp."""
+
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.total = 0
+
+    def assert_test(self, condition: bool, test_name: str, error_msg: str = ""):
+        """Assert a test condition and track results."""
+        self.total += 1
+        if condition:
+            self.passed += 1
+            print(f"  ✅ {test_name}")
+        else:
+            self.failed += 1
+            print(f"  ❌ {test_name}: {error_msg}")
+
+    def check_bal(self, bal: BlockAccessList, label: str) -> bool:
+        """Compare the full encoding and every account component with rlp.encode."""
+        failed_before = self.failed
+
+        expected = reference_rlp(bal)
+        actual = encode_bal_to_rlp(bal)
+        self.assert_test(
+            actual == expected,
+            f"{label}: encode_bal_to_rlp matches rlp.encode",
+            f"{actual.hex()[:80]} != {expected.hex()[:80]}"
+        )
+
+        components = encode_bal_components(bal)
+        self.assert_test(
+            encode_bal_to_rlp(bal, components) == expected,
+            f"{label}: encode_bal_to_rlp with precomputed components matches rlp.encode"
+        )
+
+        mismatches = []
+        for account, (address, encoded) in zip(bal.account_changes, components):
+            if address != bytes(account.address):
+                mismatches.append(f"address {bytes(account.address).hex()}")
+            data = reference_component_data(account)
+            for name in RLP_COMPONENTS:
+                if encoded[name] != rlp.encode(data[name]):
+                    mismatches.append(f"{bytes(account.address).hex()} {name}")
+        self.assert_test(
+            len(components) == len(bal.account_changes) and not mismatches,
+            f"{label}: encode_bal_components matches rlp.encode per component",
+            f"Mismatched components: {mismatches}"
+        )
+
+        return self.failed == failed_before
+
+    def test_empty_bal(self) -> bool:
+        """An empty BAL encodes to the empty list."""
+        failed_before = self.failed
+        bal = BALBuilder().build()
+        self.check_bal(bal, "Empty BAL")
+        self.assert_test(encode_bal_to_rlp(bal) == b"\xc0", "Empty BAL encodes to 0xc0")
+        return self.failed == failed_before
+
+    def test_edge_case_values(self) -> bool:
+        """Zero ints, single bytes and 55/56-byte boundaries."""
+        return self.check_bal(build_edge_case_bal(), "Edge case BAL")
+
+    def test_long_account_list(self) -> bool:
+        """Enough accounts that the outer list needs a multi-byte length."""
+        builder = BALBuilder()
+        for i in range(300):
+            address = i.to_bytes(20, 'big')
+            builder.add_storage_write(address, i.to_bytes(32, 'big'), i % 7, (i * 3).to_bytes(32, 'big'))
+            builder.add_balance_change(address, i % 5, (i * 10**18).to_bytes(16, 'big'))
+            builder.add_nonce_change(address, i % 5, i)
+        return self.check_bal(builder.build(), "300-account BAL")
+
+    def test_component_sizes(self) -> bool:
+        """Each component size is the compressed size of its joined per-account encodings."""
+        failed_before = self.failed
+        bal = build_edge_case_bal()
+
+        parts = {name: [] for name in RLP_COMPONENTS}
+        for account in bal.account_changes:
+            data = reference_component_data(account)
+            for name in RLP_COMPONENTS:
+                if data[name]:
+                    parts[name].append(rlp.encode(data[name]))
+        expected = {
+            name: get_compressed_size(b"".join(encodings)) if encodings else 0
+            for name, encodings in parts.items()
+        }
+
+        sizes = get_rlp_component_sizes(bal)
+        size_keys = {
+            'storage_writes': 'storage_writes_kb',
+            'storage_reads': 'storage_reads_kb',
+            'balance_changes': 'balance_diffs_kb',
+            'nonce_changes': 'nonce_diffs_kb',
+            'code_changes': 'code_diffs_kb',
+        }
+        for name, key in size_keys.items():
+            self.assert_test(
+                sizes[key] == expected[name],
+                f"{key} matches compressed per-account encodings",
+                f"{sizes[key]} != {expected[name]}"
+            )
+
+        self.assert_test(
+            sizes['storage_total_kb'] == sizes['storage_writes_kb'] + sizes['storage_reads_kb'],
+            "storage_total_kb is writes + reads"
+        )
+        self.assert_test(
+            sizes['total_kb'] == sum(sizes[key] for key in size_keys.values()),
+            "total_kb is the sum of all components"
+        )
+
+        empty_sizes = get_rlp_component_sizes(BALBuilder().build())
+        self.assert_test(
+            all(value == 0 for value in empty_sizes.values()),
+            "Empty BAL has zero component sizes",
+            f"Got {empty_sizes}"
+        )
+
+        return self.failed == failed_before
+
+    def run_all_tests(self) -> Dict[str, bool]:
+        """Run all RLP encoding tests."""
+        print("📦 Running RLP Encoding Tests...")
+        print("-" * 50)
+
+        results = {}
+        results['empty_bal'] = self.test_empty_bal()
+        results['edge_case_values'] = self.test_edge_case_values()
+        results['long_account_list'] = self.test_long_account_list()
+        results['component_sizes'] = self.test_component_sizes()
+
+        print(f"\nTest Results: {self.passed}/{self.total} passed, {self.failed}/{self.total} failed")
+
+        return results
+
+def main():
+    """Main test function."""
+    print("🧪 BAL RLP Encoding Test Suite")
+    print("=" * 60)
+
+    # Run tests
+    tester = TestRLPEncoding()
+    results = tester.run_all_tests()
+
+    # Summary
+    all_passed = all(results.values())
+    status = "✅ ALL TESTS PASSED" if all_passed else "❌ SOME TESTS FAILED"
+    print(f"\n{status}")
+
+    if not all_passed:
+        print("\nFailed tests:")
+        for test_name, passed in results.items():
+            if not passed:
+                print(f"  - {test_name}")
+
+    return all_passed
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Tests for the address/slot/value mapped BAL format in test_optimizations.
+Tests index assignment, deduplication, the unique-key limits, write sorting
+and SSZ round-trips.
+"""
+
+import os
+import sys
+import ssz
+from pathlib import Path
+from typing import Dict
+
+# Add src and test_optimizations directories to path
+project_root = str(Path(__file__).parent.parent)
+src_dir = os.path.join(project_root, "src")
+optimizations_dir = os.path.join(project_root, "test_optimizations")
+sys.path.insert(0, src_dir)
+sys.path.insert(0, optimizations_dir)
+
+from BALs_ssz_optimized_slot_mapping import (
+    AddressIndexManager, SlotIndexManager, ValueIndexManager,
+    MAX_UNIQUE_ADDRESSES, MAX_UNIQUE_SLOTS, MAX_UNIQUE_VALUES,
+    BlockAccessListOptimizedMappings, AccountWritesIndexed, AccountReadsIndexed,
+    SlotReadIndexed, AccountBalanceDiff, BalanceChange, AccountCodeDiff, CodeChange,
+    AccountNonceDiff, TxNonceDiff,
+)
+from bal_builder_optimized_address_slot_mapping import (
+    _build_slot_writes_indexed,
+    sort_block_access_list_optimized_both_indexed,
+)
+
+ADDRESS_A = "0x" + "aa" * 20
+ADDRESS_B = "0x" + "0b" * 20
+SLOT_X = "0x" + "00" * 31 + "07"
+SLOT_Y = "0x" + "00" * 31 + "03"
+VALUE_P = "0x" + "11" * 32
+VALUE_Q = "0x" + "22" * 32
+VALUE_R = "0x" + "00" * 32
+
+# Per-tx writes in the order a trace may report them, not sorted by tx_index
+OUT_OF_ORDER_WRITES = {
+    ADDRESS_A: {
+        SLOT_X: [(5, VALUE_P), (1, VALUE_Q), (3, VALUE_P), (2, VALUE_R)],
+        SLOT_Y: [(4, VALUE_R), (0, VALUE_Q)],
+    },
+    ADDRESS_B: {
+        SLOT_Y: [(9, VALUE_Q), (6, VALUE_P), (7, VALUE_Q)],
+    },
+}
+
+
+def build_mapped_block() -> tuple:
+    """Build a sorted BlockAccessListOptimizedMappings from OUT_OF_ORDER_WRITES plus one of every diff."""
+    address_manager = AddressIndexManager()
+    slot_manager = SlotIndexManager()
+    value_manager = ValueIndexManager()
+
+    # Index B first so that sorting by address index also reorders accounts
+    account_writes = []
+    for address in (ADDRESS_B, ADDRESS_A):
+        address_index = address_manager.get_or_create_index(address)
+        slot_writes = _build_slot_writes_indexed(
+            OUT_OF_ORDER_WRITES, address, slot_manager, address_manager, value_manager
+        )
+        account_writes.append(AccountWritesIndexed(address_index=address_index, slot_writes=slot_writes))
+
+    index_a = address_manager.get_index(ADDRESS_A)
+    read_slot_index = slot_manager.get_or_create_index("0x09")
+    block = BlockAccessListOptimizedMappings(
+        address_mapping=address_manager.get_address_mapping(),
+        slot_mapping=slot_manager.get_slot_mapping(),
+        value_mapping=value_manager.get_value_mapping(),
+        storage_writes=account_writes,
+        storage_reads=[AccountReadsIndexed(
+            address_index=index_a,
+            slot_reads=[SlotReadIndexed(slot_index=read_slot_index)],
+        )],
+        balance_diffs=[AccountBalanceDiff(
+            address_index=index_a,
+            changes=[BalanceChange(tx_index=1, delta=(-5).to_bytes(12, "big", signed=True))],
+        )],
+        code_diffs=[AccountCodeDiff(
+            address_index=index_a,
+            change=CodeChange(tx_index=2, new_code=b"\x60\x80\x60\x40"),
+        )],
+        nonce_diffs=[AccountNonceDiff(
+            address_index=index_a,
+            changes=[TxNonceDiff(tx_index=2, nonce_after=1)],
+        )],
+    )
+    return sort_block_access_list_optimized_both_indexed(block), address_manager, slot_manager, value_manager
+
+
+class TestSlotMapping:
+    """Test suite for the mapped BAL format."""
+
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+        self.total = 0
+
+    def assert_test(self, condition: bool, test_name: str, error_msg: str = ""):
+        """Assert a test condition and track results."""
+        self.total += 1
+        if condition:
+            self.passed += 1
+            print(f"  ✅ {test_name}")
+        else:
+            self.failed += 1
+            print(f"  ❌ {test_name}: {error_msg}")
+
+    def test_index_deduplication(self) -> bool:
+        """Repeated keys, as hex or bytes, resolve to their first index."""
+        failed_before = self.failed
+        try:
+            manager = ValueIndexManager()
+            zero = b"\x00" * 32
+            one = (1).to_bytes(32, 'big')
+
+            self.assert_test(manager.get_or_create_index(zero) == 0, "First value gets index 0")
+            self.assert_test(manager.get_or_create_index("0x01") == 1, "Short hex value is padded and gets index 1")
+            self.assert_test(manager.get_or_create_index(one) == 1, "Same value as bytes reuses index 1")
+            self.assert_test(manager.get_or_create_index("0x" + "00" * 32) == 0, "Same value as hex reuses index 0")
+
+            indices = manager.get_or_create_indices([one, "0x02", zero, "0x02", (2).to_bytes(32, 'big')])
+            self.assert_test(indices == [1, 2, 0, 2, 2], "Batch indexing deduplicates", f"Got {indices}")
+
+            self.assert_test(manager.next_index == 3, "Three unique values", f"Got {manager.next_index}")
+            values = manager.get_value_mapping().values
+            self.assert_test(
+                [bytes(v) for v in values] == [zero, one, (2).to_bytes(32, 'big')],
+                "Value mapping lists unique values in first-seen order"
+            )
+            self.assert_test(manager.get_value(1) == one, "get_value returns the stored value")
+            self.assert_test(manager.get_value(3) is None, "get_value is None past the last index")
+
+            addresses = AddressIndexManager()
+            address = bytes.fromhex("00000000219ab540356cbb839cbe05303d7705fa")
+            self.assert_test(
+                addresses.get_or_create_index(address) == addresses.get_or_create_index("0x" + address.hex()),
+                "Address as bytes and hex share an index"
+            )
+            self.assert_test(addresses.get_index(address) == 0, "get_index finds an existing address")
+            self.assert_test(addresses.get_index(b"\x01" * 20) is None, "get_index is None for an unknown address")
+
+            slots = SlotIndexManager()
+            slot_indices = slots.get_or_create_indices(["0x05", "0x06", "0x05"])
+            self.assert_test(slot_indices == [0, 1, 0], "Slot batch indexing deduplicates", f"Got {slot_indices}")
+            self.assert_test(
+                [bytes(s) for s in slots.get_slot_mapping().slots] == [(5).to_bytes(32, 'big'), (6).to_bytes(32, 'big')],
+                "Slot mapping lists unique slots in first-seen order"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "Index deduplication", str(e))
+            return False
+
+        return self.failed == failed_before
+
+    def test_index_limits(self) -> bool:
+        """Exceeding the unique-key limit raises and leaves the manager unchanged."""
+        failed_before = self.failed
+        try:
+            for manager, limit in (
+                (AddressIndexManager(), MAX_UNIQUE_ADDRESSES),
+                (SlotIndexManager(), MAX_UNIQUE_SLOTS),
+                (ValueIndexManager(), MAX_UNIQUE_VALUES),
+            ):
+                name = type(manager).__name__
+                self.assert_test(manager.limit == limit, f"{name} limit is {limit}")
+
+                # Shrink the limit so the test does not need 65k keys
+                manager.limit = 2
+                keys = [i.to_bytes(manager.width, 'big') for i in range(3)]
+                manager.get_or_create_indices(keys[:2])
+
+                try:
+                    manager.get_or_create_index(keys[2])
+                    raised = False
+                except ValueError:
+                    raised = True
+                self.assert_test(raised, f"{name} raises ValueError past the limit")
+                self.assert_test(
+                    manager.next_index == 2 and len(manager.key_to_index) == 2
+                    and len(manager.key_buf) == 2 * manager.width,
+                    f"{name} rolls back the rejected key"
+                )
+                self.assert_test(
+                    manager.get_or_create_index(keys[1]) == 1,
+                    f"{name} still resolves known keys at the limit"
+                )
+
+                try:
+                    manager.get_or_create_indices([keys[0], keys[2]])
+                    raised = False
+                except ValueError:
+                    raised = True
+                self.assert_test(raised, f"{name} batch indexing raises ValueError past the limit")
+
+            manager = SlotIndexManager()
+            try:
+                manager.get_or_create_index(b"\x01" * 31)
+                raised = False
+            except ValueError:
+                raised = True
+            self.assert_test(
+                raised and manager.next_index == 0 and not manager.key_to_index and not manager.key_buf,
+                "Wrong-width key raises ValueError and is rolled back"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "Index limits", str(e))
+            return False
+
+        return self.failed == failed_before
+
+    def test_sort_keeps_writes_paired(self) -> bool:
+        """Sorting by tx_index moves each value index together with its tx index."""
+        failed_before = self.failed
+        try:
+            block, address_manager, slot_manager, value_manager = build_mapped_block()
+
+            address_indices = [account.address_index for account in block.storage_writes]
+            self.assert_test(
+                address_indices == sorted(address_indices),
+                "Accounts are sorted by address index",
+                f"Got {address_indices}"
+            )
+
+            seen = {}
+            for account in block.storage_writes:
+                address = "0x" + address_manager.get_address(account.address_index).hex()
+                slot_indices = [slot_write.slot_index for slot_write in account.slot_writes]
+                self.assert_test(
+                    slot_indices == sorted(slot_indices),
+                    f"Slots of {address[:10]} are sorted by slot index"
+                )
+                for slot_write in account.slot_writes:
+                    slot = "0x" + slot_manager.get_slot(slot_write.slot_index).hex()
+                    tx_indices = list(slot_write.tx_indices)
+                    self.assert_test(
+                        tx_indices == sorted(tx_indices),
+                        f"Writes of {address[:10]} slot {slot_write.slot_index} are sorted by tx index",
+                        f"Got {tx_indices}"
+                    )
+                    self.assert_test(
+                        len(slot_write.value_indices) == len(tx_indices),
+                        f"Writes of {address[:10]} slot {slot_write.slot_index} have one value per tx"
+                    )
+                    seen[(address, slot)] = sorted(
+                        (tx_index, "0x" + value_manager.get_value(value_index).hex())
+                        for tx_index, value_index in zip(tx_indices, slot_write.value_indices)
+                    )
+
+            expected = {
+                (address, slot): sorted(writes)
+                for address, slots in OUT_OF_ORDER_WRITES.items()
+                for slot, writes in slots.items()
+            }
+            self.assert_test(
+                seen == expected,
+                "Every tx index keeps the value it wrote",
+                f"Got {seen}"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "Sort keeps writes paired", str(e))
+            return False
+
+        return self.failed == failed_before
+
+    def test_ssz_round_trip(self) -> bool:
+        """A mapped block survives SSZ encode/decode unchanged."""
+        failed_before = self.failed
+        try:
+            block = build_mapped_block()[0]
+            encoded = ssz.encode(block, sedes=BlockAccessListOptimizedMappings)
+            decoded = ssz.decode(encoded, BlockAccessListOptimizedMappings)
+
+            self.assert_test(decoded == block, "Decoded block equals the original")
+            self.assert_test(
+                ssz.encode(decoded, sedes=BlockAccessListOptimizedMappings) == encoded,
+                "Re-encoding the decoded block is byte-identical"
+            )
+
+            values = [bytes(v) for v in decoded.value_mapping.values]
+            first_slot = decoded.storage_writes[0].slot_writes[0]
+            self.assert_test(
+                all(0 <= i < len(values) for i in first_slot.value_indices),
+                "Decoded value indices point into the value mapping"
+            )
+
+            empty = BlockAccessListOptimizedMappings(
+                address_mapping=AddressIndexManager().get_address_mapping(),
+                slot_mapping=SlotIndexManager().get_slot_mapping(),
+                value_mapping=ValueIndexManager().get_value_mapping(),
+                storage_writes=[], storage_reads=[], balance_diffs=[], code_diffs=[], nonce_diffs=[],
+            )
+            self.assert_test(
+                ssz.decode(ssz.encode(empty, sedes=BlockAccessListOptimizedMappings), BlockAccessListOptimizedMappings) == empty,
+                "Empty mapped block round-trips"
+            )
+
+        except Exception as e:
+            self.assert_test(False, "SSZ round trip", str(e))
+            return False
+
+        return self.failed == failed_before
+
+    def run_all_tests(self) -> Dict[str, bool]:
+        """Run all mapped BAL format tests."""
+        print("🗺️ Running Slot Mapping Tests...")
+        print("-" * 50)
+
+        results = {}
+        results['index_deduplication'] = self.test_index_deduplication()
+        results['index_limits'] = self.test_index_limits()
+        results['sort_keeps_writes_paired'] = self.test_sort_keeps_writes_paired()
+        results['ssz_round_trip'] = self.test_ssz_round_trip()
+
+        print(f"\nTest Results: {self.passed}/{self.total} passed, {self.failed}/{self.total} failed")
+
+        return results
+
+def main():
+    """Main test function."""
+    print("🧪 BAL Slot Mapping Test Suite")
+    print("=" * 60)
+
+    # Run tests
+    tester = TestSlotMapping()
+    results = tester.run_all_tests()
+
+    # Summary
+    all_passed = all(results.values())
+    status = "✅ ALL TESTS PASSED" if all_passed else "❌ SOME TESTS FAILED"
+    print(f"\n{status}")
+
+    if not all_passed:
+        print("\nFailed tests:")
+        for test_name, passed in results.items():
+            if not passed:
+                print(f"  - {test_name}")
+
+    return all_passed
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)